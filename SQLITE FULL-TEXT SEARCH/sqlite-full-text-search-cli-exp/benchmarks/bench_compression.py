@@ -0,0 +1,131 @@
+"""
+Compression benchmark: store the corpus in an item table with plain and with
+ zlib-compressed notes (see CompressedTextField), indexed by an external-content
+ FTS5 table on the decompressing view, like in db_models.py. Then report the
+ sizes and the latency of searches (with snippets) and of reads by id.
+
+Run from the project's root dir with:
+$ python -m benchmarks.bench_compression --items 2000000
+"""
+
+import argparse
+import random
+import sqlite3
+import tempfile
+import time
+from pathlib import Path
+
+from fts_exp.conf import settings
+from fts_exp.data_models.db_fixtures.generated_data_db_fixture import generate_items
+from fts_exp.data_models.db_models import compress, decompress
+
+QUERIES = ["gatta", "dente zio", "first note", "archaeological"]
+N_QUERY_RUNS = 20
+N_READS = 10_000
+
+
+def build(path: Path, corpus: list[tuple[str, str, str]]) -> tuple[float, float]:
+    """
+    Return the secs spent to insert the items and to build the index.
+    """
+    conn = sqlite3.connect(path)
+    conn.create_function("decompress", 1, decompress, deterministic=True)
+    conn.executescript(
+        """
+        CREATE TABLE item (id INTEGER PRIMARY KEY, title TEXT, notes TEXT, lang TEXT);
+        CREATE VIEW itemcontent AS
+        SELECT id, title, decompress(notes) AS notes, lang FROM item;
+        CREATE VIRTUAL TABLE idx USING fts5(
+            title, notes, tokenize='porter unicode61 remove_diacritics 0',
+            content='itemcontent', content_rowid='id'
+        );
+        """
+    )
+    start = time.perf_counter()
+    with conn:
+        conn.executemany(
+            "INSERT INTO item (title, notes, lang) VALUES (?, ?, ?);",
+            ((x[0], compress(x[1]), x[2]) for x in corpus),
+        )
+    insert_secs = time.perf_counter() - start
+
+    start = time.perf_counter()
+    with conn:
+        conn.execute("INSERT INTO idx(idx) VALUES ('rebuild');")
+    index_secs = time.perf_counter() - start
+    conn.execute("VACUUM;")
+    conn.close()
+    return insert_secs, index_secs
+
+
+def time_searches(conn: sqlite3.Connection) -> float:
+    """
+    Return the average ms per search, top 20 by bm25 with snippets.
+    """
+    start = time.perf_counter()
+    for _ in range(N_QUERY_RUNS):
+        for query in QUERIES:
+            conn.execute(
+                "SELECT rowid, snippet(idx, 1, '<<', '>>', '...', 64) FROM idx"
+                " WHERE idx MATCH ? ORDER BY bm25(idx) LIMIT 20;",
+                (query,),
+            ).fetchall()
+    return (time.perf_counter() - start) * 1000 / (N_QUERY_RUNS * len(QUERIES))
+
+
+def time_reads(conn: sqlite3.Connection, n_items: int) -> float:
+    """
+    Return the average µs per read of the notes of a random item.
+    """
+    rand = random.Random(42)
+    ids = [rand.randint(1, n_items) for _ in range(N_READS)]
+    start = time.perf_counter()
+    for item_id in ids:
+        row = conn.execute("SELECT notes FROM item WHERE id = ?;", (item_id,))
+        decompress(row.fetchone()[0])
+    return (time.perf_counter() - start) * 1_000_000 / N_READS
+
+
+def get_size_mb(conn: sqlite3.Connection, name_like: str) -> float:
+    size = conn.execute(
+        "SELECT sum(pgsize) FROM dbstat WHERE name LIKE ?;", (name_like,)
+    ).fetchone()[0]
+    return size / 1024 / 1024
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--items", type=int, default=2_000_000)
+    parser.add_argument("--notes-words", type=int, default=300)
+    args = parser.parse_args()
+
+    corpus = list(generate_items(args.items, notes_n_words=args.notes_words))
+    print(f"Corpus: {args.items} items, {args.notes_words} words per notes\n")
+    print(
+        f"{'notes':<11} {'db MB':>8} {'item MB':>8} {'index MB':>9} {'insert s':>9}"
+        f" {'index s':>8} {'search ms':>10} {'read µs':>8}"
+    )
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for is_enabled in (False, True):
+            settings.IS_NOTES_COMPRESSION_ENABLED = is_enabled
+            path = Path(tmp_dir) / f"bench-{is_enabled}.sqlite3"
+            insert_secs, index_secs = build(path, corpus)
+
+            conn = sqlite3.connect(path)
+            conn.create_function("decompress", 1, decompress, deterministic=True)
+            db_mb = path.stat().st_size / 1024 / 1024
+            item_mb = get_size_mb(conn, "item")
+            index_mb = get_size_mb(conn, "idx%")
+            search_ms = time_searches(conn)
+            read_us = time_reads(conn, args.items)
+            conn.close()
+            label = "compressed" if is_enabled else "plain"
+            print(
+                f"{label:<11} {db_mb:>8.1f} {item_mb:>8.1f} {index_mb:>9.1f}"
+                f" {insert_secs:>9.1f} {index_secs:>8.1f} {search_ms:>10.2f}"
+                f" {read_us:>8.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+Dedupe benchmark: load the corpus, plus a share of near-duplicates of its items (a
+ word of the notes changed), in a DB made with the app's schema with
+ ItemDomain.create_items(), without and with the dedupe (flag), and report the
+ ingest throughput, the near-duplicates flagged and the cost of a lookup as the DB
+ grows.
+
+Run from the project's root dir with:
+$ python -m benchmarks.bench_dedupe --items 100000
+"""
+
+import argparse
+import random
+import tempfile
+import time
+from pathlib import Path
+
+import peewee_utils
+
+from fts_exp.conf import settings
+from fts_exp.data_models.db_fixtures.generated_data_db_fixture import generate_items
+from fts_exp.data_models.db_models import ItemSignatureModel
+from fts_exp.domains.dedupe_domain import DedupeDomain
+from fts_exp.domains.item_domain import ItemDomain
+
+N_LOOKUPS = 200
+
+
+def add_near_duplicates(
+    corpus: list[tuple[str, str, str]], rate: float, seed: int = 7
+) -> tuple[list[tuple[str, str, str]], int]:
+    """
+    Return the corpus with a near-duplicate after `rate` of its items, and their n.
+    """
+    rand = random.Random(seed)
+    rows, n_duplicates = [], 0
+    for title, notes, lang in corpus:
+        rows.append((title, notes, lang))
+        if rand.random() < rate:
+            words = notes.split()
+            words[rand.randrange(len(words))] = "zzz"
+            rows.append((title, " ".join(words), lang))
+            n_duplicates += 1
+    return rows, n_duplicates
+
+
+def load(path: Path, rows: list[tuple[str, str, str]], is_dedupe: bool) -> float:
+    """
+    Return the items/sec of the load.
+    """
+    settings.DB_PATH = str(path)
+    settings.IS_DEDUPE_ENABLED = is_dedupe
+    with peewee_utils.use_db(do_force_new_db_init=True):
+        peewee_utils.create_all_tables()
+        start = time.perf_counter()
+        ItemDomain().create_items(rows)
+        return len(rows) / (time.perf_counter() - start)
+
+
+def time_lookups(path: Path, rows: list[tuple[str, str, str]]) -> float:
+    """
+    Return the avg ms of the dedupe of a single new item.
+    """
+    settings.DB_PATH = str(path)
+    with peewee_utils.use_db(do_force_new_db_init=True):
+        start = time.perf_counter()
+        for title, notes, _ in rows[:N_LOOKUPS]:
+            DedupeDomain().dedupe([(title, notes)])
+        return (time.perf_counter() - start) * 1000 / N_LOOKUPS
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--items", type=int, default=100_000)
+    parser.add_argument("--duplicates-rate", type=float, default=0.1)
+    args = parser.parse_args()
+
+    rows, n_duplicates = add_near_duplicates(
+        list(generate_items(args.items)), args.duplicates_rate
+    )
+    print(f"Corpus: {len(rows)} items, of which {n_duplicates} near-duplicates\n")
+    settings.IS_SEARCH_CACHE_ENABLED = False
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        plain_rate = load(Path(tmp_dir) / "plain.sqlite3", rows, is_dedupe=False)
+        path = Path(tmp_dir) / "dedupe.sqlite3"
+        dedupe_rate = load(path, rows, is_dedupe=True)
+        with peewee_utils.use_db(do_force_new_db_init=True):
+            n_flagged = (
+                ItemSignatureModel.select()
+                .where(ItemSignatureModel.duplicate_of_id.is_null(False))
+                .count()
+            )
+
+        print(f"{'dedupe':<10} {'items/sec':>10}")
+        print(f"{'off':<10} {plain_rate:>10.0f}")
+        print(f"{'flag':<10} {dedupe_rate:>10.0f}")
+        print(f"\nFlagged: {n_flagged} (injected: {n_duplicates})")
+
+        # The lookup cost on DBs of increasing size: sub-linear, by index.
+        print(f"\n{'DB items':<10} {'lookup ms':>10}")
+        for n_items in (len(rows) // 100, len(rows) // 10, len(rows)):
+            path = Path(tmp_dir) / f"dedupe-{n_items}.sqlite3"
+            load(path, rows[:n_items], is_dedupe=True)
+            lookup_ms = time_lookups(path, list(generate_items(N_LOOKUPS, seed=1)))
+            print(f"{n_items:<10} {lookup_ms:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+Parallel index build benchmark: load the corpus in a DB made with the app's schema,
+ then build the Italian word index from scratch with FTS5's 'rebuild' (single
+ thread) and with IndexBuildDomain and an increasing n. of workers, and report the
+ speedup curve.
+
+Run from the project's root dir with:
+$ python -m benchmarks.bench_parallel_build --items 1000000 --workers 1,2,4,8
+"""
+
+import argparse
+import os
+import tempfile
+import time
+from pathlib import Path
+
+import peewee_utils
+
+from fts_exp.conf import settings
+from fts_exp.data_models.db_fixtures.generated_data_db_fixture import generate_items
+from fts_exp.data_models.db_models import ItemFTSIndexIta, ItemModel, LangEnum
+from fts_exp.data_models.db_utils import get_db
+from fts_exp.domains.index_build_domain import IndexBuildDomain
+
+BATCH_SIZE = 10_000
+
+
+def load(corpus: list[tuple[str, str, str]]) -> None:
+    for i in range(0, len(corpus), BATCH_SIZE):
+        with get_db().atomic():
+            ItemModel.insert_many(
+                corpus[i : i + BATCH_SIZE],
+                fields=[ItemModel.title, ItemModel.notes, ItemModel.lang],
+            ).execute()
+
+
+def time_rebuild() -> float:
+    table = ItemFTSIndexIta._meta.table_name
+    start = time.perf_counter()
+    get_db().execute_sql(f"INSERT INTO {table}({table}) VALUES('rebuild');")
+    return time.perf_counter() - start
+
+
+def time_build(n_workers: int) -> float:
+    start = time.perf_counter()
+    IndexBuildDomain(LangEnum.ITA).build(n_workers)
+    return time.perf_counter() - start
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--items", type=int, default=1_000_000)
+    parser.add_argument("--workers", type=str, default="1,2,4,8")
+    args = parser.parse_args()
+
+    corpus = list(generate_items(args.items))
+    print(f"Corpus: {args.items} items (half ITA), CPUs: {os.cpu_count()}\n")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        settings.DB_PATH = str(Path(tmp_dir) / "bench.sqlite3")
+        with peewee_utils.use_db():
+            peewee_utils.create_all_tables()
+            load(corpus)
+            rebuild_secs = time_rebuild()
+            print(f"{'workers':<10} {'secs':>7} {'speedup':>8}")
+            print(f"{'rebuild':<10} {rebuild_secs:>7.2f} {1:>8.2f}")
+            for n_workers in [int(x) for x in args.workers.split(",")]:
+                secs = time_build(n_workers)
+                print(f"{n_workers:<10} {secs:>7.2f} {rebuild_secs / secs:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
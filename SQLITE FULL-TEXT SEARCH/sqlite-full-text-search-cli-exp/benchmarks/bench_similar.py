@@ -0,0 +1,83 @@
+"""
+"More like this" benchmark: load the corpus in DBs of increasing size made with the
+ app's schema, then time, for a sample of items, ItemDomain.similar_items() and the
+ hand-built alternative: an OR query of all the words of the item (top 10 by bm25).
+ The first call of each DB fills the cache of the doc frequencies, and is not timed.
+
+Run from the project's root dir with:
+$ python -m benchmarks.bench_similar --items 100000
+"""
+
+import argparse
+import re
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+import peewee_utils
+
+from fts_exp.conf import settings
+from fts_exp.data_models.db_fixtures.generated_data_db_fixture import generate_items
+from fts_exp.data_models.db_models import ItemModel, get_index_class_for_lang
+from fts_exp.domains.item_domain import ItemDomain
+
+N_SAMPLE_ITEMS = 50
+K = 10
+
+
+def time_similar_items(item_ids: list[int]) -> list[float]:
+    ItemDomain().similar_items(item_ids[0], K)
+    durations = []
+    for item_id in item_ids:
+        start = time.perf_counter()
+        ItemDomain().similar_items(item_id, K)
+        durations.append((time.perf_counter() - start) * 1000)
+    return durations
+
+
+def time_or_query(item_ids: list[int]) -> list[float]:
+    durations = []
+    for item in ItemModel.select().where(ItemModel.id.in_(item_ids)):
+        _ItemFTSIndex = get_index_class_for_lang(item.lang)
+        words = dict.fromkeys(re.findall(r"\w+", f"{item.title} {item.notes}".lower()))
+        start = time.perf_counter()
+        list(
+            _ItemFTSIndex.select(_ItemFTSIndex.rowid)
+            .where(_ItemFTSIndex.match(" OR ".join(f'"{x}"' for x in words)))
+            .order_by(_ItemFTSIndex.bm25())
+            .limit(K)
+        )
+        durations.append((time.perf_counter() - start) * 1000)
+    return durations
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--items", type=int, default=100_000)
+    args = parser.parse_args()
+
+    corpus = list(generate_items(args.items))
+    settings.IS_SEARCH_CACHE_ENABLED = False
+    print(f"{'DB items':<10} {'query':<14} {'p50 ms':>8} {'p95 ms':>8} {'max ms':>8}")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for n_items in (args.items // 100, args.items // 10, args.items):
+            settings.DB_PATH = str(Path(tmp_dir) / f"similar-{n_items}.sqlite3")
+            with peewee_utils.use_db(do_force_new_db_init=True):
+                peewee_utils.create_all_tables()
+                ItemDomain().create_items(corpus[:n_items], do_defer_indexing=True)
+                step = n_items // N_SAMPLE_ITEMS
+                item_ids = list(range(1, n_items + 1, step))[:N_SAMPLE_ITEMS]
+                for label, durations in (
+                    ("similar_items", time_similar_items(item_ids)),
+                    ("OR query", time_or_query(item_ids)),
+                ):
+                    p95 = statistics.quantiles(durations, n=20)[-1]
+                    print(
+                        f"{n_items:<10} {label:<14} {statistics.median(durations):>8.2f}"
+                        f" {p95:>8.2f} {max(durations):>8.2f}"
+                    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""
+Snapshot mode benchmark: load the corpus in a DB made with the app's schema, then
+ time searches (with ItemDomain, top 20 by bm25 with snippets) in the default mode
+ and in snapshot mode (read-only and immutable), without and with the prewarm.
+ Cold: the first search on a new connection, after evicting the DB file from the
+ OS cache (Linux only). Warm: the median of the next searches on a connection.
+
+Run from the project's root dir with:
+$ python -m benchmarks.bench_snapshot --items 200000
+"""
+
+import argparse
+import os
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+import peewee_utils
+
+from fts_exp.conf import settings
+from fts_exp.data_models.db_fixtures.generated_data_db_fixture import generate_items
+from fts_exp.data_models.db_models import ItemModel, LangEnum
+from fts_exp.data_models.db_utils import get_db
+from fts_exp.domains.item_domain import ItemDomain
+from fts_exp.domains.snapshot_domain import PrewarmModeEnum, SnapshotDomain
+
+BATCH_SIZE = 10_000
+QUERIES = ["gatta", "dente zio", "zampino lardo", "prima nota"]
+N_WARM_RUNS = 20
+# (label, snapshot mode, prewarm mode).
+CONFIGS = [
+    ("default", False, None),
+    ("snapshot", True, None),
+    ("snapshot+read", True, PrewarmModeEnum.READ),
+    ("snapshot+mmap", True, PrewarmModeEnum.MMAP),
+]
+
+
+def load(corpus: list[tuple[str, str, str]]) -> None:
+    for i in range(0, len(corpus), BATCH_SIZE):
+        with get_db().atomic():
+            ItemModel.insert_many(
+                corpus[i : i + BATCH_SIZE],
+                fields=[ItemModel.title, ItemModel.notes, ItemModel.lang],
+            ).execute()
+    get_db().execute_sql("VACUUM;")
+
+
+def evict_os_cache(path: Path) -> bool:
+    if not hasattr(os, "posix_fadvise"):
+        return False
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+    finally:
+        os.close(fd)
+    return True
+
+
+def time_search(text: str) -> float:
+    start = time.perf_counter()
+    ItemDomain().search_items(text, LangEnum.ITA, do_use_cache=False)
+    return (time.perf_counter() - start) * 1000
+
+
+def prewarm(mode: PrewarmModeEnum | None) -> float:
+    return SnapshotDomain().prewarm(mode)["duration_ms"] if mode else 0
+
+
+def run(path: Path, is_snapshot: bool, prewarm_mode: PrewarmModeEnum | None):
+    """
+    Return the avg ms of the prewarm, the avg ms of the cold searches and the
+     median ms of the warm ones.
+    """
+    settings.IS_DB_SNAPSHOT_MODE = is_snapshot
+    prewarm_ms, cold_ms = [], []
+    for text in QUERIES:
+        evict_os_cache(path)
+        with peewee_utils.use_db(do_force_new_db_init=True):
+            prewarm_ms.append(prewarm(prewarm_mode))
+            cold_ms.append(time_search(text))
+
+    with peewee_utils.use_db(do_force_new_db_init=True):
+        prewarm(prewarm_mode)
+        for text in QUERIES:
+            time_search(text)
+        warm_ms = [time_search(x) for _ in range(N_WARM_RUNS) for x in QUERIES]
+    return (
+        statistics.mean(prewarm_ms),
+        statistics.mean(cold_ms),
+        statistics.median(warm_ms),
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--items", type=int, default=200_000)
+    args = parser.parse_args()
+
+    corpus = list(generate_items(args.items))
+    print(f"Corpus: {args.items} items (half ITA)")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = Path(tmp_dir) / "bench.sqlite3"
+        settings.DB_PATH = str(path)
+        settings.IS_SEARCH_CACHE_ENABLED = False
+        settings.IS_SLOW_QUERY_LOG_ENABLED = False
+        with peewee_utils.use_db():
+            peewee_utils.create_all_tables()
+            load(corpus)
+        if not evict_os_cache(path):
+            print("No posix_fadvise(): the cold searches are not cold")
+        print(f"DB: {path.stat().st_size / 1024 / 1024:.1f} MB\n")
+
+        print(f"{'mode':<15} {'prewarm ms':>10} {'cold ms':>8} {'warm ms':>8}")
+        for label, is_snapshot, prewarm_mode in CONFIGS:
+            prewarm_ms, cold_ms, warm_ms = run(path, is_snapshot, prewarm_mode)
+            print(f"{label:<15} {prewarm_ms:>10.2f} {cold_ms:>8.2f} {warm_ms:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Stopwords benchmark: index the bilingual corpus in a contentless FTS5 table and
+ report the latency of broad queries, with and without the stopwords removed from
+ the query by the query compiler. The index is the same in both cases, as the
+ stopwords are removed at query time only.
+
+Run from the project's root dir with:
+$ python -m benchmarks.bench_stopwords --items 100000
+"""
+
+import argparse
+import sqlite3
+import time
+
+from fts_exp.data_models.db_fixtures.generated_data_db_fixture import generate_items
+from fts_exp.data_models.db_models import LangEnum
+from fts_exp.domains.query_compiler import compile_query
+
+TOKENIZE = {
+    LangEnum.ITA: "porter unicode61 remove_diacritics 0",
+    LangEnum.ENG: "porter unicode61 remove_diacritics 2",
+}
+# Made with the corpus' words, so that the stopwords are common and the other terms
+#  are not.
+QUERIES = {
+    LangEnum.ITA: [
+        "la gatta di papà",
+        "il dente che è al lardo",
+        "lo zampino di la nota",
+    ],
+    LangEnum.ENG: [
+        "my first books",
+        "a note about dentistry",
+        "leadership and my things",
+    ],
+}
+N_QUERY_RUNS = 20
+
+
+def build(rows: list[tuple[str, str]], tokenize: str) -> sqlite3.Connection:
+    conn = sqlite3.connect(":memory:")
+    conn.execute(
+        f"CREATE VIRTUAL TABLE idx USING fts5(title, notes, tokenize='{tokenize}', content='');"
+    )
+    with conn:
+        conn.executemany("INSERT INTO idx(title, notes) VALUES (?, ?);", rows)
+    conn.execute("INSERT INTO idx(idx) VALUES ('optimize');")
+    return conn
+
+
+def time_queries(conn: sqlite3.Connection, queries: list[str]) -> float:
+    """
+    Return the average ms per query, fetching the top 20 results by bm25.
+    """
+    start = time.perf_counter()
+    for _ in range(N_QUERY_RUNS):
+        for query in queries:
+            conn.execute(
+                "SELECT rowid FROM idx WHERE idx MATCH ? ORDER BY bm25(idx) LIMIT 20;",
+                (query,),
+            ).fetchall()
+    return (time.perf_counter() - start) * 1000 / (N_QUERY_RUNS * len(queries))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--items", type=int, default=100_000)
+    args = parser.parse_args()
+
+    corpus = list(generate_items(args.items))
+    print(f"Corpus: {args.items} items\n")
+    print(f"{'lang':<5} {'stopwords':<10} {'query ms':>9}")
+    for lang, tokenize in TOKENIZE.items():
+        conn = build([(x[0], x[1]) for x in corpus if x[2] == lang.value], tokenize)
+        for label, queries in (
+            ("kept", [compile_query(x) for x in QUERIES[lang]]),
+            ("removed", [compile_query(x, lang) for x in QUERIES[lang]]),
+        ):
+            query_ms = time_queries(conn, queries)
+            print(f"{lang.name:<5} {label:<10} {query_ms:>9.2f}")
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+Tokenizer throughput benchmark: index the bilingual corpus in a contentless FTS5
+ table with the unicode61, porter and snowball tokenizers and report tokens/sec.
+
+Run from the project's root dir with:
+$ python -m benchmarks.bench_tokenizers --items 100000
+"""
+
+import argparse
+import sqlite3
+import time
+
+from fts_exp.conf import settings
+from fts_exp.data_models.db_fixtures.generated_data_db_fixture import generate_items
+from fts_exp.data_models.db_models import LangEnum
+
+TOKENIZERS = {
+    "unicode61": {
+        LangEnum.ITA: "unicode61 remove_diacritics 0",
+        LangEnum.ENG: "unicode61 remove_diacritics 2",
+    },
+    "porter": {
+        LangEnum.ITA: "porter unicode61 remove_diacritics 0",
+        LangEnum.ENG: "porter unicode61 remove_diacritics 2",
+    },
+    "snowball": {
+        LangEnum.ITA: "snowball italian unicode61 remove_diacritics 0",
+        LangEnum.ENG: "snowball english unicode61 remove_diacritics 2",
+    },
+}
+
+
+def bench(tokenize: str, rows: list[tuple[str, str]]) -> tuple[int, float]:
+    """
+    Return the n. of tokens indexed and the elapsed seconds.
+    """
+    conn = sqlite3.connect(":memory:")
+    if tokenize.startswith("snowball"):
+        conn.enable_load_extension(True)
+        conn.load_extension(str(settings.SQLITE_EXT_SNOWBALL_PATH))
+    conn.execute(
+        f"CREATE VIRTUAL TABLE idx USING fts5(title, notes, tokenize='{tokenize}', content='');"
+    )
+    conn.execute("CREATE VIRTUAL TABLE idx_vocab USING fts5vocab(idx, 'row');")
+
+    start = time.perf_counter()
+    with conn:
+        conn.executemany("INSERT INTO idx(title, notes) VALUES (?, ?);", rows)
+    elapsed = time.perf_counter() - start
+
+    n_tokens = conn.execute("SELECT sum(cnt) FROM idx_vocab;").fetchone()[0]
+    conn.close()
+    return n_tokens, elapsed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--items", type=int, default=100_000)
+    args = parser.parse_args()
+
+    corpus = list(generate_items(args.items))
+    print(f"Corpus: {args.items} items\n")
+    print(
+        f"{'tokenizer':<10} {'lang':<5} {'tokens':>10} {'secs':>8} {'tokens/sec':>12}"
+    )
+    for name, tokenize_by_lang in TOKENIZERS.items():
+        if name == "snowball" and not settings.SQLITE_EXT_SNOWBALL_PATH.exists():
+            print(f"{name:<10} skipped: {settings.SQLITE_EXT_SNOWBALL_PATH} not found")
+            continue
+        for lang, tokenize in tokenize_by_lang.items():
+            rows = [(x[0], x[1]) for x in corpus if x[2] == lang.value]
+            n_tokens, elapsed = bench(tokenize, rows)
+            print(
+                f"{name:<10} {lang.name:<5} {n_tokens:>10} {elapsed:>8.2f} {n_tokens / elapsed:>12,.0f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -6,13 +6,33 @@ $ sfts --help
 
 import click
 
+from .data_models.db_utils import sql_trace
+from .views.admin.admin_apply_changes_cli_view import admin_apply_changes_cli_view
+from .views.admin.admin_archive_cli_view import admin_archive_cli_view
+from .views.admin.admin_build_index_cli_view import admin_build_index_cli_view
+from .views.admin.admin_changes_cli_view import admin_changes_cli_view
+from .views.admin.admin_db_backup_cli_view import admin_db_backup_cli_view
 from .views.admin.admin_db_create_cli_view import admin_db_create_cli_view
 from .views.admin.admin_db_drop_tables_cli_view import admin_db_drop_tables_cli_view
 from .views.admin.admin_db_load_fixtures_cli_view import admin_db_load_fixtures_cli_view
+from .views.admin.admin_db_stats_cli_view import admin_db_stats_cli_view
+from .views.admin.admin_query_digest_cli_view import admin_query_digest_cli_view
+from .views.admin.admin_reindex_cli_view import admin_reindex_cli_view
+from .views.admin.admin_reshard_cli_view import admin_reshard_cli_view
+from .views.admin.admin_search_cache_stats_cli_view import (
+    admin_search_cache_stats_cli_view,
+)
+from .views.admin.admin_spelling_refresh_cli_view import (
+    admin_spelling_refresh_cli_view,
+)
+from .views.base_cli_view import print_sql_trace
 from .views.create_cli_view import create_cli_view
+from .views.delete_cli_view import delete_cli_view
 from .views.health_cli_view import health_cli_view
 from .views.read_cli_view import read_cli_view
 from .views.search_cli_view import search_cli_view
+from .views.similar_cli_view import similar_cli_view
+from .views.update_cli_view import update_cli_view
 
 
 @click.group(
@@ -24,15 +44,41 @@ from .views.search_cli_view import search_cli_view
     Docs: https://github.com/puntonim/experiments-monorepo/blob/main/SQLITE%20FULL-TEXT%20SEARCH/sqlite-full-text-search-cli-exp/README.md
     """
 )
-def cli() -> None:
-    pass
+@click.option(
+    "--trace",
+    "do_trace",
+    is_flag=True,
+    default=False,
+    help="Trace all the SQL statements, with those run by triggers, and print"
+    " a summary at the end",
+)
+@click.pass_context
+def cli(ctx: click.Context, do_trace: bool = False) -> None:
+    if do_trace:
+        trace = ctx.with_resource(sql_trace())
+        # Mind that it runs before the trace is closed.
+        ctx.call_on_close(lambda: print_sql_trace(trace))
 
 
 # Register all sub-commands.
 cli.add_command(health_cli_view)
 cli.add_command(create_cli_view)
 cli.add_command(read_cli_view)
+cli.add_command(update_cli_view)
+cli.add_command(delete_cli_view)
 cli.add_command(search_cli_view)
+cli.add_command(similar_cli_view)
 cli.add_command(admin_db_create_cli_view)
 cli.add_command(admin_db_drop_tables_cli_view)
 cli.add_command(admin_db_load_fixtures_cli_view)
+cli.add_command(admin_search_cache_stats_cli_view)
+cli.add_command(admin_reindex_cli_view)
+cli.add_command(admin_archive_cli_view)
+cli.add_command(admin_reshard_cli_view)
+cli.add_command(admin_build_index_cli_view)
+cli.add_command(admin_db_backup_cli_view)
+cli.add_command(admin_db_stats_cli_view)
+cli.add_command(admin_query_digest_cli_view)
+cli.add_command(admin_changes_cli_view)
+cli.add_command(admin_apply_changes_cli_view)
+cli.add_command(admin_spelling_refresh_cli_view)
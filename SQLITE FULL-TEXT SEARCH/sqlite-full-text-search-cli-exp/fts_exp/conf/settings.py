@@ -6,6 +6,8 @@ A better alternative, in case the app requires more settings and advanced featur
  is Dynaconf.
 """
 
+import os
+import sys
 from pathlib import Path
 
 import settings_utils
@@ -32,12 +34,41 @@ class settings:
     DO_LOG_PEEWEE_QUERIES = settings_utils.get_bool_from_env(
         "DO_LOG_PEEWEE_QUERIES", False
     )
+    # Snapshot mode, for search-only deployments (eg. a Lambda) on a published copy
+    #  of the DB, see domains/snapshot_domain.py: DB_PATH is opened read-only and
+    #  immutable (URI `mode=ro&immutable=1`), so SQLite skips the locks and the
+    #  change detection. The write commands refuse to run, and the search cache and
+    #  the slow query log are disabled. Mind that the file must never change while
+    #  it is open.
+    IS_DB_SNAPSHOT_MODE = settings_utils.get_bool_from_env("IS_DB_SNAPSHOT_MODE", False)
+    # Optional prewarm of the pages of the word indexes, at the first search of
+    #  each connection: "read" them into SQLite's page cache (grown to hold them,
+    #  up to DB_PREWARM_MAX_CACHE_MB), or "mmap" the DB file (up to SQLITE_MMAP_SIZE)
+    #  and fault its pages into the OS cache.
+    DB_PREWARM = settings_utils.get_string_from_env("DB_PREWARM", None)
+    DB_PREWARM_MAX_CACHE_MB = 256
+    SQLITE_MMAP_SIZE = 1024 * 1024 * 1024
+    # SQL trace (`sfts --trace`), see db_utils.sql_trace: n. of statements shown in
+    #  the summary, the slowest ones.
+    SQL_TRACE_SUMMARY_N_STATEMENTS = 10
     SQLITE_EXT_SNOWBALL_MACOS_PATH = (
         ROOT_DIR
         / "vendored-requirements"
         / "snowball-for-sqlite-fts5-macos"
         / "fts5stemmer.dylib"
     )
+    # Built from source with: make build-snowball-linux
+    SQLITE_EXT_SNOWBALL_LINUX_PATH = (
+        ROOT_DIR
+        / "vendored-requirements"
+        / "snowball-for-sqlite-fts5-linux"
+        / "fts5stemmer.so"
+    )
+    SQLITE_EXT_SNOWBALL_PATH = (
+        SQLITE_EXT_SNOWBALL_MACOS_PATH
+        if sys.platform == "darwin"
+        else SQLITE_EXT_SNOWBALL_LINUX_PATH
+    )
 
     # Separators used when performing a search with snippet() or highlight():
     # https://docs.peewee-orm.com/en/latest/peewee/sqlite_ext.html#SearchField.snippet
@@ -46,6 +77,162 @@ class settings:
     # N. token returned when performing a search with snippet(), 1 - 64:
     # https://docs.peewee-orm.com/en/latest/peewee/sqlite_ext.html#SearchField.snippet
     SQLITE_SEARCH_SNIPPET_SIZE = 64
+    SQLITE_SEARCH_PAGE_SIZE = 20
+
+    # Budget for a single search query, enforced with SQLite's progress handler:
+    #  https://www.sqlite.org/c3ref/progress_handler.html
+    # 0 means no budget.
+    SQLITE_SEARCH_TIME_BUDGET_MS = int(
+        settings_utils.get_string_from_env("SQLITE_SEARCH_TIME_BUDGET_MS", "2000")
+    )
+    SQLITE_SEARCH_VM_STEPS_BUDGET = int(
+        settings_utils.get_string_from_env("SQLITE_SEARCH_VM_STEPS_BUDGET", "0")
+    )
+    # N. of SQLite VM instructions between 2 invocations of the progress handler.
+    SQLITE_PROGRESS_HANDLER_N_STEPS = 1000
+
+    # Query compiler, see domains/query_compiler.py.
+    # Shorter prefixes (eg. "za*") are searched as exact terms.
+    SQLITE_SEARCH_MIN_PREFIX_LENGTH = 3
+    SQLITE_SEARCH_MAX_QUERY_TERMS = 32
+    SQLITE_SEARCH_MAX_NEAR_DISTANCE = 50
+    SQLITE_SEARCH_QUERY_COMPILER_CACHE_SIZE = 1024
+    # Stopwords removed from the search text, by lang value; None to disable.
+    SQLITE_SEARCH_STOPWORDS_PATHS = {
+        "I": CURR_DIR / "stopwords" / "ita.txt",
+        "E": CURR_DIR / "stopwords" / "eng.txt",
+    }
+
+    # Compression of item.notes, see CompressedTextField. Mind that it applies to
+    #  the notes written after it is enabled (and both kinds can coexist).
+    IS_NOTES_COMPRESSION_ENABLED = settings_utils.get_bool_from_env(
+        "IS_NOTES_COMPRESSION_ENABLED", False
+    )
+    # Shorter notes are stored as they are, as zlib's overhead is not worth it.
+    NOTES_COMPRESSION_MIN_SIZE = 256
+    NOTES_COMPRESSION_LEVEL = 6
+
+    # Substring mode, see ItemTrigramIndexIta/Eng: the trigram indexes, searched
+    #  with `--mode substring`, are kept updated only when enabled. So after
+    #  enabling it, rebuild them with: sfts admin-reindex --lang ita --index trigram
+    IS_SUBSTRING_MODE_ENABLED = settings_utils.get_bool_from_env(
+        "IS_SUBSTRING_MODE_ENABLED", False
+    )
+
+    # Passage mode, see PassageModel: the notes are also split in overlapping
+    #  chunks of words, searched with `--mode passage`.
+    # Mind that it applies to the items written after it is enabled.
+    IS_PASSAGE_MODE_ENABLED = settings_utils.get_bool_from_env(
+        "IS_PASSAGE_MODE_ENABLED", False
+    )
+    PASSAGE_SIZE_N_WORDS = 200
+    PASSAGE_OVERLAP_N_WORDS = 50
+
+    # N. of items copied per transaction by the online reindex, see ReindexDomain.
+    REINDEX_CHUNK_SIZE = 10_000
+
+    # N. of items written per statement (and transaction) by the bulk update and
+    #  delete, see ItemDomain.update_items(). Mind that the ids are bound as
+    #  parameters, so it must be < SQLite's max n. of parameters (32766).
+    BULK_WRITE_CHUNK_SIZE = 5000
+    # N. of items validated and written per batch by the bulk create, see
+    #  ItemDomain.create_items().
+    BULK_CREATE_CHUNK_SIZE = 10_000
+
+    # Archive DBs, see ArchiveDomain: items older than ARCHIVE_AGE_DAYS are moved
+    #  to a DB file per year, in ARCHIVE_DIR.
+    ARCHIVE_AGE_DAYS = int(
+        settings_utils.get_string_from_env("ARCHIVE_AGE_DAYS", "365")
+    )
+    ARCHIVE_DIR = settings_utils.get_string_from_env("ARCHIVE_DIR", str(ROOT_DIR))
+
+    # Sharded layout, see ShardDomain: the shard DB files are created in SHARDS_DIR
+    #  by `sfts admin-reshard`.
+    SHARDS_DIR = settings_utils.get_string_from_env("SHARDS_DIR", str(ROOT_DIR))
+    # Max n. of threads searching the shards in parallel.
+    SHARDS_SEARCH_MAX_WORKERS = int(
+        settings_utils.get_string_from_env(
+            "SHARDS_SEARCH_MAX_WORKERS", str(os.cpu_count() or 4)
+        )
+    )
+
+    # Online backup, see BackupDomain: n. of pages copied per step (with the
+    #  default page size of 4 KB, 4 MB) and pause between steps, so that writers
+    #  can get the lock.
+    BACKUP_PAGES_PER_STEP = 1000
+    BACKUP_SLEEP_MS = 20
+
+    # Change journal for the replicas, see domains/change_journal_domain.py: the
+    #  triggers on item log the id of every written item. Mind that it applies to
+    #  the items written after it is enabled.
+    IS_CHANGE_JOURNAL_ENABLED = settings_utils.get_bool_from_env(
+        "IS_CHANGE_JOURNAL_ENABLED", False
+    )
+    # N. of changes read, or applied, per query (and transaction).
+    CHANGE_JOURNAL_BATCH_SIZE = 1000
+
+    # Persistent cache of search results, see domains/search_cache_domain.py.
+    IS_SEARCH_CACHE_ENABLED = settings_utils.get_bool_from_env(
+        "IS_SEARCH_CACHE_ENABLED", False
+    )
+    SEARCH_CACHE_MAX_ENTRIES = 1000
+    # The hits and misses are written in batches, and the last use of an entry only
+    #  when older than this resolution, so that a hit does not write.
+    SEARCH_CACHE_COUNTERS_BATCH_SIZE = 50
+    SEARCH_CACHE_LAST_USED_AT_RESOLUTION_S = 60
+
+    # Slow query log, see domains/slow_query_log_domain.py: the searches slower than
+    #  the threshold, plus a random sample of all the searches (0-1), are logged to
+    #  a table, in batches. The digest estimates the frequency and p95 from the
+    #  sample: set a rate > 0 for them.
+    IS_SLOW_QUERY_LOG_ENABLED = settings_utils.get_bool_from_env(
+        "IS_SLOW_QUERY_LOG_ENABLED", False
+    )
+    SLOW_QUERY_LOG_THRESHOLD_MS = int(
+        settings_utils.get_string_from_env("SLOW_QUERY_LOG_THRESHOLD_MS", "500")
+    )
+    SLOW_QUERY_LOG_SAMPLE_RATE = float(
+        settings_utils.get_string_from_env("SLOW_QUERY_LOG_SAMPLE_RATE", "0")
+    )
+    SLOW_QUERY_LOG_BATCH_SIZE = 50
+
+    # Near-duplicate detection at ingest, see domains/dedupe_domain.py: the new items
+    #  whose similarity (Jaccard of their word shingles, estimated with MinHash) with
+    #  an existing item is >= DEDUPE_THRESHOLD are flagged or rejected, see
+    #  DedupeActionEnum. Mind that it applies to the items written after it is
+    #  enabled.
+    IS_DEDUPE_ENABLED = settings_utils.get_bool_from_env("IS_DEDUPE_ENABLED", False)
+    DEDUPE_ACTION = settings_utils.get_string_from_env("DEDUPE_ACTION", "flag")
+    DEDUPE_THRESHOLD = float(
+        settings_utils.get_string_from_env("DEDUPE_THRESHOLD", "0.8")
+    )
+    DEDUPE_SHINGLE_N_WORDS = 3
+    # The signature is made of N_BANDS x BAND_SIZE MinHash values, and 2 items are
+    #  compared only if all the values of one of their bands are equal: ~99% of the
+    #  pairs with similarity 0.8 are, ~3% of those with similarity 0.3.
+    DEDUPE_N_BANDS = 12
+    DEDUPE_BAND_SIZE = 5
+
+    # "More like this", see ItemDomain.similar_items(): an item is searched by its
+    #  SIMILAR_N_QUERY_TERMS most distinctive terms, reading up to
+    #  SIMILAR_MAX_TERM_POSTINGS postings (occurrences) of each, and the best
+    #  SIMILAR_N_CANDIDATES found are reranked.
+    SIMILAR_N_QUERY_TERMS = 12
+    SIMILAR_MAX_TERM_POSTINGS = 2000
+    SIMILAR_N_CANDIDATES = 200
+    # The doc frequencies of the terms are cached in memory, until the n. of docs of
+    #  the index changes by more than this ratio.
+    SIMILAR_DOC_COUNTS_MAX_DRIFT = 0.1
+
+    # "Did you mean" spelling suggestions, see domains/spelling_domain.py.
+    # Suggestions are computed when a search returns less results than this.
+    SPELLING_SUGGESTIONS_MIN_RESULTS = 1
+    SPELLING_SUGGESTIONS_MAX = 3
+    # Optional file where to persist the vocabularies across processes, written by
+    #  sfts admin-spelling-refresh.
+    SPELLING_SIDECAR_PATH = settings_utils.get_string_from_env(
+        "SPELLING_SIDECAR_PATH", None
+    )
 
 
 class test_settings:
@@ -54,5 +241,13 @@ class test_settings:
     ARE_CONSOLE_PRINTS_ENABLED = False
 
     DB_PATH = ":memory:"
+    IS_DB_SNAPSHOT_MODE = False
+    DB_PREWARM = None
     # DB_PATH = "test.sqlite3"
     DO_LOG_PEEWEE_QUERIES = True
+    IS_SEARCH_CACHE_ENABLED = False
+    IS_SLOW_QUERY_LOG_ENABLED = False
+    IS_CHANGE_JOURNAL_ENABLED = False
+    IS_DEDUPE_ENABLED = False
+    IS_PASSAGE_MODE_ENABLED = False
+    SPELLING_SIDECAR_PATH = None
@@ -0,0 +1,36 @@
+"""
+Synthetic bilingual items, for performance tests and the benchmarks: random
+ sentences made with the words of the sample fixtures, half Italian and half
+ English. The same seed generates the same items.
+"""
+
+import random
+import re
+from typing import Iterator
+
+from ..db_models import LangEnum
+from .sample_data_db_fixture import ITEM_MODEL_FIXTURES
+
+
+def _get_words_by_lang() -> dict[LangEnum, list[str]]:
+    words_by_lang = {LangEnum.ITA: [], LangEnum.ENG: []}
+    for fixture in ITEM_MODEL_FIXTURES:
+        text = f"{fixture['title']} {fixture['notes']}"
+        words_by_lang[fixture["lang"]].extend(re.findall(r"\w+", text))
+    return words_by_lang
+
+
+def generate_items(
+    n_items: int, seed: int = 42, notes_n_words: int = 60
+) -> Iterator[tuple[str, str, str]]:
+    """
+    Yield `n_items` (title, notes, lang) tuples, half Italian and half English.
+    """
+    rand = random.Random(seed)
+    words_by_lang = _get_words_by_lang()
+    for i in range(n_items):
+        lang = LangEnum.ITA if i % 2 == 0 else LangEnum.ENG
+        words = words_by_lang[lang]
+        title = " ".join(rand.choices(words, k=rand.randint(4, 12)))
+        notes = " ".join(rand.choices(words, k=notes_n_words))
+        yield title, notes, lang.value
@@ -1,6 +1,10 @@
+import json
+import re
+import zlib
 from datetime import datetime
 from enum import StrEnum
-from typing import Type
+from pathlib import Path
+from typing import Callable, Type
 
 import datetime_utils
 import peewee
@@ -18,17 +22,62 @@ class LangEnum(StrEnum):
     ENG = "E"
 
 
+def compress(text: str | None) -> str | bytes | None:
+    """
+    Compress the text with zlib, when settings.IS_NOTES_COMPRESSION_ENABLED and
+     the text is long enough to be worth it. Otherwise return it as it is.
+    """
+    if not settings.IS_NOTES_COMPRESSION_ENABLED or text is None:
+        return text
+    data = text.encode()
+    if len(data) < settings.NOTES_COMPRESSION_MIN_SIZE:
+        return text
+    compressed = zlib.compress(data, settings.NOTES_COMPRESSION_LEVEL)
+    return compressed if len(compressed) < len(data) else text
+
+
+def decompress(value: str | bytes | None) -> str | None:
+    """
+    Return the text of a value written by compress(): compressed values are bytes
+     (BLOB in SQLite), plain values are str. So both can coexist in the same column.
+    Registered as SQL function, used by the view ITEM_CONTENT_VIEW_NAME and the
+     triggers.
+    """
+    if isinstance(value, bytes):
+        return zlib.decompress(value).decode()
+    return value
+
+
+class CompressedTextField(peewee.TextField):
+    """
+    Text field stored compressed, see compress(), and decompressed transparently.
+    Mind that compressed values cannot be used in SQL filters (eg. LIKE) without
+     the decompress() SQL function.
+    """
+
+    def db_value(self, value):
+        return compress(super().db_value(value))
+
+    def python_value(self, value):
+        return decompress(value)
+
+
+ITEM_CONTENT_VIEW_NAME = "itemcontent"
+
+
 class ItemModel(peewee_utils.BasePeeweeModel):
-    # The `id` would be implicitly added even of we comment this line, as we do
-    #  not specify a primary key.
-    id: int = peewee.AutoField()
+    # AUTOINCREMENT, so that the ids of deleted items are never reused: eg. those
+    #  of the items moved to the archives (see ArchiveDomain).
+    id: int = sqlite_ext.AutoIncrementField()
     created_at: datetime = peewee_utils.UtcDateTimeField(default=datetime_utils.now_utc)
     # See trigger `update_item_updated_at_after_update_on_item` defined later.
     # Mind that you have to reload the model to get a fresh value for `updated_at`.
     updated_at: datetime = peewee_utils.UtcDateTimeField(default=datetime_utils.now_utc)
 
     title: str = peewee.CharField(max_length=512)
-    notes: str = peewee.TextField(null=True)
+    # Stored compressed when settings.IS_NOTES_COMPRESSION_ENABLED. The FTS indexes
+    #  read the plain text from the view ITEM_CONTENT_VIEW_NAME.
+    notes: str = CompressedTextField(null=True)
 
     # Mind that the choices are not enforced, they are just for metadata.
     #  See docs: https://docs.peewee-orm.com/en/latest/peewee/models.html#field-initialization-arguments
@@ -60,8 +109,9 @@ class ItemFTSIndexIta(peewee_utils.BaseFtsModelModel):
         options = {
             # Disable `remove_diacritics` or "diventerò" does not match "diventate".
             "tokenize": "snowball italian unicode61 remove_diacritics 0",
-            # External-content.
-            "content": ItemModel,
+            # External-content: a view on item with the decompressed notes.
+            "content": ITEM_CONTENT_VIEW_NAME,
+            "content_rowid": "id",
         }
 
     def __repr__(self) -> str:
@@ -81,17 +131,352 @@ class ItemFTSIndexEng(peewee_utils.BaseFtsModelModel):
     title = sqlite_ext.SearchField()
     notes = sqlite_ext.SearchField()
 
+    class Meta:
+        options = {
+            "tokenize": "snowball english unicode61 remove_diacritics 2",
+            # External-content: a view on item with the decompressed notes.
+            "content": ITEM_CONTENT_VIEW_NAME,
+            "content_rowid": "id",
+        }
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}(rowid={self.rowid!r}, title={self.title!r})"
+
+
+class ItemTrigramIndexIta(peewee_utils.BaseFtsModelModel):
+    """
+    Italian companion index table with the trigram tokenizer, for substring
+     searches (eg. "zamp" matches "zampino"). With external-content.
+    Kept updated only when settings.IS_SUBSTRING_MODE_ENABLED.
+    Docs:
+        https://sqlite.org/fts5.html#the_trigram_tokenizer
+    """
+
+    _LANG = LangEnum.ITA
+    rowid = sqlite_ext.RowIDField()  # Must be named `rowid`.
+    title = sqlite_ext.SearchField()
+    notes = sqlite_ext.SearchField()
+
+    class Meta:
+        options = {
+            "tokenize": "trigram case_sensitive 0",
+            # External-content: a view on item with the decompressed notes.
+            "content": ITEM_CONTENT_VIEW_NAME,
+            "content_rowid": "id",
+        }
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}(rowid={self.rowid!r}, title={self.title!r})"
+
+
+class ItemTrigramIndexEng(peewee_utils.BaseFtsModelModel):
+    """
+    English companion index table with the trigram tokenizer, for substring
+     searches. With external-content.
+    Kept updated only when settings.IS_SUBSTRING_MODE_ENABLED.
+    Docs:
+        https://sqlite.org/fts5.html#the_trigram_tokenizer
+    """
+
+    _LANG = LangEnum.ENG
+    rowid = sqlite_ext.RowIDField()  # Must be named `rowid`.
+    title = sqlite_ext.SearchField()
+    notes = sqlite_ext.SearchField()
+
+    class Meta:
+        options = {
+            "tokenize": "trigram case_sensitive 0",
+            # External-content: a view on item with the decompressed notes.
+            "content": ITEM_CONTENT_VIEW_NAME,
+            "content_rowid": "id",
+        }
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}(rowid={self.rowid!r}, title={self.title!r})"
+
+
+class PassageModel(peewee_utils.BasePeeweeModel):
+    """
+    Passage mode: the notes of an item split in fixed-size overlapping chunks of
+     words (see chunk_notes()), indexed by PassageFTSIndexIta/Eng so that the
+     tokenization, snippets and bm25 length normalization work on bounded texts.
+    The rows are written only by the triggers on item, when
+     settings.IS_PASSAGE_MODE_ENABLED.
+    """
+
+    id: int = peewee.AutoField()
+    # Not a ForeignKeyField as the rows are managed by triggers only.
+    item_id: int = peewee.IntegerField(index=True)
+    lang: str = peewee.FixedCharField(
+        max_length=1, choices=[(x.value, x.name) for x in LangEnum]
+    )
+    # Position of the passage in the notes, starting from 0.
+    position: int = peewee.IntegerField()
+    # A copy of the item's title, so that title searches work in passage mode too.
+    title: str = peewee.CharField(max_length=512)
+    # The chunk of the item's notes.
+    notes: str = peewee.TextField(null=True)
+
+    class Meta:
+        table_name = "passage"
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}(id={self.id!r}, item_id={self.item_id!r}, position={self.position!r})"
+
+
+class PassageFTSIndexIta(peewee_utils.BaseFtsModelModel):
+    """
+    Italian index table of the passages, with external-content.
+    """
+
+    _LANG = LangEnum.ITA
+    rowid = sqlite_ext.RowIDField()  # Must be named `rowid`.
+    title = sqlite_ext.SearchField()
+    notes = sqlite_ext.SearchField()
+
+    class Meta:
+        options = {
+            "tokenize": "snowball italian unicode61 remove_diacritics 0",
+            # External-content.
+            "content": PassageModel,
+        }
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}(rowid={self.rowid!r}, title={self.title!r})"
+
+
+class PassageFTSIndexEng(peewee_utils.BaseFtsModelModel):
+    """
+    English index table of the passages, with external-content.
+    """
+
+    _LANG = LangEnum.ENG
+    rowid = sqlite_ext.RowIDField()  # Must be named `rowid`.
+    title = sqlite_ext.SearchField()
+    notes = sqlite_ext.SearchField()
+
     class Meta:
         options = {
             "tokenize": "snowball english unicode61 remove_diacritics 2",
             # External-content.
-            "content": ItemModel,
+            "content": PassageModel,
         }
 
     def __repr__(self) -> str:
         return f"{self.__class__.__name__}(rowid={self.rowid!r}, title={self.title!r})"
 
 
+class CounterModel(peewee_utils.BasePeeweeModel):
+    """
+    Named counters, eg. ITEM_WRITES_COUNTER which is bumped by triggers on every
+     write on item, and so it works as a data version for caches.
+    """
+
+    name: str = peewee.CharField(max_length=64, primary_key=True)
+    value: int = peewee.IntegerField(default=0)
+
+    class Meta:
+        table_name = "counter"
+
+    @classmethod
+    def increment(cls, name: str, by: int = 1) -> None:
+        cls.insert(name=name, value=by).on_conflict(
+            conflict_target=[cls.name], update={cls.value: cls.value + by}
+        ).execute()
+
+    @classmethod
+    def set_value(cls, name: str, value: int) -> None:
+        cls.replace(name=name, value=value).execute()
+
+    @classmethod
+    def get_value(cls, name: str) -> int:
+        counter = cls.get_or_none(cls.name == name)
+        return counter.value if counter else 0
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}(name={self.name!r}, value={self.value!r})"
+
+
+ITEM_WRITES_COUNTER = "item_writes"
+# The last item id, in the sharded layout: ids are allocated in the main DB, as they
+#  are global, see ShardDomain.
+ITEM_IDS_COUNTER = "item_ids"
+# The version of the last change applied, in a replica, see ChangeJournalDomain.
+REPLICA_CURSOR_COUNTER = "replica_cursor"
+
+
+class SearchCacheEntryModel(peewee_utils.BasePeeweeModel):
+    """
+    Cached search results, see SearchCacheDomain.
+    """
+
+    # Hash of the compiled query, lang, page, search mode and ranking config.
+    key: str = peewee.CharField(max_length=64, primary_key=True)
+    # Value of ITEM_WRITES_COUNTER when the results were cached: the entry is stale
+    #  when it differs from the current value.
+    item_writes: int = peewee.IntegerField()
+    # Serialized results (JSON).
+    results: str = peewee.TextField()
+    last_used_at: datetime = peewee_utils.UtcDateTimeField(
+        default=datetime_utils.now_utc, index=True
+    )
+
+    class Meta:
+        table_name = "searchcacheentry"
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}(key={self.key!r}, item_writes={self.item_writes!r})"
+
+
+class ReindexCheckpointModel(peewee_utils.BasePeeweeModel):
+    """
+    Progress of an online reindex, see ReindexDomain.
+    """
+
+    # The live index table being rebuilt.
+    index_table: str = peewee.CharField(max_length=64, primary_key=True)
+    # The FTS5 tokenize option of the shadow index.
+    tokenize: str = peewee.CharField(max_length=512)
+    # The items with id <= last_item_id are already in the shadow index.
+    last_item_id: int = peewee.IntegerField(default=0)
+    created_at: datetime = peewee_utils.UtcDateTimeField(default=datetime_utils.now_utc)
+
+    class Meta:
+        table_name = "reindexcheckpoint"
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}(index_table={self.index_table!r}, last_item_id={self.last_item_id!r})"
+
+
+class ArchivePartitionModel(peewee_utils.BasePeeweeModel):
+    """
+    An archive DB file with the items created in a year, see ArchiveDomain.
+    """
+
+    year: int = peewee.IntegerField(primary_key=True)
+    path: str = peewee.CharField(max_length=1024)
+    # Range of the `created_at` of the archived items, for partition pruning.
+    min_created_at: datetime = peewee_utils.UtcDateTimeField()
+    max_created_at: datetime = peewee_utils.UtcDateTimeField()
+    n_items: int = peewee.IntegerField(default=0)
+
+    class Meta:
+        table_name = "archivepartition"
+
+    def __repr__(self) -> str:
+        return (
+            f"{self.__class__.__name__}(year={self.year!r}, n_items={self.n_items!r})"
+        )
+
+
+class ShardModel(peewee_utils.BasePeeweeModel):
+    """
+    A shard DB file of the sharded layout, see ShardDomain.
+    """
+
+    number: int = peewee.IntegerField(primary_key=True)
+    path: str = peewee.CharField(max_length=1024)
+
+    class Meta:
+        table_name = "shard"
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}(number={self.number!r}, path={self.path!r})"
+
+
+class SlowQueryModel(peewee_utils.BasePeeweeModel):
+    """
+    A search logged for being slow, or sampled, see SlowQueryLogDomain.
+    """
+
+    # The compiled FTS5 query: the normalized search text.
+    query: str = peewee.TextField()
+    lang: str = peewee.FixedCharField(
+        max_length=1, choices=[(x.value, x.name) for x in LangEnum]
+    )
+    mode: str = peewee.CharField(max_length=16)
+    duration_ms: float = peewee.FloatField()
+    n_results: int = peewee.IntegerField()
+    # The latency breakdown by phase (JSON), see SearchStatsRecorder.
+    phases: str = peewee.TextField()
+    # Logged by sampling (it can be slow too), else for being slow.
+    is_sampled: bool = peewee.BooleanField(default=False)
+    created_at: datetime = peewee_utils.UtcDateTimeField(
+        default=datetime_utils.now_utc, index=True
+    )
+
+    class Meta:
+        table_name = "slowquery"
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}(query={self.query!r}, duration_ms={self.duration_ms!r})"
+
+
+class ChangeModel(peewee_utils.BasePeeweeModel):
+    """
+    The change journal: the last write on each item, see ChangeJournalDomain.
+    The rows are written only by the triggers on item, when
+     settings.IS_CHANGE_JOURNAL_ENABLED.
+    """
+
+    # Not a ForeignKeyField as the rows are managed by triggers only, and they
+    #  outlive the deleted items.
+    item_id: int = peewee.IntegerField(primary_key=True)
+    # The op of the last write: ChangeOpEnum.
+    op: str = peewee.FixedCharField(max_length=1)
+    # Increasing: the version of the journal at the last write on the item. It is
+    #  the cursor of the replicas.
+    version: int = peewee.IntegerField(unique=True)
+
+    class Meta:
+        table_name = "change"
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}(item_id={self.item_id!r}, op={self.op!r}, version={self.version!r})"
+
+
+class ItemSignatureModel(peewee_utils.BasePeeweeModel):
+    """
+    The MinHash signature of an item, for the near-duplicate detection at ingest,
+     see DedupeDomain. The rows are deleted by the triggers on item when the item
+     is deleted or its text updated.
+    """
+
+    item_id: int = peewee.IntegerField(primary_key=True)
+    # The MinHash values, packed as unsigned 32-bit ints.
+    signature: bytes = peewee.BlobField()
+    # The most similar item, when flagged as a near-duplicate of it.
+    duplicate_of_id: int | None = peewee.IntegerField(null=True, index=True)
+    similarity: float | None = peewee.FloatField(null=True)
+
+    class Meta:
+        table_name = "itemsignature"
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}(item_id={self.item_id!r}, duplicate_of_id={self.duplicate_of_id!r})"
+
+
+class LshBandModel(peewee_utils.BasePeeweeModel):
+    """
+    The LSH banding table, see DedupeDomain: the hash of each band of the
+     signature of an item. The items with a band hash in common are the candidate
+     near-duplicates, looked up by the primary key index.
+    """
+
+    # The hash of the band number and its MinHash values, as a signed 64-bit int.
+    hash: int = peewee.IntegerField()
+    item_id: int = peewee.IntegerField(index=True)
+
+    class Meta:
+        table_name = "lshband"
+        primary_key = peewee.CompositeKey("hash", "item_id")
+
+    def __repr__(self) -> str:
+        return (
+            f"{self.__class__.__name__}(hash={self.hash!r}, item_id={self.item_id!r})"
+        )
+
+
 def get_index_class_for_lang(
     lang: LangEnum | str,
 ) -> Type[ItemFTSIndexIta | ItemFTSIndexEng]:
@@ -102,15 +487,97 @@ def get_index_class_for_lang(
             return klass
 
 
+def get_trigram_index_class_for_lang(
+    lang: LangEnum | str,
+) -> Type[ItemTrigramIndexIta | ItemTrigramIndexEng]:
+    lang = LangEnum(lang)
+    for klass in (ItemTrigramIndexIta, ItemTrigramIndexEng):
+        if klass._LANG == lang:
+            return klass
+
+
+def get_passage_index_class_for_lang(
+    lang: LangEnum | str,
+) -> Type[PassageFTSIndexIta | PassageFTSIndexEng]:
+    lang = LangEnum(lang)
+    for klass in (PassageFTSIndexIta, PassageFTSIndexEng):
+        if klass._LANG == lang:
+            return klass
+
+
+def chunk_notes(notes: str | None) -> str:
+    """
+    Split the notes in chunks of settings.PASSAGE_SIZE_N_WORDS words, overlapping
+     by settings.PASSAGE_OVERLAP_N_WORDS, and return them as a JSON array.
+    Chunks are slices of the original text (from the first word to the last one)
+     so the snippets look like the notes. Empty notes make a single null chunk, so
+     that every item has at least 1 passage (for title searches).
+    Registered as SQL function, used by the passage triggers with json_each().
+    """
+    spans = [x.span() for x in re.finditer(r"\S+", notes or "")]
+    if not spans:
+        return json.dumps([None])
+    step = max(settings.PASSAGE_SIZE_N_WORDS - settings.PASSAGE_OVERLAP_N_WORDS, 1)
+    chunks = []
+    for start in range(0, len(spans), step):
+        end = min(start + settings.PASSAGE_SIZE_N_WORDS, len(spans))
+        chunks.append(notes[spans[start][0] : spans[end - 1][1]])
+        if end == len(spans):
+            break
+    return json.dumps(chunks)
+
+
 # Register all tables.
-peewee_utils.register_tables(ItemModel, ItemFTSIndexIta, ItemFTSIndexEng)
+peewee_utils.register_tables(
+    ItemModel,
+    ItemFTSIndexIta,
+    ItemFTSIndexEng,
+    ItemTrigramIndexIta,
+    ItemTrigramIndexEng,
+    PassageModel,
+    PassageFTSIndexIta,
+    PassageFTSIndexEng,
+    CounterModel,
+    SearchCacheEntryModel,
+    ReindexCheckpointModel,
+    ArchivePartitionModel,
+    ShardModel,
+    SlowQueryModel,
+    ChangeModel,
+    ItemSignatureModel,
+    LshBandModel,
+)
+
+# The custom SQL functions, by name. Registered with peewee_utils and, by
+#  db_utils.connect(), on the raw connections opened outside of Peewee.
+SQL_FUNCTIONS: dict[str, tuple[Callable, int]] = {}
+
+
+def _register_sql_function(fn: Callable, name: str, n_params: int) -> None:
+    SQL_FUNCTIONS[name] = (fn, n_params)
+    peewee_utils.register_sql_function(fn, name, n_params)
+
+
+# Add a custom SQL function to decompress item.notes, see CompressedTextField.
+DECOMPRESS_FUNCTION_NAME = "decompress"
+_register_sql_function(decompress, DECOMPRESS_FUNCTION_NAME, 1)
+
+# Register the VIEW used as external-content by the FTS indexes on item, so that
+#  they index (and snippet() reads) the decompressed notes.
+peewee_utils.register_trigger(
+    f"""
+CREATE VIEW IF NOT EXISTS {ITEM_CONTENT_VIEW_NAME} AS
+SELECT id, title, {DECOMPRESS_FUNCTION_NAME}(notes) AS notes, lang
+FROM item;
+"""
+)
 
 # Add a custom SQL function that serves as feature toggle for the updated_at triggers.
 #  It returns 1 (True) always and it's invoked by every updated_at trigger.
 #  We can overwrite this function to return 0 in order to temp disable triggers.
 #  See gymiq/tests/testfactories/domains/exercise_domain_factory.py.
 UPDATED_AT_TRIGGERS_TOGGLE_FUNCTION_NAME = "are_updated_at_triggers_enabled"
-peewee_utils.register_sql_function(
+_register_sql_function(
     lambda: 1,
     UPDATED_AT_TRIGGERS_TOGGLE_FUNCTION_NAME,
     0,
@@ -127,11 +594,19 @@ FOR EACH ROW
 WHEN (SELECT {UPDATED_AT_TRIGGERS_TOGGLE_FUNCTION_NAME}()) = 1
 BEGIN
     UPDATE item
-    SET updated_at = STRFTIME('%Y-%m-%d %H:%M:%f', 'NOW');
+    SET updated_at = STRFTIME('%Y-%m-%d %H:%M:%f', 'NOW')
+    WHERE id = new.id;
 END;
 """
 )
 
+# The columns of item in the `AFTER UPDATE OF` of the triggers on update below: so
+#  they do not fire a 2nd time for the nested UPDATE of updated_at made by the
+#  trigger above. The indexes read only the indexed columns, while the counter of
+#  writes and the change journal track all the columns but updated_at.
+ITEM_INDEXED_COLUMNS_SQL = "title, notes, lang"
+ITEM_WRITTEN_COLUMNS_SQL = "id, created_at, title, notes, lang"
+
 # Register TRIGGERS to keep **ItemFTSIndexIta** automatically updated with ItemModel.
 # Docs: https://sqlite.org/fts5.html#external_content_tables
 peewee_utils.register_trigger(
@@ -141,7 +616,7 @@ AFTER INSERT ON item
 FOR EACH ROW
 WHEN new.lang = 'I'
 BEGIN
-    INSERT INTO itemftsindexita(rowid, title, notes) VALUES (new.id, new.title, new.notes);
+    INSERT INTO itemftsindexita(rowid, title, notes) VALUES (new.id, new.title, decompress(new.notes));
 END;
 """
 )
@@ -152,57 +627,57 @@ AFTER DELETE ON item
 FOR EACH ROW
 WHEN old.lang = 'I'
 BEGIN
-    INSERT INTO itemftsindexita(itemftsindexita, rowid, title, notes) VALUES('delete', old.id, old.title, old.notes);
+    INSERT INTO itemftsindexita(itemftsindexita, rowid, title, notes) VALUES('delete', old.id, old.title, decompress(old.notes));
 END;
 """
 )
 # The next 4 triggers manages the update on item in the 4 cases when the old and new
 #  language can be both ita, both eng, or one ita and one eng.
 peewee_utils.register_trigger(
-    """
+    f"""
 CREATE TRIGGER IF NOT EXISTS update_indices_after_update_on_item_1
-AFTER UPDATE ON item
+AFTER UPDATE OF {ITEM_INDEXED_COLUMNS_SQL} ON item
 FOR EACH ROW
 WHEN old.lang = 'I' AND new.lang = 'I'
 BEGIN
-    INSERT INTO itemftsindexita(itemftsindexita, rowid, title, notes) VALUES('delete', old.id, old.title, old.notes);
-    INSERT INTO itemftsindexita(rowid, title, notes) VALUES (new.id, new.title, new.notes);
+    INSERT INTO itemftsindexita(itemftsindexita, rowid, title, notes) VALUES('delete', old.id, old.title, decompress(old.notes));
+    INSERT INTO itemftsindexita(rowid, title, notes) VALUES (new.id, new.title, decompress(new.notes));
 END;
 """
 )
 peewee_utils.register_trigger(
-    """
+    f"""
 CREATE TRIGGER IF NOT EXISTS update_indices_after_update_on_item_2
-AFTER UPDATE ON item
+AFTER UPDATE OF {ITEM_INDEXED_COLUMNS_SQL} ON item
 FOR EACH ROW
 WHEN old.lang = 'I' AND new.lang = 'E'
 BEGIN
-    INSERT INTO itemftsindexita(itemftsindexita, rowid, title, notes) VALUES('delete', old.id, old.title, old.notes);
-    INSERT INTO itemftsindexeng(rowid, title, notes) VALUES (new.id, new.title, new.notes);
+    INSERT INTO itemftsindexita(itemftsindexita, rowid, title, notes) VALUES('delete', old.id, old.title, decompress(old.notes));
+    INSERT INTO itemftsindexeng(rowid, title, notes) VALUES (new.id, new.title, decompress(new.notes));
 END;
 """
 )
 peewee_utils.register_trigger(
-    """
+    f"""
 CREATE TRIGGER IF NOT EXISTS update_indices_after_update_on_item_3
-AFTER UPDATE ON item
+AFTER UPDATE OF {ITEM_INDEXED_COLUMNS_SQL} ON item
 FOR EACH ROW
 WHEN old.lang = 'E' AND new.lang = 'I'
 BEGIN
-    INSERT INTO itemftsindexeng(itemftsindexeng, rowid, title, notes) VALUES('delete', old.id, old.title, old.notes);
-    INSERT INTO itemftsindexita(rowid, title, notes) VALUES (new.id, new.title, new.notes);
+    INSERT INTO itemftsindexeng(itemftsindexeng, rowid, title, notes) VALUES('delete', old.id, old.title, decompress(old.notes));
+    INSERT INTO itemftsindexita(rowid, title, notes) VALUES (new.id, new.title, decompress(new.notes));
 END;
 """
 )
 peewee_utils.register_trigger(
-    """
+    f"""
 CREATE TRIGGER IF NOT EXISTS update_indices_after_update_on_item_4
-AFTER UPDATE ON item
+AFTER UPDATE OF {ITEM_INDEXED_COLUMNS_SQL} ON item
 FOR EACH ROW
 WHEN old.lang = 'E' AND new.lang = 'E'
 BEGIN
-    INSERT INTO itemftsindexeng(itemftsindexeng, rowid, title, notes) VALUES('delete', old.id, old.title, old.notes);
-    INSERT INTO itemftsindexeng(rowid, title, notes) VALUES (new.id, new.title, new.notes);
+    INSERT INTO itemftsindexeng(itemftsindexeng, rowid, title, notes) VALUES('delete', old.id, old.title, decompress(old.notes));
+    INSERT INTO itemftsindexeng(rowid, title, notes) VALUES (new.id, new.title, decompress(new.notes));
 END;
 """
 )
@@ -216,7 +691,7 @@ AFTER INSERT ON item
 FOR EACH ROW
 WHEN new.lang = 'E'
 BEGIN
-    INSERT INTO itemftsindexeng(rowid, title, notes) VALUES (new.id, new.title, new.notes);
+    INSERT INTO itemftsindexeng(rowid, title, notes) VALUES (new.id, new.title, decompress(new.notes));
 END;
 """
 )
@@ -227,16 +702,260 @@ AFTER DELETE ON item
 FOR EACH ROW
 WHEN old.lang = 'E'
 BEGIN
-    INSERT INTO itemftsindexeng(itemftsindexeng, rowid, title, notes) VALUES('delete', old.id, old.title, old.notes);
+    INSERT INTO itemftsindexeng(itemftsindexeng, rowid, title, notes) VALUES('delete', old.id, old.title, decompress(old.notes));
+END;
+"""
+)
+
+
+def get_index_triggers_sql(
+    index_table: str,
+    lang: LangEnum,
+    max_item_id_sql: str | None = None,
+    toggle_function_name: str | None = None,
+) -> list[str]:
+    """
+    Return the SQL of the TRIGGERS to keep an index table with external-content on
+     item, restricted to the given lang, automatically updated with ItemModel.
+    It is the same logic of the triggers above, but the update is managed by
+     a single trigger with conditional statements.
+    If `max_item_id_sql` is given, only the items with id <= its value are mirrored
+     (see ReindexDomain).
+    If `toggle_function_name` is given, the triggers run only when that SQL function
+     returns 1.
+    """
+    old_cond = f"old.lang = '{lang.value}'"
+    new_cond = f"new.lang = '{lang.value}'"
+    if max_item_id_sql:
+        old_cond += f" AND old.id <= ({max_item_id_sql})"
+        new_cond += f" AND new.id <= ({max_item_id_sql})"
+    if toggle_function_name:
+        old_cond += f" AND (SELECT {toggle_function_name}()) = 1"
+        new_cond += f" AND (SELECT {toggle_function_name}()) = 1"
+    return [
+        f"""
+CREATE TRIGGER IF NOT EXISTS update_{index_table}_after_insert_on_item
+AFTER INSERT ON item
+FOR EACH ROW
+WHEN {new_cond}
+BEGIN
+    INSERT INTO {index_table}(rowid, title, notes) VALUES (new.id, new.title, decompress(new.notes));
+END;
+""",
+        f"""
+CREATE TRIGGER IF NOT EXISTS update_{index_table}_after_delete_on_item
+AFTER DELETE ON item
+FOR EACH ROW
+WHEN {old_cond}
+BEGIN
+    INSERT INTO {index_table}({index_table}, rowid, title, notes) VALUES('delete', old.id, old.title, decompress(old.notes));
+END;
+""",
+        f"""
+CREATE TRIGGER IF NOT EXISTS update_{index_table}_after_update_on_item
+AFTER UPDATE OF {ITEM_INDEXED_COLUMNS_SQL} ON item
+FOR EACH ROW
+WHEN ({old_cond}) OR ({new_cond})
+BEGIN
+    INSERT INTO {index_table}({index_table}, rowid, title, notes) SELECT 'delete', old.id, old.title, decompress(old.notes) WHERE {old_cond};
+    INSERT INTO {index_table}(rowid, title, notes) SELECT new.id, new.title, decompress(new.notes) WHERE {new_cond};
+END;
+""",
+    ]
+
+
+def get_index_triggers_names(index_table: str) -> list[str]:
+    return [
+        f"update_{index_table}_after_{op}_on_item"
+        for op in ("insert", "delete", "update")
+    ]
+
+
+# Add a custom SQL function that serves as feature toggle for the triggers of the
+#  trigram indexes (it reads the settings at every call, like the passage mode one).
+SUBSTRING_MODE_TOGGLE_FUNCTION_NAME = "is_substring_mode_enabled"
+_register_sql_function(
+    lambda: int(settings.IS_SUBSTRING_MODE_ENABLED),
+    SUBSTRING_MODE_TOGGLE_FUNCTION_NAME,
+    0,
+)
+
+# Register TRIGGERS to keep the trigram indexes automatically updated with ItemModel,
+#  when the substring mode is enabled.
+for _index_class in (ItemTrigramIndexIta, ItemTrigramIndexEng):
+    for _sql in get_index_triggers_sql(
+        _index_class._meta.table_name,
+        _index_class._LANG,
+        toggle_function_name=SUBSTRING_MODE_TOGGLE_FUNCTION_NAME,
+    ):
+        peewee_utils.register_trigger(_sql)
+
+# Add custom SQL functions for the passage mode: a feature toggle (it reads the
+#  settings at every call, so it can be switched at runtime) and the chunker.
+PASSAGE_MODE_TOGGLE_FUNCTION_NAME = "is_passage_mode_enabled"
+_register_sql_function(
+    lambda: int(settings.IS_PASSAGE_MODE_ENABLED),
+    PASSAGE_MODE_TOGGLE_FUNCTION_NAME,
+    0,
+)
+CHUNK_NOTES_FUNCTION_NAME = "chunk_notes"
+_register_sql_function(chunk_notes, CHUNK_NOTES_FUNCTION_NAME, 1)
+
+# Register TRIGGERS to keep **PassageModel** automatically updated with ItemModel.
+#  Mind that CTEs are not allowed in triggers, hence json_each().
+peewee_utils.register_trigger(
+    f"""
+CREATE TRIGGER IF NOT EXISTS update_passage_after_insert_on_item
+AFTER INSERT ON item
+FOR EACH ROW
+WHEN (SELECT {PASSAGE_MODE_TOGGLE_FUNCTION_NAME}()) = 1
+BEGIN
+    INSERT INTO passage(item_id, lang, position, title, notes)
+    SELECT new.id, new.lang, chunk.key, new.title, chunk.value
+    FROM json_each({CHUNK_NOTES_FUNCTION_NAME}({DECOMPRESS_FUNCTION_NAME}(new.notes))) AS chunk;
+END;
+"""
+)
+peewee_utils.register_trigger(
+    """
+CREATE TRIGGER IF NOT EXISTS update_passage_after_delete_on_item
+AFTER DELETE ON item
+FOR EACH ROW
+BEGIN
+    DELETE FROM passage WHERE item_id = old.id;
+END;
+"""
+)
+peewee_utils.register_trigger(
+    f"""
+CREATE TRIGGER IF NOT EXISTS update_passage_after_update_on_item
+AFTER UPDATE OF {ITEM_INDEXED_COLUMNS_SQL} ON item
+FOR EACH ROW
+BEGIN
+    DELETE FROM passage WHERE item_id = old.id;
+    INSERT INTO passage(item_id, lang, position, title, notes)
+    SELECT new.id, new.lang, chunk.key, new.title, chunk.value
+    FROM json_each({CHUNK_NOTES_FUNCTION_NAME}({DECOMPRESS_FUNCTION_NAME}(new.notes))) AS chunk
+    WHERE (SELECT {PASSAGE_MODE_TOGGLE_FUNCTION_NAME}()) = 1;
 END;
 """
 )
 
+# Register TRIGGERS to keep **PassageFTSIndexIta/Eng** automatically updated with
+#  PassageModel. Passages are never updated, only inserted and deleted.
+for _index_class in (PassageFTSIndexIta, PassageFTSIndexEng):
+    _index_table = _index_class._meta.table_name
+    peewee_utils.register_trigger(
+        f"""
+CREATE TRIGGER IF NOT EXISTS update_{_index_table}_after_insert_on_passage
+AFTER INSERT ON passage
+FOR EACH ROW
+WHEN new.lang = '{_index_class._LANG.value}'
+BEGIN
+    INSERT INTO {_index_table}(rowid, title, notes) VALUES (new.id, new.title, new.notes);
+END;
+"""
+    )
+    peewee_utils.register_trigger(
+        f"""
+CREATE TRIGGER IF NOT EXISTS update_{_index_table}_after_delete_on_passage
+AFTER DELETE ON passage
+FOR EACH ROW
+WHEN old.lang = '{_index_class._LANG.value}'
+BEGIN
+    INSERT INTO {_index_table}({_index_table}, rowid, title, notes) VALUES('delete', old.id, old.title, old.notes);
+END;
+"""
+    )
+
+# Register TRIGGERS to bump the ITEM_WRITES_COUNTER on every write on item.
+for _op, _when in (
+    ("insert", "INSERT"),
+    ("update", f"UPDATE OF {ITEM_WRITTEN_COLUMNS_SQL}"),
+    ("delete", "DELETE"),
+):
+    peewee_utils.register_trigger(
+        f"""
+CREATE TRIGGER IF NOT EXISTS bump_item_writes_counter_after_{_op}_on_item
+AFTER {_when} ON item
+FOR EACH ROW
+BEGIN
+    INSERT INTO counter(name, value) VALUES ('{ITEM_WRITES_COUNTER}', 1)
+    ON CONFLICT(name) DO UPDATE SET value = value + 1;
+END;
+"""
+    )
+
+# Add a custom SQL function that serves as feature toggle for the change journal
+#  triggers (it reads the settings at every call, like the passage mode one).
+CHANGE_JOURNAL_TOGGLE_FUNCTION_NAME = "is_change_journal_enabled"
+_register_sql_function(
+    lambda: int(settings.IS_CHANGE_JOURNAL_ENABLED),
+    CHANGE_JOURNAL_TOGGLE_FUNCTION_NAME,
+    0,
+)
+
+# Register TRIGGERS to log every write on item to the change journal,
+#  **ChangeModel**: a single row per item, with the last op and a new version.
+#  Mind that the version is allocated with MAX() + 1 on the unique index, which is
+#  safe as SQLite has a single writer.
+for _op, _when, _row in (
+    ("insert", "INSERT", "new"),
+    ("update", f"UPDATE OF {ITEM_WRITTEN_COLUMNS_SQL}", "new"),
+    ("delete", "DELETE", "old"),
+):
+    peewee_utils.register_trigger(
+        f"""
+CREATE TRIGGER IF NOT EXISTS log_change_after_{_op}_on_item
+AFTER {_when} ON item
+FOR EACH ROW
+WHEN (SELECT {CHANGE_JOURNAL_TOGGLE_FUNCTION_NAME}()) = 1
+BEGIN
+    INSERT INTO change(item_id, op, version)
+    VALUES ({_row}.id, '{_op[0].upper()}', (SELECT IFNULL(MAX(version), 0) + 1 FROM change))
+    ON CONFLICT(item_id) DO UPDATE SET op = excluded.op, version = excluded.version;
+END;
+"""
+    )
+
+
+# Register TRIGGERS to delete the signature of an item, for the dedupe, when it is
+#  deleted or its text is updated (its signature is then stale, and it is not
+#  compared to the new items anymore).
+for _op, _when in (("delete", "DELETE"), ("update", "UPDATE OF title, notes")):
+    peewee_utils.register_trigger(
+        f"""
+CREATE TRIGGER IF NOT EXISTS delete_itemsignature_after_{_op}_on_item
+AFTER {_when} ON item
+FOR EACH ROW
+BEGIN
+    DELETE FROM itemsignature WHERE item_id = old.id;
+    DELETE FROM lshband WHERE item_id = old.id;
+END;
+"""
+    )
+
+
 # At last, configure peewee_utils with the SQLite DB path.
 # Using lambda functions, instead of actual values, for lazy init, which is necessary
 #  when overriding settings in tests.
+def get_load_extensions() -> tuple[Path, ...]:
+    return (settings.SQLITE_EXT_SNOWBALL_PATH,)
+
+
+def get_db_path() -> str:
+    """
+    Return settings.DB_PATH or, in snapshot mode (settings.IS_DB_SNAPSHOT_MODE), its
+     URI filename to open it read-only and immutable.
+    Docs: https://sqlite.org/uri.html#uriimmutable
+    """
+    if not settings.IS_DB_SNAPSHOT_MODE:
+        return settings.DB_PATH
+    return f"{Path(settings.DB_PATH).resolve().as_uri()}?mode=ro&immutable=1"
+
+
 peewee_utils.configure(
-    get_sqlite_db_path_fn=lambda: settings.DB_PATH,
+    get_sqlite_db_path_fn=get_db_path,
     get_do_log_peewee_queries_fn=lambda: settings.DO_LOG_PEEWEE_QUERIES,
-    get_load_extensions_fn=lambda: (settings.SQLITE_EXT_SNOWBALL_MACOS_PATH,),
+    get_load_extensions_fn=get_load_extensions,
 )
@@ -0,0 +1,507 @@
+"""
+Low-level helpers that work directly on the SQLite connection used by Peewee.
+"""
+
+import contextlib
+import ctypes
+import functools
+import logging
+import re
+import sqlite3
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Type, TypeVar
+
+import peewee
+from playhouse import sqlite_ext
+
+from ..conf import settings
+from .db_models import (
+    ITEM_CONTENT_VIEW_NAME,
+    SQL_FUNCTIONS,
+    ItemFTSIndexEng,
+    ItemFTSIndexIta,
+    ItemModel,
+    ItemTrigramIndexEng,
+    ItemTrigramIndexIta,
+    get_load_extensions,
+)
+from .sqlite_capi import (
+    SQLITE_TRACE_PROFILE,
+    SQLITE_TRACE_ROW,
+    SQLITE_TRACE_STMT,
+    TRACE_CALLBACK_TYPE,
+    get_expanded_sql,
+    get_handle,
+    get_lib,
+)
+
+ModelT = TypeVar("ModelT", bound=peewee.Model)
+
+# The objects copied by clone_item_schema().
+ITEM_SCHEMA_TABLES = ("item", ITEM_CONTENT_VIEW_NAME) + tuple(
+    x._meta.table_name
+    for x in (
+        ItemFTSIndexIta,
+        ItemFTSIndexEng,
+        ItemTrigramIndexIta,
+        ItemTrigramIndexEng,
+    )
+)
+
+# N. of queries aborted by `query_budget` in this process. Useful for monitoring in
+#  long-lived processes (eg. a Lambda).
+_aborted_queries_count = 0
+
+
+class BaseDbUtilsException(Exception):
+    pass
+
+
+class QueryBudgetExceeded(BaseDbUtilsException):
+    pass
+
+
+def get_db() -> peewee.Database:
+    return ItemModel._meta.database
+
+
+def get_connection() -> sqlite3.Connection:
+    """
+    Get the raw sqlite3 connection currently used by Peewee.
+    """
+    return get_db().connection()
+
+
+def connect(path: str | Path) -> sqlite3.Connection:
+    """
+    Open a raw sqlite3 connection to the given DB file, outside of Peewee, with the
+     same extensions and custom SQL functions.
+    Useful to query many DB files in parallel threads, as sqlite3 releases the GIL
+     while SQLite works.
+    """
+    connection = sqlite3.connect(path)
+    # Missing extensions are skipped: SQLite fails anyway when they are used, eg.
+    #  with "no such tokenizer: snowball".
+    extensions = [x for x in get_load_extensions() if Path(x).exists()]
+    if extensions:
+        connection.enable_load_extension(True)
+        for extension in extensions:
+            connection.load_extension(str(extension))
+        connection.enable_load_extension(False)
+    for name, (fn, n_params) in SQL_FUNCTIONS.items():
+        connection.create_function(name, n_params, fn)
+    return connection
+
+
+def is_read_only(schema: str = "main") -> bool:
+    """
+    Return True if the DB `schema` of the current connection cannot be written, eg.
+     it was opened read-only: a write is attempted within a savepoint, always
+     rolled back.
+    """
+    connection = get_connection()
+    connection.execute("SAVEPOINT is_read_only;")
+    try:
+        connection.execute(f"CREATE TABLE {schema}._is_read_only_check (id INTEGER);")
+    except sqlite3.OperationalError as exc:
+        # The primary result code, in the low byte of the extended one.
+        if exc.sqlite_errorcode & 0xFF == sqlite3.SQLITE_READONLY:
+            return True
+        raise
+    finally:
+        connection.execute("ROLLBACK TO is_read_only;")
+        connection.execute("RELEASE is_read_only;")
+    return False
+
+
+def attach(path: str | Path, schema: str) -> None:
+    """
+    ATTACH the given DB file (created if missing) as `schema`, unless it is already
+     attached to the current connection.
+    """
+    attached = {x[1] for x in get_db().execute_sql("PRAGMA database_list;")}
+    if schema not in attached:
+        get_db().execute_sql(f"ATTACH DATABASE ? AS {schema};", (str(path),))
+
+
+def detach(schema: str) -> None:
+    get_db().execute_sql(f"DETACH DATABASE {schema};")
+
+
+def clone_item_schema(schema: str) -> None:
+    """
+    Create, in the attached DB `schema`, the item table with its FTS indexes, their
+     content view and the triggers that keep them updated, with the same SQL used
+     in the main DB. Existing objects are left untouched.
+    """
+    db = get_db()
+    rows = db.execute_sql(
+        "SELECT type, name, tbl_name, sql FROM main.sqlite_master"
+        " WHERE type IN ('table', 'view', 'trigger') AND sql IS NOT NULL"
+        " ORDER BY rowid;"
+    )
+    for type_, name, tbl_name, sql in rows.fetchall():
+        if type_ == "trigger":
+            # Only the triggers on item writing to the cloned tables (eg. not those
+            #  writing to passage or counter). Mind that the header of the trigger
+            #  (eg. `AFTER UPDATE ON item`) is not searched, only its body.
+            body = re.split(r"\bBEGIN\b", sql, maxsplit=1, flags=re.I)[-1]
+            targets = re.findall(
+                r"(?:INSERT INTO|DELETE FROM|UPDATE)\s+\"?(\w+)", body, flags=re.I
+            )
+            if tbl_name != "item" or not set(targets) <= set(ITEM_SCHEMA_TABLES):
+                continue
+        elif name not in ITEM_SCHEMA_TABLES:
+            continue
+        # Mind that the tables referenced in the body of the triggers and views are
+        #  resolved in the schema of the trigger or view itself.
+        sql = re.sub(
+            r"^CREATE\s+(VIRTUAL TABLE|TABLE|VIEW|TRIGGER)\s+(IF NOT EXISTS\s+)?",
+            rf"CREATE \1 IF NOT EXISTS {schema}.",
+            sql,
+            flags=re.I,
+        )
+        db.execute_sql(sql)
+
+
+class _UnqualifiedEntityMetadata(peewee.Metadata):
+    # FTS5 auxiliary functions (bm25, snippet, ...) and MATCH require the bare
+    #  table name, even when the table is in an attached DB.
+    @property
+    def entity(self):
+        return peewee.Entity(self.table_name)
+
+
+@functools.cache
+def get_model_for_schema(model_class: Type[ModelT], schema: str) -> Type[ModelT]:
+    """
+    Return a copy of the given model bound to the table with the same name in the
+     attached DB `schema` (the model itself for "main").
+    """
+    if schema == "main":
+        return model_class
+    meta = dict(schema=schema, table_name=model_class._meta.table_name)
+    if issubclass(model_class, sqlite_ext.FTS5Model):
+        meta["model_metadata_class"] = _UnqualifiedEntityMetadata
+    return type(
+        f"{model_class.__name__}_{schema}",
+        (model_class,),
+        {"Meta": type("Meta", (), meta), "__module__": __name__},
+    )
+
+
+def get_aborted_queries_count() -> int:
+    return _aborted_queries_count
+
+
+class query_budget(contextlib.ContextDecorator):
+    """
+    Abort the queries run within this context when they exceed a time or
+     VM-steps budget, by means of SQLite's progress handler:
+     https://www.sqlite.org/c3ref/progress_handler.html
+
+    Mind that the budget covers only the SQLite work done within the context, so
+     lazy Peewee queries must be fully executed (eg. with `list(query)`) inside it.
+
+    The budget applies to the connection used by Peewee, or to the given one.
+
+    Usage:
+        with query_budget(time_budget_ms=500):
+            items = list(query)
+    """
+
+    def __init__(
+        self,
+        time_budget_ms: int | None = None,
+        vm_steps_budget: int | None = None,
+        connection: sqlite3.Connection | None = None,
+    ):
+        # None or 0 mean no budget.
+        self.time_budget_ms = time_budget_ms or None
+        self.vm_steps_budget = vm_steps_budget or None
+        self.connection = connection
+        self.is_exceeded = False
+        self._connection: sqlite3.Connection | None = None
+        self._deadline: float | None = None
+        self._vm_steps = 0
+
+    def __enter__(self):
+        self.is_exceeded = False
+        self._vm_steps = 0
+        if self.time_budget_ms is None and self.vm_steps_budget is None:
+            return self
+
+        if self.time_budget_ms is not None:
+            self._deadline = time.monotonic() + self.time_budget_ms / 1000
+        self._connection = self.connection or get_connection()
+        self._connection.set_progress_handler(
+            self._progress_handler, settings.SQLITE_PROGRESS_HANDLER_N_STEPS
+        )
+        return self
+
+    def _progress_handler(self) -> int:
+        # Returning non-zero interrupts the running statement, which then fails
+        #  with `sqlite3.OperationalError: interrupted`.
+        self._vm_steps += settings.SQLITE_PROGRESS_HANDLER_N_STEPS
+        if self._deadline is not None and time.monotonic() > self._deadline:
+            self.is_exceeded = True
+        if self.vm_steps_budget is not None and self._vm_steps > self.vm_steps_budget:
+            self.is_exceeded = True
+        return 1 if self.is_exceeded else 0
+
+    def __exit__(self, exc_type, exc_instance, traceback):
+        if self._connection is not None:
+            self._connection.set_progress_handler(None, 0)
+            self._connection = None
+
+        # Peewee wraps the errors raised on execution, but not those raised when
+        #  fetching rows from the cursor.
+        if (
+            self.is_exceeded
+            and exc_type is not None
+            and issubclass(
+                exc_type, (peewee.OperationalError, sqlite3.OperationalError)
+            )
+        ):
+            global _aborted_queries_count
+            _aborted_queries_count += 1
+            raise QueryBudgetExceeded(
+                f"time budget: {self.time_budget_ms} ms, VM steps budget: {self.vm_steps_budget}"
+            ) from exc_instance
+        return False  # Do not suppress the exc.
+
+
+@dataclass
+class TracedSubStatement:
+    n_runs: int = 0
+    # Wall time until the next statement, so it includes the nested triggers.
+    duration_ms: float = 0.0
+
+
+@dataclass
+class TracedStatement:
+    # The SQL, with `?` for the parameters.
+    sql: str
+    # The SQL, with the values of the parameters.
+    expanded_sql: str
+    duration_ms: float = 0.0
+    # Rows returned.
+    n_rows: int = 0
+    # Rows changed by the statement and by the triggers it fired.
+    n_changes: int = 0
+    # The statements run by the triggers (and the triggers themselves, as
+    #  "TRIGGER <name>"), by SQL.
+    sub_statements: dict[str, TracedSubStatement] = field(default_factory=dict)
+    # The output of EXPLAIN QUERY PLAN, filled by sql_trace.explain().
+    plan: list[str] | None = None
+
+
+class sql_trace(contextlib.ContextDecorator):
+    """
+    Record all the SQL statements run within this context, with the statements run
+     by the triggers, their wall time, rows returned and changed, by means of
+     SQLite's sqlite3_trace_v2(): https://sqlite.org/c3ref/trace_v2.html
+
+    The trace applies to the given connection, or to the connections used by Peewee:
+     it is set on them at their first query (see `_InstallTraceHandler`), so even
+     connections opened later within the context are traced.
+    Mind that it replaces the callback set with `sqlite3.Connection.set_trace_callback`,
+     and that traces cannot be nested.
+
+    Usage:
+        with sql_trace() as trace:
+            ItemModel.create(title="Gatta", notes="", lang=LangEnum.ITA)
+        trace.explain()
+        summary = trace.get_summary()
+    """
+
+    def __init__(self, connection: sqlite3.Connection | None = None):
+        self.connection = connection
+        self.statements: list[TracedStatement] = []
+        # The connections traced, by handle.
+        self._connections: dict[int, sqlite3.Connection] = {}
+        # The statements running, by `sqlite3_stmt *`: the statement, its start time
+        #  and the n. of changes at its start.
+        self._running: dict[int, tuple[TracedStatement, int, int]] = {}
+        # The last sub-statement started, and its start time.
+        self._running_sub: tuple[TracedSubStatement, int] | None = None
+        self._is_paused = False
+        # Mind that the ctypes callback must outlive its use by SQLite.
+        self._callback = TRACE_CALLBACK_TYPE(self._on_trace_event)
+        self._logger = logging.getLogger("peewee")
+        self._handler: logging.Handler | None = None
+        self._logger_state: tuple[int, bool] | None = None
+
+    def __enter__(self):
+        if self.connection is not None:
+            self._install(self.connection)
+            return self
+
+        # Peewee logs (at DEBUG level) every query before executing it.
+        self._handler = _InstallTraceHandler(self)
+        self._logger.addHandler(self._handler)
+        if not self._logger.isEnabledFor(logging.DEBUG):
+            self._logger_state = (self._logger.level, self._logger.propagate)
+            self._logger.setLevel(logging.DEBUG)
+            # Do not print the queries.
+            self._logger.propagate = False
+        return self
+
+    def __exit__(self, exc_type, exc_instance, traceback):
+        if self._handler is not None:
+            self._logger.removeHandler(self._handler)
+            self._handler = None
+        if self._logger_state is not None:
+            self._logger.level, self._logger.propagate = self._logger_state
+            self._logger_state = None
+        for connection in self._connections.values():
+            try:
+                handle = get_handle(connection)
+            except sqlite3.ProgrammingError:
+                continue  # Closed.
+            get_lib().sqlite3_trace_v2(handle, 0, TRACE_CALLBACK_TYPE(), None)
+        self._connections = {}
+        self._running = {}
+        self._running_sub = None
+        return False  # Do not suppress the exc.
+
+    def _install(self, connection: sqlite3.Connection) -> None:
+        handle = get_handle(connection)
+        if self._connections.get(handle) is connection:
+            return
+        self._connections[handle] = connection
+        get_lib().sqlite3_trace_v2(
+            handle,
+            SQLITE_TRACE_STMT | SQLITE_TRACE_PROFILE | SQLITE_TRACE_ROW,
+            self._callback,
+            handle,
+        )
+
+    def _on_trace_event(self, event: int, handle: int, stmt: int, x: int) -> int:
+        # Mind that this runs within sqlite3_step(): it must not use the connection.
+        if self._is_paused:
+            return 0
+        now = time.perf_counter_ns()
+        if self._running_sub is not None:
+            sub_statement, start = self._running_sub
+            sub_statement.duration_ms += (now - start) / 1e6
+            self._running_sub = None
+
+        if event == SQLITE_TRACE_STMT:
+            sql = ctypes.string_at(x).decode(errors="replace")
+            if sql.startswith("-- "):
+                # A trigger, or a statement run by a trigger.
+                if stmt in self._running:
+                    sub_statements = self._running[stmt][0].sub_statements
+                    sub_statement = sub_statements.setdefault(
+                        sql[3:], TracedSubStatement()
+                    )
+                    sub_statement.n_runs += 1
+                    self._running_sub = (sub_statement, now)
+                return 0
+            statement = TracedStatement(sql=sql, expanded_sql=get_expanded_sql(stmt))
+            self.statements.append(statement)
+            self._running[stmt] = (
+                statement,
+                now,
+                get_lib().sqlite3_total_changes(handle),
+            )
+        elif event == SQLITE_TRACE_ROW:
+            if stmt in self._running:
+                self._running[stmt][0].n_rows += 1
+        elif event == SQLITE_TRACE_PROFILE:
+            if stmt in self._running:
+                statement, start, n_changes = self._running.pop(stmt)
+                statement.duration_ms = (now - start) / 1e6
+                statement.n_changes = (
+                    get_lib().sqlite3_total_changes(handle) - n_changes
+                )
+        return 0
+
+    def explain(self, connection: sqlite3.Connection | None = None) -> None:
+        """
+        Fill the plans of the statements that read or write tables, with EXPLAIN
+         QUERY PLAN on the given connection, or on the one used by Peewee.
+        """
+        connection = connection or get_connection()
+        plans: dict[str, list[str] | None] = {}
+        self._is_paused = True
+        try:
+            for statement in self.statements:
+                if not re.match(
+                    r"\s*(SELECT|INSERT|UPDATE|DELETE|REPLACE|WITH)\b",
+                    statement.sql,
+                    flags=re.I,
+                ):
+                    continue
+                if statement.sql not in plans:
+                    plans[statement.sql] = _explain_query_plan(
+                        connection, statement.expanded_sql
+                    )
+                statement.plan = plans[statement.sql]
+        finally:
+            self._is_paused = False
+
+    def get_summary(self) -> dict:
+        """
+        Return the totals and the statements grouped by SQL (with `?`), by wall
+         time desc.
+        """
+        groups: dict[str, dict] = {}
+        for statement in self.statements:
+            group = groups.setdefault(
+                statement.sql,
+                dict(
+                    sql=statement.sql,
+                    n_runs=0,
+                    duration_ms=0.0,
+                    n_rows=0,
+                    n_changes=0,
+                    sub_statements={},
+                    plan=statement.plan,
+                ),
+            )
+            group["n_runs"] += 1
+            group["duration_ms"] += statement.duration_ms
+            group["n_rows"] += statement.n_rows
+            group["n_changes"] += statement.n_changes
+            for sql, sub_statement in statement.sub_statements.items():
+                totals = group["sub_statements"].setdefault(
+                    sql, dict(n_runs=0, duration_ms=0.0)
+                )
+                totals["n_runs"] += sub_statement.n_runs
+                totals["duration_ms"] += sub_statement.duration_ms
+        return dict(
+            n_statements=len(self.statements),
+            duration_ms=sum(x.duration_ms for x in self.statements),
+            n_rows=sum(x.n_rows for x in self.statements),
+            n_changes=sum(x.n_changes for x in self.statements),
+            statements=sorted(groups.values(), key=lambda x: -x["duration_ms"]),
+        )
+
+
+class _InstallTraceHandler(logging.Handler):
+    # Set the trace on the connection used by Peewee, right before each query.
+    def __init__(self, trace: sql_trace):
+        super().__init__(logging.DEBUG)
+        self.trace = trace
+
+    def emit(self, record: logging.LogRecord) -> None:
+        self.trace._install(get_connection())
+
+
+def _explain_query_plan(connection: sqlite3.Connection, sql: str) -> list[str] | None:
+    try:
+        rows = connection.execute(f"EXPLAIN QUERY PLAN {sql}").fetchall()
+    except sqlite3.Error:
+        # Eg. a table dropped later, or an ATTACHed DB no more attached.
+        return None
+    # Rows: id, parent id, detail. Indented by depth, like the sqlite3 shell does.
+    depths = {0: -1}
+    plan = []
+    for id_, parent, _, detail in rows:
+        depths[id_] = depths.get(parent, -1) + 1
+        plan.append("  " * depths[id_] + detail)
+    return plan
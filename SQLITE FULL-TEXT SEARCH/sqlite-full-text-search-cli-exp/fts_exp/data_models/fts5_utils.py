@@ -0,0 +1,121 @@
+"""
+Readers and writers of some records of the FTS5 shadow table `%_data`, with the
+ formats of SQLite's fts5_index.c (structure record V1):
+ https://sqlite.org/src/file?name=ext/fts5/fts5_index.c
+"""
+
+import sqlite3
+from dataclasses import dataclass, field
+
+# See fts5_index.c: FTS5_AVERAGES_ROWID, FTS5_STRUCTURE_ROWID and FTS5_DATA_ID_B
+#  (the id of a row of `%_data` is made of the segment id, followed by 37 bits).
+AVERAGES_ROWID = 1
+STRUCTURE_ROWID = 10
+SEGID_SHIFT = 37
+_STRUCTURE_V2_MARKER = b"\xff\x00\x00\x01"
+
+
+class BaseFts5UtilsException(Exception):
+    pass
+
+
+class UnsupportedFts5Format(BaseFts5UtilsException):
+    pass
+
+
+def get_data_block(connection: sqlite3.Connection, table: str, rowid: int) -> bytes:
+    row = connection.execute(
+        f"SELECT block FROM {table}_data WHERE id = ?;", (rowid,)
+    ).fetchone()
+    return row[0] if row else b""
+
+
+def decode_varint(data: bytes, i: int) -> tuple[int, int]:
+    """
+    Decode the SQLite varint at the offset `i`. Return its value and the offset of
+     the next byte.
+    """
+    value = 0
+    for n in range(8):
+        byte = data[i + n]
+        value = (value << 7) | (byte & 0x7F)
+        if byte < 0x80:
+            return value, i + n + 1
+    # The 9th byte has 8 bits.
+    return (value << 8) | data[i + 8], i + 9
+
+
+def encode_varint(value: int) -> bytes:
+    # Mind that the 9-byte form (values >= 2**56) is not needed here.
+    out = [value & 0x7F]
+    value >>= 7
+    while value:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    return bytes(reversed(out))
+
+
+def decode_averages(data: bytes) -> list[int]:
+    """
+    Decode the averages record: the n. of rows followed by the n. of tokens of each
+     column.
+    """
+    values = []
+    i = 0
+    while i < len(data):
+        value, i = decode_varint(data, i)
+        values.append(value)
+    return values
+
+
+@dataclass
+class Fts5Level:
+    # N. of the first segments being merged by an incremental merge.
+    n_merge: int = 0
+    # (segid, pgno_first, pgno_last).
+    segments: list[tuple[int, int, int]] = field(default_factory=list)
+
+
+@dataclass
+class Fts5Structure:
+    """
+    The structure record of an FTS5 index: its segments, by level.
+    """
+
+    cookie: bytes = b"\x00\x00\x00\x00"
+    write_counter: int = 0
+    levels: list[Fts5Level] = field(default_factory=list)
+
+    @classmethod
+    def decode(cls, data: bytes) -> "Fts5Structure":
+        if data[4:8] == _STRUCTURE_V2_MARKER:
+            # Written for contentless_delete tables, not used here.
+            raise UnsupportedFts5Format("FTS5 structure record V2")
+        structure = cls(cookie=data[:4])
+        n_levels, i = decode_varint(data, 4)
+        _, i = decode_varint(data, i)  # Total n. of segments.
+        structure.write_counter, i = decode_varint(data, i)
+        for _ in range(n_levels):
+            level = Fts5Level()
+            level.n_merge, i = decode_varint(data, i)
+            n_segments, i = decode_varint(data, i)
+            for _ in range(n_segments):
+                segid, i = decode_varint(data, i)
+                pgno_first, i = decode_varint(data, i)
+                pgno_last, i = decode_varint(data, i)
+                level.segments.append((segid, pgno_first, pgno_last))
+            structure.levels.append(level)
+        return structure
+
+    def encode(self) -> bytes:
+        data = [
+            self.cookie,
+            encode_varint(len(self.levels)),
+            encode_varint(sum(len(x.segments) for x in self.levels)),
+            encode_varint(self.write_counter),
+        ]
+        for level in self.levels:
+            data += [encode_varint(level.n_merge), encode_varint(len(level.segments))]
+            for segment in level.segments:
+                data += [encode_varint(x) for x in segment]
+        return b"".join(data)
@@ -0,0 +1,163 @@
+"""
+Access, with ctypes, to the functions of SQLite's C API that the sqlite3 module does
+ not expose (eg. sqlite3_trace_v2), called on the sqlite3 connections.
+Docs: https://sqlite.org/c3ref/funclist.html
+
+The functions are looked up in the SQLite library used by the sqlite3 module (so
+ they work on its connections), through its C extension `_sqlite3`.
+
+Mind that the `sqlite3 *` handle of a connection is read from the C struct of the
+ connection, whose layout is not a public API: it is read only on the CPython
+ builds listed in CPYTHON_VERSIONS, else SqliteCapiNotAvailable is raised.
+"""
+
+import ctypes
+import functools
+import sqlite3
+import sys
+import sysconfig
+
+# Docs: https://sqlite.org/c3ref/c_trace.html
+SQLITE_TRACE_STMT = 0x01
+SQLITE_TRACE_PROFILE = 0x02
+SQLITE_TRACE_ROW = 0x04
+
+# Docs: https://sqlite.org/c3ref/c_dbstatus_options.html
+# Pages found in the page cache, and pages read from the DB file (which can still
+#  be in the cache of the OS).
+SQLITE_DBSTATUS_CACHE_HIT = 7
+SQLITE_DBSTATUS_CACHE_MISS = 8
+
+# The CPython versions whose C struct of sqlite3.Connection starts with the
+#  `sqlite3 *db` field, right after the header of the Python object:
+#  https://github.com/python/cpython/blob/3.13/Modules/_sqlite/connection.h
+CPYTHON_VERSIONS = ((3, 11), (3, 12), (3, 13), (3, 14))
+
+# int callback(unsigned event, void *context, void *P, void *X).
+TRACE_CALLBACK_TYPE = ctypes.CFUNCTYPE(
+    ctypes.c_int, ctypes.c_uint, ctypes.c_void_p, ctypes.c_void_p, ctypes.c_void_p
+)
+
+
+class BaseSqliteCapiException(Exception):
+    pass
+
+
+class SqliteCapiNotAvailable(BaseSqliteCapiException):
+    pass
+
+
+@functools.cache
+def get_lib() -> ctypes.CDLL:
+    import _sqlite3
+
+    try:
+        lib = ctypes.CDLL(_sqlite3.__file__)
+        lib.sqlite3_total_changes
+    except (OSError, AttributeError) as exc:
+        raise SqliteCapiNotAvailable(f"SQLite C API not found: {exc!r}") from exc
+
+    lib.sqlite3_total_changes.argtypes = [ctypes.c_void_p]
+    lib.sqlite3_total_changes.restype = ctypes.c_int
+    lib.sqlite3_trace_v2.argtypes = [
+        ctypes.c_void_p,
+        ctypes.c_uint,
+        TRACE_CALLBACK_TYPE,
+        ctypes.c_void_p,
+    ]
+    lib.sqlite3_trace_v2.restype = ctypes.c_int
+    # A string to be freed with sqlite3_free().
+    lib.sqlite3_expanded_sql.argtypes = [ctypes.c_void_p]
+    lib.sqlite3_expanded_sql.restype = ctypes.c_void_p
+    lib.sqlite3_sql.argtypes = [ctypes.c_void_p]
+    lib.sqlite3_sql.restype = ctypes.c_char_p
+    lib.sqlite3_free.argtypes = [ctypes.c_void_p]
+    lib.sqlite3_free.restype = None
+    lib.sqlite3_db_status.argtypes = [
+        ctypes.c_void_p,
+        ctypes.c_int,
+        ctypes.POINTER(ctypes.c_int),
+        ctypes.POINTER(ctypes.c_int),
+        ctypes.c_int,
+    ]
+    lib.sqlite3_db_status.restype = ctypes.c_int
+    return lib
+
+
+@functools.cache
+def is_known_layout() -> bool:
+    """
+    Return True if the C struct of sqlite3.Connection has the layout expected by
+     get_handle(): on the (non free-threaded) CPython versions in CPYTHON_VERSIONS.
+    """
+    return (
+        sys.implementation.name == "cpython"
+        and sys.version_info[:2] in CPYTHON_VERSIONS
+        and not sysconfig.get_config_var("Py_GIL_DISABLED")
+        and sqlite3.Connection.__basicsize__
+        >= object.__basicsize__ + ctypes.sizeof(ctypes.c_void_p)
+    )
+
+
+def get_handle(connection: sqlite3.Connection) -> int:
+    """
+    Return the `sqlite3 *` handle of the given connection.
+    Raise sqlite3.ProgrammingError if the connection is closed.
+    """
+    total_changes = connection.total_changes
+    # Checked before reading the memory of the connection, as reading it with an
+    #  unknown layout could crash the process.
+    if not is_known_layout() or not isinstance(connection, sqlite3.Connection):
+        raise SqliteCapiNotAvailable(
+            f"Unknown layout of the sqlite3 connection on {sys.implementation.name}"
+            f" {sys.version_info.major}.{sys.version_info.minor}"
+        )
+    # Mind that the sqlite3 module does not expose it: it is the first field of the
+    #  C struct of the connection, right after the header of the Python object.
+    handle = ctypes.c_void_p.from_address(id(connection) + object.__basicsize__).value
+    # A sanity check, as the layout of the struct is not a public API.
+    if not handle or get_lib().sqlite3_total_changes(handle) != total_changes:
+        raise SqliteCapiNotAvailable("Cannot get the handle of the sqlite3 connection")
+    return handle
+
+
+def get_expanded_sql(stmt: int) -> str:
+    """
+    Return the SQL of the given `sqlite3_stmt *`, with the bound parameters.
+    """
+    lib = get_lib()
+    pointer = lib.sqlite3_expanded_sql(stmt)
+    if not pointer:
+        # Out of memory, or too long (> SQLITE_LIMIT_LENGTH).
+        return lib.sqlite3_sql(stmt).decode(errors="replace")
+    try:
+        return ctypes.string_at(pointer).decode(errors="replace")
+    finally:
+        lib.sqlite3_free(pointer)
+
+
+def get_db_status(connection: sqlite3.Connection, op: int) -> int:
+    """
+    Return the current value of a counter of the connection, eg.
+     SQLITE_DBSTATUS_CACHE_HIT: https://sqlite.org/c3ref/db_status.html
+    """
+    current, highwater = ctypes.c_int(), ctypes.c_int()
+    get_lib().sqlite3_db_status(
+        get_handle(connection), op, ctypes.byref(current), ctypes.byref(highwater), 0
+    )
+    return current.value
+
+
+def get_cache_counters(connection: sqlite3.Connection) -> tuple[int, int]:
+    """
+    Return the pages read from the page cache (hits) and from the DB file (misses)
+     by the connection so far, or (0, 0) when the C API is not available: for the
+     stats, which are best-effort.
+    """
+    try:
+        return (
+            get_db_status(connection, SQLITE_DBSTATUS_CACHE_HIT),
+            get_db_status(connection, SQLITE_DBSTATUS_CACHE_MISS),
+        )
+    except SqliteCapiNotAvailable:
+        return 0, 0
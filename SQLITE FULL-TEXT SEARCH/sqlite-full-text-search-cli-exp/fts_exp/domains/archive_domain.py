@@ -0,0 +1,208 @@
+"""
+Time-partitioned archive DBs.
+
+The items older than settings.ARCHIVE_AGE_DAYS are moved from the main DB to an
+ archive DB file per year (of `created_at`), each one with its own item table and
+ FTS indexes (cloned from the main DB). The archives are ATTACHed lazily, only
+ when a search or read touches their time range (see ArchivePartitionModel), and
+ in batches: SQLite allows at most SQLITE_LIMIT_ATTACHED (10 by default) attached
+ DBs per connection, see `iter_attached()`.
+
+Mind that the passages (see PassageModel) are not archived.
+
+Usage:
+    ArchiveDomain().archive(older_than_days=365)
+    schemas = ArchiveDomain().get_partitions(created_after=datetime(2024, 1, 1))
+    for batch in ArchiveDomain().iter_attached(schemas):
+        ...
+"""
+
+import contextlib
+import sqlite3
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Iterator
+
+import datetime_utils
+import peewee
+
+from ..conf import settings
+from ..data_models.db_models import ArchivePartitionModel, ItemModel
+from ..data_models.db_utils import (
+    attach,
+    clone_item_schema,
+    detach,
+    get_connection,
+    get_db,
+    get_model_for_schema,
+)
+
+ARCHIVE_SCHEMA_PREFIX = "archive_"
+
+
+class BaseArchiveDomainException(Exception):
+    pass
+
+
+class TooManyAttachedDbs(BaseArchiveDomainException):
+    pass
+
+
+class ItemIdNotAutoincrement(BaseArchiveDomainException):
+    pass
+
+
+class ArchiveDomain:
+    def archive(self, older_than_days: int | None = None) -> dict[int, int]:
+        """
+        Move the items older than the given n. of days to the archive DBs.
+        Return the n. of items moved by year.
+        """
+        if older_than_days is None:
+            older_than_days = settings.ARCHIVE_AGE_DAYS
+        if not self._is_item_id_autoincrement():
+            raise ItemIdNotAutoincrement(
+                "The ids of the items would be reused after archiving them, as"
+                " item.id is not AUTOINCREMENT: recreate the DB"
+            )
+        cutoff = datetime_utils.now_utc() - timedelta(days=older_than_days)
+        where = ItemModel.created_at < cutoff
+        year_sql = peewee.fn.strftime("%Y", ItemModel.created_at)
+        years = [
+            int(x.year)
+            for x in ItemModel.select(year_sql.alias("year")).where(where).distinct()
+        ]
+
+        n_items_by_year = {}
+        for year in sorted(years):
+            schema = self._get_schema(year)
+            with self.attached([schema]):
+                n_items_by_year[year] = self._archive_year(schema, year, where)
+        return n_items_by_year
+
+    def _archive_year(self, schema: str, year: int, where: peewee.Expression) -> int:
+        year_sql = peewee.fn.strftime("%Y", ItemModel.created_at)
+        clone_item_schema(schema)
+        _ArchiveItemModel = get_model_for_schema(ItemModel, schema)
+        year_where = where & (year_sql == str(year))
+        with get_db().atomic():
+            n_items = (
+                _ArchiveItemModel.insert_from(
+                    ItemModel.select().where(year_where),
+                    ItemModel._meta.sorted_fields,
+                )
+                .as_rowcount()
+                .execute()
+            )
+            ItemModel.delete().where(year_where).execute()
+            stats = _ArchiveItemModel.select(
+                peewee.fn.MIN(_ArchiveItemModel.created_at).alias("min_created_at"),
+                peewee.fn.MAX(_ArchiveItemModel.created_at).alias("max_created_at"),
+                peewee.fn.COUNT(_ArchiveItemModel.id).alias("n_items"),
+            ).get()
+            ArchivePartitionModel.replace(
+                year=year,
+                path=str(self._get_path(year)),
+                min_created_at=stats.min_created_at,
+                max_created_at=stats.max_created_at,
+                n_items=stats.n_items,
+            ).execute()
+        return n_items
+
+    def get_partitions(
+        self,
+        created_after: datetime | None = None,
+        created_before: datetime | None = None,
+    ) -> list[str]:
+        """
+        Return the schemas of the partitions that can contain items created in the
+         given range: "main" (always) and the archives, which are NOT attached here:
+         iterate them with `iter_attached()`.
+        """
+        query = ArchivePartitionModel.select().order_by(ArchivePartitionModel.year)
+        if created_after is not None:
+            query = query.where(ArchivePartitionModel.max_created_at >= created_after)
+        if created_before is not None:
+            query = query.where(ArchivePartitionModel.min_created_at < created_before)
+        return ["main"] + [self._get_schema(x.year) for x in query]
+
+    def iter_attached(self, schemas: list[str]) -> Iterator[list[str]]:
+        """
+        Yield the given schemas in batches, each one with its archives ATTACHed only
+         until the next batch is requested: SQLite allows at most
+         SQLITE_LIMIT_ATTACHED attached DBs per connection.
+        So the queries on a batch must be executed before moving to the next one.
+        """
+        batch = []
+        n_free_slots = self._get_n_free_slots()
+        for schema in schemas:
+            if schema != "main" and schema not in self._get_attached():
+                if n_free_slots == 0 and batch:
+                    with self.attached(batch):
+                        yield batch
+                    batch = []
+                    n_free_slots = self._get_n_free_slots()
+                n_free_slots -= 1
+            batch.append(schema)
+        if batch:
+            with self.attached(batch):
+                yield batch
+
+    @contextlib.contextmanager
+    def attached(self, schemas: list[str]) -> Iterator[None]:
+        """
+        ATTACH the archives of the given schemas, and DETACH on exit the ones that
+         were not attached already.
+        Raise TooManyAttachedDbs if they do not fit in the attached DBs limit.
+        """
+        already_attached = self._get_attached()
+        to_attach = [x for x in schemas if x != "main" and x not in already_attached]
+        if len(to_attach) > self._get_n_free_slots():
+            raise TooManyAttachedDbs(
+                f"Cannot attach {len(to_attach)} archive DBs: max "
+                f"{get_connection().getlimit(sqlite3.SQLITE_LIMIT_ATTACHED)} attached"
+                f" DBs, {len(already_attached)} already attached"
+            )
+        try:
+            for schema in to_attach:
+                attach(self._get_path(self._get_year(schema)), schema)
+            yield
+        finally:
+            for schema in reversed(to_attach):
+                if schema in self._get_attached():
+                    detach(schema)
+
+    def _is_item_id_autoincrement(self) -> bool:
+        # The DBs made before item.id was AUTOINCREMENT.
+        sql = (
+            get_db()
+            .execute_sql(
+                "SELECT sql FROM main.sqlite_master WHERE type = 'table' AND name = ?;",
+                (ItemModel._meta.table_name,),
+            )
+            .fetchone()[0]
+        )
+        return "AUTOINCREMENT" in sql.upper()
+
+    def _get_attached(self) -> set[str]:
+        return {
+            x[1]
+            for x in get_db().execute_sql("PRAGMA database_list;")
+            if x[1] not in ("main", "temp")
+        }
+
+    def _get_n_free_slots(self) -> int:
+        limit = get_connection().getlimit(sqlite3.SQLITE_LIMIT_ATTACHED)
+        return max(limit - len(self._get_attached()), 0)
+
+    def _get_path(self, year: int) -> Path:
+        return (
+            Path(settings.ARCHIVE_DIR)
+            / f"{Path(settings.DB_PATH).stem}-archive-{year}.sqlite3"
+        )
+
+    def _get_schema(self, year: int) -> str:
+        return f"{ARCHIVE_SCHEMA_PREFIX}{year}"
+
+    def _get_year(self, schema: str) -> int:
+        return int(schema.removeprefix(ARCHIVE_SCHEMA_PREFIX))
@@ -0,0 +1,100 @@
+"""
+Online backup of the DB to a file, with SQLite's backup API:
+ https://www.sqlite.org/backup.html
+
+The pages are copied N at a time, with a pause between steps: the source is locked
+ (for reading) only during a step, so writers are not stalled by the whole copy
+ (and in WAL mode they are not blocked at all). When a step finds that the source
+ has been written by another connection, SQLite restarts the copy.
+Alternatively, `VACUUM INTO` makes a compacted copy, in a single step.
+
+The copy is written to a temporary file next to the destination, checked with
+ `PRAGMA integrity_check` (which checks the FTS5 indexes too) and then renamed to
+ the destination: so the destination is never a torn copy.
+
+Usage:
+    BackupDomain().backup("/backups/fts-exp-db.sqlite3")
+"""
+
+import contextlib
+import os
+import sqlite3
+import time
+from pathlib import Path
+from typing import Callable
+
+from ..conf import settings
+from ..data_models.db_utils import connect, get_connection, get_db
+
+
+class BaseBackupDomainException(Exception):
+    pass
+
+
+class BackupDestinationExists(BaseBackupDomainException):
+    pass
+
+
+class BackupIntegrityCheckFailed(BaseBackupDomainException):
+    pass
+
+
+class BackupDomain:
+    def backup(
+        self,
+        dest_path: str | Path,
+        pages_per_step: int | None = None,
+        sleep_ms: int | None = None,
+        do_vacuum: bool = False,
+        do_overwrite: bool = False,
+        on_progress_fn: Callable[[int, int], None] | None = None,
+    ) -> None:
+        """
+        Copy the DB to `dest_path`, calling `on_progress_fn(n_copied_pages,
+         n_total_pages)` after each step.
+        """
+        dest_path = Path(dest_path)
+        if dest_path.exists() and not do_overwrite:
+            raise BackupDestinationExists(str(dest_path))
+        pages_per_step = pages_per_step or settings.BACKUP_PAGES_PER_STEP
+        if sleep_ms is None:
+            sleep_ms = settings.BACKUP_SLEEP_MS
+
+        tmp_path = dest_path.with_name(f"{dest_path.name}.tmp")
+        tmp_path.unlink(missing_ok=True)
+        try:
+            if do_vacuum:
+                get_db().execute_sql("VACUUM INTO ?;", (str(tmp_path),))
+                if on_progress_fn:
+                    n_pages = _get_page_count(tmp_path)
+                    on_progress_fn(n_pages, n_pages)
+            else:
+
+                def progress(status: int, remaining: int, total: int) -> None:
+                    if on_progress_fn:
+                        on_progress_fn(total - remaining, total)
+                    # Mind that the `sleep` arg of backup() is used only when the
+                    #  source is busy, not between all steps.
+                    if remaining:
+                        time.sleep(sleep_ms / 1000)
+
+                with contextlib.closing(sqlite3.connect(tmp_path)) as dest:
+                    get_connection().backup(
+                        dest, pages=pages_per_step, progress=progress
+                    )
+            self._check_integrity(tmp_path)
+            os.replace(tmp_path, dest_path)
+        finally:
+            tmp_path.unlink(missing_ok=True)
+
+    def _check_integrity(self, path: Path) -> None:
+        # With the app's extensions and functions, used by the FTS5 indexes.
+        with contextlib.closing(connect(path)) as connection:
+            errors = [x[0] for x in connection.execute("PRAGMA integrity_check;")]
+        if errors != ["ok"]:
+            raise BackupIntegrityCheckFailed("; ".join(errors[:10]))
+
+
+def _get_page_count(path: Path) -> int:
+    with contextlib.closing(sqlite3.connect(path)) as connection:
+        return connection.execute("PRAGMA page_count;").fetchone()[0]
@@ -0,0 +1,162 @@
+"""
+Change data capture, for the incremental replication of the items to read-only
+ replicas (copies of the DB on other hosts).
+
+On the primary, the triggers on item log every write to the change journal (see
+ ChangeModel), when settings.IS_CHANGE_JOURNAL_ENABLED: a single row per item with
+ the op of its last write and an increasing version. So the journal is compact:
+ an item written many times between 2 syncs is shipped once.
+The replica reads the changes since its cursor (the version of the last change
+ it applied) and applies them: deletes, and upserts of the items as they are now
+ in the primary. Its own triggers then update its FTS indexes (and passages).
+ So the cost of a sync scales with the n. of items changed, not the DB size.
+
+Applying a change is idempotent, so a replica made with a backup of the primary
+ (see BackupDomain) can start from any cursor older than the backup, eg. 0.
+Mind that the replicas must be made after the journal is enabled (the older
+ writes are not in it). And that the archives (see ArchiveDomain) and the sharded
+ layout (see ShardDomain) are not replicated: archived items are deleted from the
+ replica.
+
+Usage:
+    # On the primary.
+    for change in ChangeJournalDomain().read_changes(since=cursor):
+        print(json.dumps(change))
+    # On the replica.
+    cursor = ChangeJournalDomain().apply_changes(changes)
+"""
+
+import itertools
+from datetime import datetime
+from enum import StrEnum
+from typing import Iterable, Iterator
+
+import peewee
+
+from ..conf import settings
+from ..data_models.db_models import (
+    REPLICA_CURSOR_COUNTER,
+    ChangeModel,
+    CounterModel,
+    ItemModel,
+)
+from ..data_models.db_utils import get_db
+
+
+class ChangeOpEnum(StrEnum):
+    INSERT = "I"
+    UPDATE = "U"
+    DELETE = "D"
+
+
+class BaseChangeJournalDomainException(Exception):
+    pass
+
+
+class InvalidChange(BaseChangeJournalDomainException):
+    pass
+
+
+class ChangeJournalDomain:
+    def is_enabled(self) -> bool:
+        return settings.IS_CHANGE_JOURNAL_ENABLED
+
+    def get_version(self) -> int:
+        """
+        Return the current version of the journal (0 when empty).
+        """
+        return ChangeModel.select(peewee.fn.MAX(ChangeModel.version)).scalar() or 0
+
+    def get_cursor(self) -> int:
+        """
+        Return the version of the last change applied, in a replica.
+        """
+        return CounterModel.get_value(REPLICA_CURSOR_COUNTER)
+
+    def read_changes(self, since: int = 0) -> Iterator[dict]:
+        """
+        Yield the changes with version > `since`, by version, as JSON-serializable
+         dicts: version, op, item_id and item (the item as it is now, None for
+         deletes). Read in batches of settings.CHANGE_JOURNAL_BATCH_SIZE.
+        """
+        while True:
+            batch = list(
+                ChangeModel.select(ChangeModel, ItemModel)
+                .join(
+                    ItemModel,
+                    join_type=peewee.JOIN.LEFT_OUTER,
+                    on=(ItemModel.id == ChangeModel.item_id),
+                    attr="item",
+                )
+                .where(ChangeModel.version > since)
+                .order_by(ChangeModel.version)
+                .limit(settings.CHANGE_JOURNAL_BATCH_SIZE)
+            )
+            for change in batch:
+                item = change.item if change.op != ChangeOpEnum.DELETE else None
+                yield dict(
+                    version=change.version,
+                    op=change.op,
+                    item_id=change.item_id,
+                    item=(
+                        dict(
+                            created_at=item.created_at.isoformat(),
+                            updated_at=item.updated_at.isoformat(),
+                            title=item.title,
+                            notes=item.notes,
+                            lang=item.lang,
+                        )
+                        if item and item.id is not None
+                        else None
+                    ),
+                )
+            if len(batch) < settings.CHANGE_JOURNAL_BATCH_SIZE:
+                return
+            since = batch[-1].version
+
+    def apply_changes(self, changes: Iterable[dict]) -> int:
+        """
+        Apply the changes (as read by `read_changes`) to the items of this DB, a
+         replica, in transactions of settings.CHANGE_JOURNAL_BATCH_SIZE changes.
+         Each one also stores the version of its last change as the cursor, so a
+         sync can be resumed.
+        Return the cursor.
+        """
+        cursor = self.get_cursor()
+        changes = iter(changes)
+        while batch := list(
+            itertools.islice(changes, settings.CHANGE_JOURNAL_BATCH_SIZE)
+        ):
+            with get_db().atomic():
+                for change in batch:
+                    cursor = max(cursor, self._apply_change(change))
+                CounterModel.set_value(REPLICA_CURSOR_COUNTER, cursor)
+        return cursor
+
+    def _apply_change(self, change: dict) -> int:
+        # Return the version of the change.
+        try:
+            version = int(change["version"])
+            op = ChangeOpEnum(change["op"])
+            item_id = int(change["item_id"])
+            item = change["item"]
+        except (KeyError, TypeError, ValueError) as exc:
+            raise InvalidChange(f"Invalid change: {change!r}") from exc
+
+        # An upsert is a delete and an insert, rather than an update, so that the
+        #  trigger on update does not overwrite `updated_at`.
+        ItemModel.delete().where(ItemModel.id == item_id).execute()
+        if op == ChangeOpEnum.DELETE:
+            return version
+        try:
+            ItemModel.insert(
+                id=item_id,
+                created_at=datetime.fromisoformat(item["created_at"]),
+                updated_at=datetime.fromisoformat(item["updated_at"]),
+                title=item["title"],
+                notes=item["notes"],
+                lang=item["lang"],
+            ).execute()
+        except (KeyError, TypeError, ValueError) as exc:
+            raise InvalidChange(f"Invalid change: {change!r}") from exc
+        return version
@@ -0,0 +1,179 @@
+"""
+Storage stats of the DB: the pages and bytes of each b-tree (tables and indexes),
+ read in a single pass over the `dbstat` virtual table, the segments and levels
+ of the FTS5 indexes, the freelist and the n. of items by lang.
+Docs:
+    https://sqlite.org/dbstat.html
+    https://sqlite.org/fts5.html#the_fts5_index_structure
+
+Mind that in the sharded layout (see ShardDomain) the items are not in the main DB
+ and they are not counted.
+
+Usage:
+    stats = DbStatsDomain().get_stats()
+"""
+
+import peewee
+
+from ..data_models.db_models import ItemModel, LangEnum
+from ..data_models.db_utils import get_connection, get_db
+from ..data_models.fts5_utils import (
+    AVERAGES_ROWID,
+    STRUCTURE_ROWID,
+    Fts5Structure,
+    UnsupportedFts5Format,
+    decode_averages,
+    get_data_block,
+)
+
+# The shadow tables of an FTS5 table: https://sqlite.org/fts5.html#shadow_tables
+FTS5_SHADOW_TABLE_SUFFIXES = ("_data", "_idx", "_docsize", "_config", "_content")
+
+
+class BaseDbStatsDomainException(Exception):
+    pass
+
+
+class DbstatNotAvailable(BaseDbStatsDomainException):
+    pass
+
+
+class DbStatsDomain:
+    def get_stats(self) -> dict:
+        """
+        Return a JSON-serializable dict with the keys:
+         - db: the size of the file, its pages and the free ones.
+         - btrees: the tables and indexes, by size desc. Each one with its pages,
+            bytes, unused bytes, rows (or entries, for indexes), average row size
+            and `table`: the table it belongs to (the FTS5 table, for the shadow
+            tables of an FTS5 index).
+         - fts5: the FTS5 indexes, with their rows, tokens by column and levels.
+         - langs: the n. of items by lang (name).
+        """
+        db = get_db()
+        page_size = db.execute_sql("PRAGMA page_size;").fetchone()[0]
+        page_count = db.execute_sql("PRAGMA page_count;").fetchone()[0]
+        freelist_count = db.execute_sql("PRAGMA freelist_count;").fetchone()[0]
+        fts5_tables = [
+            x
+            for (x,) in db.execute_sql(
+                "SELECT name FROM main.sqlite_master"
+                " WHERE type = 'table' AND sql LIKE 'CREATE VIRTUAL TABLE%USING fts5%'"
+                " ORDER BY name;"
+            )
+        ]
+        return dict(
+            db=dict(
+                page_size=page_size,
+                page_count=page_count,
+                bytes=page_size * page_count,
+                freelist_count=freelist_count,
+                freelist_bytes=page_size * freelist_count,
+            ),
+            btrees=self._get_btrees_stats(fts5_tables),
+            fts5=[self._get_fts5_stats(x) for x in fts5_tables],
+            langs=self._get_langs_stats(),
+        )
+
+    def _get_langs_stats(self) -> dict[str, int]:
+        counts = dict(
+            ItemModel.select(ItemModel.lang, peewee.fn.COUNT(ItemModel.id))
+            .group_by(ItemModel.lang)
+            .tuples()
+        )
+        return {x.name: counts.get(x.value, 0) for x in LangEnum}
+
+    def _get_btrees_stats(self, fts5_tables: list[str]) -> list[dict]:
+        db = get_db()
+        # The table owning each b-tree. The schema table has no row in sqlite_master.
+        owners = {"sqlite_schema": ("table", "sqlite_schema")}
+        # The b-trees whose internal pages hold rows too (not only the leaves).
+        key_btrees = set()
+        for name, type_, table, sql in db.execute_sql(
+            "SELECT name, type, tbl_name, sql FROM main.sqlite_master"
+            " WHERE type IN ('table', 'index');"
+        ):
+            for fts5_table in fts5_tables:
+                if table in {fts5_table + x for x in FTS5_SHADOW_TABLE_SUFFIXES}:
+                    table = fts5_table
+            owners[name] = (type_, table)
+            if type_ == "index" or (sql or "").upper().rstrip(" ;").endswith(
+                "WITHOUT ROWID"
+            ):
+                key_btrees.add(name)
+
+        try:
+            # The single pass over all the pages of the DB.
+            rows = db.execute_sql(
+                "SELECT name, pagetype, COUNT(*), SUM(pgsize), SUM(ncell),"
+                " SUM(payload), SUM(unused)"
+                " FROM dbstat('main') GROUP BY name, pagetype;"
+            ).fetchall()
+        except peewee.OperationalError as exc:
+            raise DbstatNotAvailable(
+                "SQLite must be compiled with SQLITE_ENABLE_DBSTAT_VTAB"
+            ) from exc
+
+        btrees: dict[str, dict] = {}
+        for name, page_type, n_pages, n_bytes, n_cells, payload, unused in rows:
+            type_, table = owners.get(name, ("table", name))
+            btree = btrees.setdefault(
+                name,
+                dict(
+                    name=name,
+                    type=type_,
+                    table=table,
+                    n_pages=0,
+                    bytes=0,
+                    unused_bytes=0,
+                    payload_bytes=0,
+                    n_rows=0,
+                ),
+            )
+            btree["n_pages"] += n_pages
+            btree["bytes"] += n_bytes
+            btree["unused_bytes"] += unused
+            btree["payload_bytes"] += payload
+            # The cells of the leaves of a rowid table are its rows, while the
+            #  internal pages of an index (or a WITHOUT ROWID table) hold rows too.
+            #  Overflow pages have no cells.
+            if page_type == "leaf" or (name in key_btrees and page_type == "internal"):
+                btree["n_rows"] += n_cells
+
+        for btree in btrees.values():
+            btree["avg_row_bytes"] = (
+                round(btree["payload_bytes"] / btree["n_rows"], 1)
+                if btree["n_rows"]
+                else 0
+            )
+        return sorted(btrees.values(), key=lambda x: (-x["bytes"], x["name"]))
+
+    def _get_fts5_stats(self, table: str) -> dict:
+        connection = get_connection()
+        columns = [x[1] for x in connection.execute(f"PRAGMA table_info({table});")]
+        averages = decode_averages(get_data_block(connection, table, AVERAGES_ROWID))
+        stats = dict(
+            name=table,
+            n_rows=averages[0] if averages else 0,
+            n_tokens=dict(zip(columns, averages[1:])),
+            n_segments=None,
+            levels=None,
+        )
+        data = get_data_block(connection, table, STRUCTURE_ROWID)
+        try:
+            structure = Fts5Structure.decode(data) if data else Fts5Structure()
+        except UnsupportedFts5Format:
+            return stats
+        stats["n_segments"] = sum(len(x.segments) for x in structure.levels)
+        stats["levels"] = [
+            dict(
+                level=i,
+                n_segments=len(level.segments),
+                n_merge=level.n_merge,
+                # Pages of the leaves (the doclist-indexes are not counted).
+                n_pages=sum(last - first + 1 for _, first, last in level.segments),
+            )
+            for i, level in enumerate(structure.levels)
+            if level.segments
+        ]
+        return stats
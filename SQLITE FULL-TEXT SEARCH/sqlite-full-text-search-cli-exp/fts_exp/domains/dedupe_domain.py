@@ -0,0 +1,236 @@
+"""
+Near-duplicate detection at ingest, when settings.IS_DEDUPE_ENABLED: a new item
+ similar to an existing one (eg. the same news sent twice by a feed, with a few
+ words changed) is flagged as its duplicate, or rejected (settings.DEDUPE_ACTION).
+
+The similarity of 2 items is the Jaccard similarity of the sets of their shingles
+ (the sequences of settings.DEDUPE_SHINGLE_N_WORDS words of title and notes). It is
+ estimated with their MinHash signatures: the fraction of equal values, out of
+ N_BANDS x BAND_SIZE values, each the min hash of the shingles with a different
+ hash function. The signature is stored in ItemSignatureModel.
+The lookup is sub-linear with LSH (locality-sensitive hashing): the signature is
+ split in bands, whose hashes are stored in LshBandModel, and a new item is
+ compared only to the items with a band hash in common (the candidates), looked
+ up by index. Similar items very likely have a band in common, dissimilar ones very
+ likely do not, see settings.DEDUPE_N_BANDS.
+
+Mind that the items are compared only to the items written when the dedupe was
+ enabled, in the main DB: not the archives (see ArchiveDomain), and the sharded
+ layout (see ShardDomain) is not supported. And that an item updated is not
+ compared anymore (the triggers on item delete its signature).
+
+Usage:
+    rows = DedupeDomain().dedupe([("My title", "My notes")])
+    if not rows[0].is_rejected:
+        item = ItemModel.create(...)
+        DedupeDomain().save([item.id], rows)
+"""
+
+import array
+import dataclasses
+import hashlib
+import json
+import random
+import re
+import zlib
+from enum import StrEnum
+from typing import Sequence
+
+from ..conf import settings
+from ..data_models.db_models import ItemSignatureModel, LshBandModel
+from ..data_models.db_utils import get_connection, get_db
+from .shard_domain import ShardDomain
+
+# The MinHash hash functions: h(x) = (a * x + b) mod MERSENNE_PRIME, truncated to
+#  32 bits. The coefficients are fixed, so the signatures are stable across
+#  processes.
+MERSENNE_PRIME = (1 << 61) - 1
+MAX_HASH = (1 << 32) - 1
+_rand = random.Random(42)
+MINHASH_COEFFICIENTS = [
+    (_rand.randint(1, MERSENNE_PRIME - 1), _rand.randint(0, MERSENNE_PRIME - 1))
+    for _ in range(256)
+]
+
+
+class DedupeActionEnum(StrEnum):
+    # Write the near-duplicate, with a reference to the most similar item.
+    FLAG = "flag"
+    # Do not write the near-duplicate.
+    REJECT = "reject"
+
+
+class BaseDedupeDomainException(Exception):
+    pass
+
+
+class DuplicateItem(BaseDedupeDomainException):
+    pass
+
+
+@dataclasses.dataclass
+class DedupeRow:
+    """
+    The outcome of the dedupe of a new item.
+    """
+
+    # The MinHash signature, None when the item has no words.
+    signature: list[int] | None
+    band_hashes: list[int]
+    # The most similar item, if a near-duplicate: an existing item, or a previous
+    #  row of the same batch (its index).
+    duplicate_of_id: int | None = None
+    duplicate_of_row: int | None = None
+    similarity: float | None = None
+    is_rejected: bool = False
+
+    @property
+    def is_duplicate(self) -> bool:
+        return self.similarity is not None
+
+
+class DedupeDomain:
+    def is_enabled(self) -> bool:
+        return settings.IS_DEDUPE_ENABLED and not ShardDomain().is_enabled()
+
+    def get_signature(self, title: str, notes: str | None = None) -> list[int] | None:
+        """
+        Return the MinHash signature of the shingles of the text, or None if it has
+         no words.
+        """
+        words = re.findall(r"\w+", f"{title} {notes or ''}".lower())
+        if not words:
+            return None
+        n = settings.DEDUPE_SHINGLE_N_WORDS
+        shingles = {
+            zlib.crc32(" ".join(words[i : i + n]).encode())
+            for i in range(max(len(words) - n + 1, 1))
+        }
+        n_values = settings.DEDUPE_N_BANDS * settings.DEDUPE_BAND_SIZE
+        # A list is faster than a generator, in min().
+        return [
+            min([(a * x + b) % MERSENNE_PRIME for x in shingles]) & MAX_HASH
+            for a, b in MINHASH_COEFFICIENTS[:n_values]
+        ]
+
+    def get_band_hashes(self, signature: list[int]) -> list[int]:
+        size = settings.DEDUPE_BAND_SIZE
+        hashes = []
+        for band in range(settings.DEDUPE_N_BANDS):
+            values = array.array(
+                "I", [band, *signature[band * size : (band + 1) * size]]
+            )
+            digest = hashlib.blake2b(values.tobytes(), digest_size=8).digest()
+            hashes.append(int.from_bytes(digest, "little", signed=True))
+        return hashes
+
+    def dedupe(self, rows: Sequence[tuple[str, str | None]]) -> list[DedupeRow]:
+        """
+        Find, for each new item (title, notes), its most similar item among the
+         existing ones and the previous rows (not rejected), if it is a
+         near-duplicate. With a single lookup on the LSH banding table for all the
+         rows.
+        """
+        action = DedupeActionEnum(settings.DEDUPE_ACTION)
+        signatures = [self.get_signature(title, notes) for title, notes in rows]
+        band_hashes = [self.get_band_hashes(x) if x else [] for x in signatures]
+
+        # The candidates among the existing items, by band hash.
+        all_hashes = list({x for hashes in band_hashes for x in hashes})
+        ids_by_hash: dict[int, list[int]] = {}
+        for hash_, item_id in get_db().execute_sql(
+            "SELECT hash, item_id FROM lshband"
+            " WHERE hash IN (SELECT value FROM json_each(?));",
+            (json.dumps(all_hashes),),
+        ):
+            ids_by_hash.setdefault(hash_, []).append(item_id)
+        candidate_ids = list({x for ids in ids_by_hash.values() for x in ids})
+        signatures_by_id = {
+            item_id: array.array("I", signature).tolist()
+            for item_id, signature in get_db().execute_sql(
+                "SELECT item_id, signature FROM itemsignature"
+                " WHERE item_id IN (SELECT value FROM json_each(?));",
+                (json.dumps(candidate_ids),),
+            )
+        }
+
+        # The previous rows of the batch, by band hash.
+        rows_by_hash: dict[int, list[int]] = {}
+        results = []
+        for i, (signature, hashes) in enumerate(zip(signatures, band_hashes)):
+            result = DedupeRow(signature, hashes)
+            results.append(result)
+            if signature is None:
+                continue
+            for item_id in {x for h in hashes for x in ids_by_hash.get(h, [])}:
+                if item_id not in signatures_by_id:
+                    continue
+                similarity = _get_similarity(signature, signatures_by_id[item_id])
+                if similarity > (result.similarity or 0):
+                    result.duplicate_of_id, result.similarity = item_id, similarity
+            for row in {x for h in hashes for x in rows_by_hash.get(h, [])}:
+                similarity = _get_similarity(signature, signatures[row])
+                if similarity > (result.similarity or 0):
+                    result.duplicate_of_id, result.duplicate_of_row = None, row
+                    result.similarity = similarity
+            if (result.similarity or 0) < settings.DEDUPE_THRESHOLD:
+                result.duplicate_of_id = result.duplicate_of_row = None
+                result.similarity = None
+            elif action == DedupeActionEnum.REJECT:
+                result.is_rejected = True
+                continue
+            for h in hashes:
+                rows_by_hash.setdefault(h, []).append(i)
+        return results
+
+    def save(self, item_ids: Sequence[int], rows: Sequence[DedupeRow]) -> None:
+        """
+        Store the signatures and the band hashes of the new items, given the ids of
+         the items written for the rows (as returned by `dedupe()`) not rejected,
+         in the same order.
+        """
+        item_ids = iter(item_ids)
+        id_by_row = {}
+        signature_values, band_values = [], []
+        for i, row in enumerate(rows):
+            if row.is_rejected:
+                continue
+            item_id = id_by_row[i] = next(item_ids)
+            if row.signature is None:
+                continue
+            duplicate_of_id = row.duplicate_of_id
+            if row.duplicate_of_row is not None:
+                duplicate_of_id = id_by_row[row.duplicate_of_row]
+            signature_values.append(
+                (
+                    item_id,
+                    array.array("I", row.signature).tobytes(),
+                    duplicate_of_id,
+                    row.similarity,
+                )
+            )
+            band_values.extend((x, item_id) for x in row.band_hashes)
+        with get_db().atomic():
+            connection = get_connection()
+            connection.executemany(
+                "INSERT INTO itemsignature(item_id, signature, duplicate_of_id,"
+                " similarity) VALUES (?, ?, ?, ?);",
+                signature_values,
+            )
+            connection.executemany(
+                "INSERT INTO lshband(hash, item_id) VALUES (?, ?);", band_values
+            )
+
+    def get_duplicates(self, item_id: int) -> list[ItemSignatureModel]:
+        """
+        Return the items flagged as near-duplicates of the given one.
+        """
+        return list(
+            ItemSignatureModel.select()
+            .where(ItemSignatureModel.duplicate_of_id == item_id)
+            .order_by(ItemSignatureModel.item_id)
+        )
+
+
+def _get_similarity(signature: list[int], other: list[int]) -> float:
+    return sum(x == y for x, y in zip(signature, other)) / len(signature)
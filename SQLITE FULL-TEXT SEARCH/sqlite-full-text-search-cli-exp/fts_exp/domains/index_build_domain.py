@@ -0,0 +1,261 @@
+"""
+Parallel offline build, from scratch, of a word index on item (ItemFTSIndexIta/Eng).
+
+ 1. The items of the lang are split in N ranges of ids, and N worker processes
+     index a range each, into their own (contentless) FTS5 table in a temporary DB,
+     with the same options as the live index. Then they optimize it, so it is made
+     of a single segment. This is the bulk of the work (tokenization and merges) and
+     it runs in parallel, as each worker writes to its own DB.
+ 2. The workers' segments are spliced into the shadow tables of the live index, in
+     a single transaction: the rows of `%_data` (the segments' pages) and `%_idx`
+     are copied with their segment id renumbered, the rows of `%_docsize` are copied
+     as they are, and the structure and averages records are rewritten. No text is
+     tokenized again: it is a plain copy.
+     See fts5_utils.py for the formats.
+
+The live index then has N segments, which FTS5 merges as usual with its automerge.
+Mind that the writers must be stopped during the build. And that an in-memory DB
+ (eg. in tests) cannot be read by other processes, so its ranges are indexed
+ sequentially, in this process.
+
+Usage:
+    IndexBuildDomain(LangEnum.ITA).build(n_workers=8)
+"""
+
+import contextlib
+import re
+import sqlite3
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import peewee
+
+from ..data_models.db_models import (
+    ITEM_CONTENT_VIEW_NAME,
+    ITEM_WRITES_COUNTER,
+    CounterModel,
+    ItemModel,
+    LangEnum,
+    get_index_class_for_lang,
+)
+from ..data_models.db_utils import connect, get_connection, get_db
+from ..data_models.fts5_utils import (
+    AVERAGES_ROWID,
+    SEGID_SHIFT,
+    STRUCTURE_ROWID,
+    Fts5Level,
+    Fts5Structure,
+    decode_averages,
+    encode_varint,
+    get_data_block,
+)
+
+BUILD_SCHEMA = "build"
+
+
+class IndexBuildDomain:
+    def __init__(self, lang: LangEnum):
+        self.lang = LangEnum(lang)
+        self.index_class = get_index_class_for_lang(self.lang)
+        self.index_table = self.index_class._meta.table_name
+        self.build_table = f"{self.index_table}_build"
+
+    def build(self, n_workers: int = 1) -> int:
+        """
+        Build the index with the given n. of worker processes. Return the n. of
+         items indexed.
+        """
+        db_path = get_db().execute_sql("PRAGMA database_list;").fetchone()[2]
+        ranges = self._get_id_ranges(n_workers)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            build_paths = [
+                Path(tmp_dir) / f"build-{i}.sqlite3" for i in range(n_workers)
+            ]
+            build_table_sql = self._get_build_table_sql()
+            args = [
+                (build_table_sql, self.lang.value, min_id, max_id, path)
+                for (min_id, max_id), path in zip(ranges, build_paths)
+            ]
+            if not db_path or n_workers == 1:
+                for x in args:
+                    _build_range(get_connection(), *x)
+            else:
+                with ProcessPoolExecutor(max_workers=n_workers) as pool:
+                    futures = [
+                        pool.submit(_build_range_in_process, db_path, *x) for x in args
+                    ]
+                    for future in futures:
+                        future.result()  # Re-raise the workers' exceptions.
+            return self._splice(build_paths)
+
+    def _get_id_ranges(self, n_ranges: int) -> list[tuple[int, int]]:
+        """
+        Split the ids of the items of the lang in ranges [min_id, max_id).
+        """
+        min_id, max_id = (
+            ItemModel.select(peewee.fn.MIN(ItemModel.id), peewee.fn.MAX(ItemModel.id))
+            .where(ItemModel.lang == self.lang.value)
+            .tuples()
+            .get()
+        )
+        min_id, max_id = min_id or 0, (max_id or 0) + 1
+        size = -(-(max_id - min_id) // n_ranges)  # Ceil.
+        return [
+            (min_id + i * size, min(min_id + (i + 1) * size, max_id))
+            for i in range(n_ranges)
+        ]
+
+    def _get_build_table_sql(self) -> str:
+        """
+        The SQL to create the workers' table: the same as the live index, but
+         contentless, in the BUILD_SCHEMA.
+        """
+        sql = (
+            get_db()
+            .execute_sql(
+                "SELECT sql FROM main.sqlite_master WHERE name = ?;",
+                (self.index_table,),
+            )
+            .fetchone()[0]
+        )
+        sql = sql.replace(
+            f'"{self.index_table}"', f'{BUILD_SCHEMA}."{self.build_table}"', 1
+        )
+        return re.sub(
+            r"content\s*=\s*[^,)]+,\s*content_rowid\s*=\s*[^,)]+", "content=''", sql
+        )
+
+    def _splice(self, build_paths: list[Path]) -> int:
+        """
+        Replace the content of the live index with the segments built by the
+         workers. Return the n. of items indexed.
+        """
+        db = get_db()
+        connection = get_connection()
+        table = self.index_table
+        with db.atomic():
+            # Mind that the live index must not be used (read or written) through
+            #  the FTS5 table until the commit: it would cache the structure record.
+            db.execute_sql(f"INSERT INTO {table}({table}) VALUES('delete-all');")
+            structure = Fts5Structure.decode(
+                get_data_block(connection, table, STRUCTURE_ROWID)
+            )
+            averages: list[int] = []
+            segid = 0
+            for path in build_paths:
+                with contextlib.closing(sqlite3.connect(path)) as source:
+                    build_structure = Fts5Structure.decode(
+                        get_data_block(source, self.build_table, STRUCTURE_ROWID)
+                    )
+                    for i, level in enumerate(build_structure.levels):
+                        while len(structure.levels) <= i:
+                            structure.levels.append(Fts5Level())
+                        for old_segid, pgno_first, pgno_last in level.segments:
+                            segid += 1
+                            structure.levels[i].segments.append(
+                                (segid, pgno_first, pgno_last)
+                            )
+                            self._copy_segment(source, connection, old_segid, segid)
+                    structure.write_counter += build_structure.write_counter
+                    connection.executemany(
+                        f"INSERT INTO {table}_docsize(id, sz) VALUES (?, ?);",
+                        source.execute(
+                            f"SELECT id, sz FROM {self.build_table}_docsize;"
+                        ),
+                    )
+                    build_averages = decode_averages(
+                        get_data_block(source, self.build_table, AVERAGES_ROWID)
+                    )
+                    if not averages:
+                        averages = build_averages
+                    elif build_averages:
+                        averages = [x + y for x, y in zip(averages, build_averages)]
+
+            connection.execute(
+                f"REPLACE INTO {table}_data(id, block) VALUES (?, ?), (?, ?);",
+                (
+                    STRUCTURE_ROWID,
+                    structure.encode(),
+                    AVERAGES_ROWID,
+                    b"".join(encode_varint(x) for x in averages),
+                ),
+            )
+            # FTS5 caches the structure record in the connection (and it would not
+            #  see the new one): it drops it when a savepoint where the FTS5 table
+            #  was written is rolled back.
+            with db.atomic() as savepoint:
+                db.execute_sql(
+                    f"INSERT INTO {table}({table}, rank) VALUES('automerge', 4);"
+                )
+                savepoint.rollback()
+            # Invalidate the search cache and the spelling vocabularies.
+            CounterModel.increment(ITEM_WRITES_COUNTER)
+        return averages[0] if averages else 0
+
+    def _copy_segment(
+        self,
+        source: sqlite3.Connection,
+        target: sqlite3.Connection,
+        old_segid: int,
+        segid: int,
+    ) -> None:
+        # All the rows of a segment: its leaves and its doclist-indexes.
+        offset = (segid - old_segid) << SEGID_SHIFT
+        target.executemany(
+            f"INSERT INTO {self.index_table}_data(id, block) VALUES (?, ?);",
+            (
+                (x + offset, block)
+                for x, block in source.execute(
+                    f"SELECT id, block FROM {self.build_table}_data"
+                    " WHERE id >= ? AND id < ?;",
+                    (old_segid << SEGID_SHIFT, (old_segid + 1) << SEGID_SHIFT),
+                )
+            ),
+        )
+        target.executemany(
+            f"INSERT INTO {self.index_table}_idx(segid, term, pgno) VALUES (?, ?, ?);",
+            (
+                (segid, term, pgno)
+                for term, pgno in source.execute(
+                    f"SELECT term, pgno FROM {self.build_table}_idx WHERE segid = ?;",
+                    (old_segid,),
+                )
+            ),
+        )
+
+
+def _build_range(
+    connection: sqlite3.Connection,
+    build_table_sql: str,
+    lang_value: str,
+    min_id: int,
+    max_id: int,
+    build_path: Path,
+) -> None:
+    """
+    Index the items of the lang with id in [min_id, max_id) into a new DB file.
+    """
+    build_table = re.search(rf'{BUILD_SCHEMA}\."(\w+)"', build_table_sql).group(1)
+    connection.execute(f"ATTACH DATABASE ? AS {BUILD_SCHEMA};", (str(build_path),))
+    try:
+        connection.execute(build_table_sql)
+        connection.execute(
+            f"INSERT INTO {BUILD_SCHEMA}.{build_table}(rowid, title, notes)"
+            f" SELECT id, title, notes FROM main.{ITEM_CONTENT_VIEW_NAME}"
+            " WHERE lang = ? AND id >= ? AND id < ?;",
+            (lang_value, min_id, max_id),
+        )
+        connection.execute(
+            f"INSERT INTO {BUILD_SCHEMA}.{build_table}({build_table})"
+            " VALUES('optimize');"
+        )
+        connection.commit()
+    finally:
+        connection.execute(f"DETACH DATABASE {BUILD_SCHEMA};")
+
+
+def _build_range_in_process(db_path: str, *args) -> None:
+    # The entrypoint of the worker processes.
+    with contextlib.closing(connect(db_path)) as connection:
+        _build_range(connection, *args)
@@ -1,15 +1,154 @@
+import contextlib
+import itertools
+import json
+import re
+import time
+from datetime import datetime
+from enum import StrEnum
+from typing import Callable, Iterable
+
+import datetime_utils
+import numpy as np
 import peewee
+import peewee_utils
 import pydantic_utils
 
 from ..conf import settings
 from ..data_models.db_models import (
+    ITEM_CONTENT_VIEW_NAME,
     ItemFTSIndexEng,
     ItemFTSIndexIta,
     ItemModel,
+    ItemTrigramIndexEng,
+    ItemTrigramIndexIta,
     LangEnum,
+    PassageModel,
     get_index_class_for_lang,
+    get_passage_index_class_for_lang,
+    get_trigram_index_class_for_lang,
+)
+from ..data_models.db_utils import (
+    get_connection,
+    get_db,
+    get_model_for_schema,
+    query_budget,
+)
+from ..data_models.fts5_utils import AVERAGES_ROWID, decode_averages, get_data_block
+from ..data_models.sqlite_capi import get_cache_counters
+from .archive_domain import ArchiveDomain
+from .dedupe_domain import DedupeDomain, DuplicateItem
+from .query_compiler import compile_query, compile_substring_query
+from .search_cache_domain import SearchCacheDomain
+from .shard_domain import ShardDomain
+from .slow_query_log_domain import SlowQueryLogDomain
+from .spelling_domain import SpellingDomain
+
+# The indexes on item written by `create_items(do_defer_indexing=True)` at the end of
+#  the load, rather than by their triggers on insert.
+DEFERRED_INDEX_CLASSES = (
+    ItemFTSIndexIta,
+    ItemFTSIndexEng,
+    ItemTrigramIndexIta,
+    ItemTrigramIndexEng,
 )
 
+# In-memory cache of the doc frequencies of the terms of the word indexes, for
+#  `ItemDomain.similar_items()`: reading the doc frequency of a term from the FTS5
+#  vocabulary scans all its postings. The terms are added as they are read, and the
+#  cache is dropped when the n. of docs of the index drifts by more than
+#  settings.SIMILAR_DOC_COUNTS_MAX_DRIFT: until then, the IDFs are approximate (mind
+#  that the terms that got common in the meantime are overweighted).
+#  {(db path, index table name): (n. of docs when cached, {term: n. of docs})}
+_doc_counts: dict[tuple[str, str], tuple[int, dict[str, int]]] = {}
+
+
+class SearchModeEnum(StrEnum):
+    # Stemmed word search on ItemFTSIndexIta/Eng.
+    WORD = "word"
+    # Substring search on ItemTrigramIndexIta/Eng.
+    SUBSTRING = "substring"
+    # Stemmed word search on PassageFTSIndexIta/Eng, collapsed to items.
+    PASSAGE = "passage"
+
+
+class SearchResults(list):
+    """
+    The list of index rows matching a search, plus some metadata.
+    """
+
+    def __init__(
+        self,
+        items=(),
+        suggestions: list[str] | None = None,
+        stats: dict | None = None,
+    ):
+        super().__init__(items)
+        # "Did you mean" alternative search texts, see SpellingDomain.
+        self.suggestions = suggestions or []
+        # The latency breakdown, when collected (see SearchStatsRecorder): when
+        #  requested or for the slow query log.
+        self.stats = stats
+
+
+class SearchStatsRecorder:
+    """
+    Record the wall time and the pages read from SQLite's page cache (hits) and
+     from the DB file (misses) of the phases of a search, when enabled.
+    The pages are counted as 0 when the SQLite C API is not available (see
+     sqlite_capi.get_handle()).
+
+    Usage:
+        recorder = SearchStatsRecorder(is_enabled=True)
+        with recorder.phase("compile"):
+            fts_query = compile_query(text, lang)
+        stats = recorder.get_stats()
+    """
+
+    def __init__(self, is_enabled: bool = True):
+        self.is_enabled = is_enabled
+        self.phases: dict[str, dict] = {}
+
+    @contextlib.contextmanager
+    def phase(self, name: str):
+        if not self.is_enabled:
+            yield
+            return
+        connection = get_connection()
+        n_hits, n_misses = get_cache_counters(connection)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            n_hits_end, n_misses_end = get_cache_counters(connection)
+            self.phases[name] = dict(
+                duration_ms=(time.perf_counter() - start) * 1000,
+                n_cache_hits=n_hits_end - n_hits,
+                n_cache_misses=n_misses_end - n_misses,
+            )
+
+    def subtract(self, name: str, other_names: list[str]) -> dict:
+        """
+        Return the phase `name` minus the other ones (which it includes).
+        """
+        return {
+            key: max(
+                value - sum(self.phases[x][key] for x in other_names),
+                0,
+            )
+            for key, value in self.phases[name].items()
+        }
+
+    def get_stats(self, n_matched: int | None = None, n_returned: int = 0) -> dict:
+        return dict(
+            phases=self.phases,
+            duration_ms=sum(x["duration_ms"] for x in self.phases.values()),
+            n_cache_hits=sum(x["n_cache_hits"] for x in self.phases.values()),
+            n_cache_misses=sum(x["n_cache_misses"] for x in self.phases.values()),
+            # None when not counted (eg. in passage mode).
+            n_matched=n_matched,
+            n_returned=n_returned,
+        )
+
 
 class CreateItemSchema(pydantic_utils.BasePydanticSchema):
     title: str
@@ -17,38 +156,939 @@ class CreateItemSchema(pydantic_utils.BasePydanticSchema):
     lang: LangEnum
 
 
+class UpdateItemsSchema(pydantic_utils.BasePydanticSchema):
+    # Only the fields that are not None are updated.
+    title: str | None = None
+    notes: str | None = None
+    lang: LangEnum | None = None
+
+
+class BaseItemDomainException(Exception):
+    pass
+
+
+class InvalidBulkWrite(BaseItemDomainException):
+    pass
+
+
+class InvalidItems(BaseItemDomainException):
+    pass
+
+
+class ItemNotFound(BaseItemDomainException):
+    pass
+
+
+class SimilarItemsNotSupported(BaseItemDomainException):
+    pass
+
+
+class SubstringModeNotEnabled(BaseItemDomainException):
+    pass
+
+
 class ItemDomain:
     def create_item(self, schema: CreateItemSchema) -> ItemModel:
-        # Note: this is only 1 INSERT query and it returns the model just created.
-        # So it is better than ItemModel.insert().execute() which is also 1 INSERT
-        #  query (the same one) but it returns only the id of the new model.
-        return ItemModel.create(**schema.to_dict())
+        if ShardDomain().is_enabled():
+            return ShardDomain().create_item(schema.to_dict())
+        if not DedupeDomain().is_enabled():
+            # Note: this is only 1 INSERT query and it returns the model just created.
+            # So it is better than ItemModel.insert().execute() which is also 1 INSERT
+            #  query (the same one) but it returns only the id of the new model.
+            return ItemModel.create(**schema.to_dict())
 
-    def read_items(self, item_id: int | None = None) -> peewee.ModelSelect:
-        items: peewee.ModelSelect = ItemModel.select()
-        if item_id is not None:
-            items = items.where(ItemModel.id == item_id)
+        with get_db().atomic():
+            [row] = DedupeDomain().dedupe([(schema.title, schema.notes)])
+            if row.is_rejected:
+                raise DuplicateItem(
+                    f"Near-duplicate of the item id={row.duplicate_of_id}"
+                    f" (similarity: {row.similarity:.2f})"
+                )
+            item = ItemModel.create(**schema.to_dict())
+            DedupeDomain().save([item.id], [row])
+        return item
+
+    def create_items(
+        self,
+        rows: Iterable[tuple[str, str | None, LangEnum | str]],
+        chunk_size: int | None = None,
+        do_defer_indexing: bool = False,
+    ) -> range:
+        """
+        Bulk create items from plain tuples (title, notes, lang), without the
+         CreateItemSchema and the ItemModel instance made per item by
+         `create_item()`: each chunk of `chunk_size` rows (default:
+         settings.BULK_CREATE_CHUNK_SIZE) is validated column by column and written
+         with a single prepared INSERT run with executemany(). All the chunks are
+         written in a single transaction, so the ids are contiguous.
+        When the dedupe is enabled (see DedupeDomain), the near-duplicates are
+         flagged or left out, and the range covers only the items written.
+        With `do_defer_indexing`, the triggers on insert of the word and trigram
+         indexes are dropped for the load, and the new items are indexed at the
+         end with a single INSERT ... SELECT per index, in the same transaction.
+         Ignored in the sharded layout.
+        Return the range of the ids assigned.
+        """
+        fields = [
+            ItemModel.created_at,
+            ItemModel.updated_at,
+            ItemModel.title,
+            ItemModel.notes,
+            ItemModel.lang,
+        ]
+        chunk_size = chunk_size or settings.BULK_CREATE_CHUNK_SIZE
+        is_sharded = ShardDomain().is_enabled()
+        is_dedupe_enabled = DedupeDomain().is_enabled()
+        sql, _ = ItemModel.insert({x: None for x in fields}).sql()
+        rows = iter(rows)
+        first_id, last_id = None, 0
+        with get_db().atomic():
+            if do_defer_indexing and not is_sharded:
+                triggers_sql = _drop_index_insert_triggers()
+            while chunk := list(itertools.islice(rows, chunk_size)):
+                titles, notes, langs = _get_item_columns(chunk)
+                now = ItemModel.created_at.db_value(datetime_utils.now_utc())
+                # The values converted column by column, as peewee would per item.
+                values = list(
+                    zip(
+                        itertools.repeat(now),
+                        itertools.repeat(now),
+                        titles,
+                        map(ItemModel.notes.db_value, notes),
+                        map(ItemModel.lang.db_value, langs),
+                    )
+                )
+                if is_dedupe_enabled:
+                    deduped = DedupeDomain().dedupe(list(zip(titles, notes)))
+                    values = [
+                        x for x, row in zip(values, deduped) if not row.is_rejected
+                    ]
+                    if not values:
+                        continue
+                if is_sharded:
+                    last_id = ShardDomain().create_items(values, fields)[-1]
+                else:
+                    # SQLite assigns the next AUTOINCREMENT id to each row.
+                    get_connection().executemany(sql, values)
+                    last_id = (
+                        get_db()
+                        .execute_sql("SELECT last_insert_rowid();")
+                        .fetchone()[0]
+                    )
+                if first_id is None:
+                    first_id = last_id - len(values) + 1
+                if is_dedupe_enabled:
+                    DedupeDomain().save(
+                        range(last_id - len(values) + 1, last_id + 1), deduped
+                    )
+            if do_defer_indexing and not is_sharded:
+                if first_id is not None:
+                    _index_items(first_id, last_id)
+                for trigger_sql in triggers_sql:
+                    get_db().execute_sql(trigger_sql)
+        return range(first_id or 1, last_id + 1)
+
+    def read_items(
+        self,
+        item_id: int | None = None,
+        created_after: datetime | None = None,
+        created_before: datetime | None = None,
+    ) -> peewee.SelectBase | list[ItemModel]:
+        """
+        Read items from the main DB and from the archives touched by the date filter.
+        Or from the shards, in the sharded layout.
+        """
+        if ShardDomain().is_enabled():
+            conditions = _get_date_conditions(ItemModel, created_after, created_before)
+            if item_id is not None:
+                conditions.append(ItemModel.id == item_id)
+            query = ItemModel.select()
+            if conditions:
+                query = query.where(*conditions)
+            return ShardDomain().read_items(query, item_id)
+
+        schemas = ArchiveDomain().get_partitions(created_after, created_before)
+        if schemas == ["main"]:
+            return self._make_read_query(item_id, created_after, created_before)
+        # The archives are attached in batches, so the items are read batch by batch.
+        items = []
+        for batch in ArchiveDomain().iter_attached(schemas):
+            queries = [
+                self._make_read_query(item_id, created_after, created_before, x)
+                for x in batch
+            ]
+            query: peewee.SelectBase = queries[0]
+            for other_query in queries[1:]:
+                query = query.union_all(other_query)
+            items.extend(query)
         return items
 
-    def search_items(self, text: str, lang: LangEnum) -> peewee.ModelSelect:
-        _ItemFTSIndex = get_index_class_for_lang(lang)
+    def _make_read_query(
+        self,
+        item_id: int | None = None,
+        created_after: datetime | None = None,
+        created_before: datetime | None = None,
+        schema: str = "main",
+    ) -> peewee.ModelSelect:
+        _ItemModel = get_model_for_schema(ItemModel, schema)
+        query = _ItemModel.select()
+        conditions = _get_date_conditions(_ItemModel, created_after, created_before)
+        if item_id is not None:
+            conditions.append(_ItemModel.id == item_id)
+        if conditions:
+            query = query.where(*conditions)
+        return query
+
+    def update_items(
+        self,
+        schema: UpdateItemsSchema,
+        item_ids: Iterable[int] | None = None,
+        lang: LangEnum | None = None,
+        created_after: datetime | None = None,
+        created_before: datetime | None = None,
+        do_all: bool = False,
+        chunk_size: int | None = None,
+        on_chunk_fn: Callable[[int], None] | None = None,
+    ) -> dict:
+        """
+        Update the fields set in `schema` of the items selected by the ids and the
+         filters (lang, date range), or of all the items with `do_all`. See
+         `_write_items()`.
+        """
+        fields = {k: v for k, v in schema.to_dict().items() if v is not None}
+        if not fields:
+            raise InvalidBulkWrite("No fields to update")
+        return self._write_items(
+            lambda ids: ItemModel.update(**fields).where(ItemModel.id.in_(ids)),
+            item_ids,
+            lang,
+            created_after,
+            created_before,
+            do_all,
+            chunk_size,
+            on_chunk_fn,
+        )
+
+    def delete_items(
+        self,
+        item_ids: Iterable[int] | None = None,
+        lang: LangEnum | None = None,
+        created_after: datetime | None = None,
+        created_before: datetime | None = None,
+        do_all: bool = False,
+        chunk_size: int | None = None,
+        on_chunk_fn: Callable[[int], None] | None = None,
+    ) -> dict:
+        """
+        Delete the items selected by the ids and the filters (lang, date range), or
+         all the items with `do_all`. See `_write_items()`.
+        """
+        return self._write_items(
+            lambda ids: ItemModel.delete().where(ItemModel.id.in_(ids)),
+            item_ids,
+            lang,
+            created_after,
+            created_before,
+            do_all,
+            chunk_size,
+            on_chunk_fn,
+        )
+
+    def _write_items(
+        self,
+        make_query_fn: Callable[[list[int]], peewee.Query],
+        item_ids: Iterable[int] | None = None,
+        lang: LangEnum | None = None,
+        created_after: datetime | None = None,
+        created_before: datetime | None = None,
+        do_all: bool = False,
+        chunk_size: int | None = None,
+        on_chunk_fn: Callable[[int], None] | None = None,
+    ) -> dict:
+        """
+        Run the bulk write made by `make_query_fn` on the selected items of the
+         main DB (not the archives), in chunks of `chunk_size` items (default:
+         settings.BULK_WRITE_CHUNK_SIZE) by id: each chunk is a single UPDATE or
+         DELETE statement, in its own transaction. So the triggers on item run
+         within a few large transactions, where FTS5 buffers the changes to the
+         indexes in memory and writes them once per transaction, rather than once
+         per item. And the write lock is held for a bounded time.
+        Return the n. of items written, the duration and the n. of items per sec.
+        """
+        if ShardDomain().is_enabled():
+            raise InvalidBulkWrite(
+                "Bulk writes are not supported in the sharded layout"
+            )
+        conditions = _get_date_conditions(ItemModel, created_after, created_before)
+        if lang is not None:
+            conditions.append(ItemModel.lang == lang)
+        if item_ids is None and not conditions and not do_all:
+            raise InvalidBulkWrite("No items selected: pass ids or filters, or do_all")
+        if chunk_size is None:
+            chunk_size = settings.BULK_WRITE_CHUNK_SIZE
+        if chunk_size < 1:
+            raise InvalidBulkWrite(f"Invalid chunk size: {chunk_size}")
+        ids_iter = iter(sorted(set(item_ids))) if item_ids is not None else None
+
+        n_items = 0
+        last_id = 0
+        start = time.perf_counter()
+        while True:
+            query = ItemModel.select(ItemModel.id).order_by(ItemModel.id)
+            if ids_iter is not None:
+                candidate_ids = list(itertools.islice(ids_iter, chunk_size))
+                if not candidate_ids:
+                    break
+                query = query.where(ItemModel.id.in_(candidate_ids), *conditions)
+            else:
+                # Keyset pagination, on the primary key.
+                query = query.where(ItemModel.id > last_id, *conditions)
+                query = query.limit(chunk_size)
+            with get_db().atomic():
+                ids = [x for (x,) in query.tuples()]
+                if ids:
+                    n_items += make_query_fn(ids).execute()
+            if on_chunk_fn:
+                on_chunk_fn(n_items)
+            if ids_iter is None:
+                if len(ids) < chunk_size:
+                    break
+                last_id = ids[-1]
+
+        duration = time.perf_counter() - start
+        return dict(
+            n_items=n_items,
+            duration_ms=duration * 1000,
+            n_items_per_sec=n_items / duration if duration else 0.0,
+        )
+
+    def search_items(
+        self,
+        text: str,
+        lang: LangEnum,
+        page: int = 1,
+        mode: SearchModeEnum = SearchModeEnum.WORD,
+        time_budget_ms: int | None = None,
+        vm_steps_budget: int | None = None,
+        do_use_cache: bool | None = None,
+        created_after: datetime | None = None,
+        created_before: datetime | None = None,
+        do_collect_stats: bool = False,
+    ) -> SearchResults:
+        """
+        Full-text search.
+        The text is compiled to a safe FTS5 expression (it raises InvalidSearchQuery)
+         and the query is executed here, within the given budget (defaults to
+         settings), and it raises QueryBudgetExceeded when over budget.
+        Results are paginated and, if enabled, cached in SearchCacheDomain.
+        Only the partitions (main DB and archives) touched by the date filter are
+         searched, and their results are merged by score. In the sharded layout,
+         all the shards are searched in parallel, see ShardDomain.
+        When there are (almost) no results, spelling suggestions are added, within
+         what is left of the time budget (see SpellingDomain).
+        With `do_collect_stats`, the results have the latency breakdown by phase
+         in `stats` (see `_profile_index_query`).
+        Slow (or sampled) searches are logged by SlowQueryLogDomain, if enabled.
+        """
+        started_at = time.perf_counter()
+        recorder = SearchStatsRecorder(
+            do_collect_stats or SlowQueryLogDomain().is_enabled()
+        )
+        n_matched = None
+        if time_budget_ms is None:
+            time_budget_ms = settings.SQLITE_SEARCH_TIME_BUDGET_MS
+        if vm_steps_budget is None:
+            vm_steps_budget = settings.SQLITE_SEARCH_VM_STEPS_BUDGET
+        with recorder.phase("compile"):
+            if SearchModeEnum(mode) == SearchModeEnum.SUBSTRING:
+                # The trigram indexes are not kept updated otherwise.
+                if not settings.IS_SUBSTRING_MODE_ENABLED:
+                    raise SubstringModeNotEnabled(
+                        "Substring mode requires IS_SUBSTRING_MODE_ENABLED"
+                    )
+                _ItemFTSIndex = get_trigram_index_class_for_lang(lang)
+                fts_query = compile_substring_query(text)
+            else:
+                # Passage mode too, as its results are collapsed to items.
+                _ItemFTSIndex = get_index_class_for_lang(lang)
+                fts_query = compile_query(text, LangEnum(lang))
+
+        if do_use_cache is None:
+            do_use_cache = settings.IS_SEARCH_CACHE_ENABLED
+        # The cache is written on misses, and a snapshot DB is read-only.
+        if settings.IS_DB_SNAPSHOT_MODE:
+            do_use_cache = False
+        if do_use_cache:
+            with recorder.phase("cache"):
+                cache = SearchCacheDomain()
+                cache_key = cache.make_key(
+                    fts_query, lang, page, mode, created_after, created_before
+                )
+                cached_results = cache.get(cache_key)
+            if cached_results is not None:
+                return self._make_search_results(
+                    [_ItemFTSIndex(**x) for x in cached_results],
+                    text,
+                    fts_query,
+                    lang,
+                    page,
+                    mode,
+                    recorder,
+                    started_at=started_at,
+                    time_budget_ms=time_budget_ms,
+                    vm_steps_budget=vm_steps_budget,
+                )
+
+        # Fetch all rows within the budget, as the query is lazy.
+        with query_budget(time_budget_ms, vm_steps_budget):
+            if SearchModeEnum(mode) == SearchModeEnum.PASSAGE:
+                with recorder.phase("query"):
+                    results = self._search_passages(
+                        fts_query, lang, page, created_after, created_before
+                    )
+            elif ShardDomain().is_enabled():
+                with recorder.phase("query"):
+                    results = ShardDomain().search(
+                        self._make_index_query(
+                            _ItemFTSIndex,
+                            fts_query,
+                            "main",
+                            created_after,
+                            created_before,
+                        ),
+                        page * settings.SQLITE_SEARCH_PAGE_SIZE,
+                        time_budget_ms,
+                        vm_steps_budget,
+                    )[(page - 1) * settings.SQLITE_SEARCH_PAGE_SIZE :]
+            else:
+                if do_collect_stats and ArchiveDomain().get_partitions(
+                    created_after, created_before
+                ) == ["main"]:
+                    n_matched = self._profile_index_query(
+                        recorder,
+                        _ItemFTSIndex,
+                        fts_query,
+                        page,
+                        created_after,
+                        created_before,
+                    )
+                with recorder.phase("query"):
+                    results = self._search_index(
+                        _ItemFTSIndex, fts_query, page, created_after, created_before
+                    )
+                if n_matched is not None:
+                    # The query is made of the profiled phases, plus the snippets.
+                    phases = recorder.phases
+                    phases["snippet"] = recorder.subtract("query", ["rank", "content"])
+                    phases["rank"] = recorder.subtract("rank", ["match"])
+                    del phases["query"]
+
+        if do_use_cache:
+            cache.set(
+                cache_key,
+                [
+                    dict(
+                        rowid=x.rowid,
+                        score=x.score,
+                        title_s=x.title_s,
+                        notes_s=x.notes_s,
+                    )
+                    for x in results
+                ],
+            )
+        return self._make_search_results(
+            results,
+            text,
+            fts_query,
+            lang,
+            page,
+            mode,
+            recorder,
+            n_matched,
+            started_at,
+            time_budget_ms,
+            vm_steps_budget,
+        )
 
+    def _profile_index_query(
+        self,
+        recorder: SearchStatsRecorder,
+        _ItemFTSIndex: type[peewee_utils.BaseFtsModelModel],
+        fts_query: str,
+        page: int,
+        created_after: datetime | None = None,
+        created_before: datetime | None = None,
+    ) -> int:
+        """
+        Run the steps of the search query (on the main DB) one at a time, to time
+         them: the MATCH, counting all the matching rows, the bm25 ranking of the
+         page and the fetch of its rows from the external content. The snippets are
+         then the rest of the search query.
+        Return the n. of matching rows.
+        Mind that the pages read by a step are then in the page cache for the next
+         ones, so the breakdown is approximate.
+        """
+        query = self._make_index_query(
+            _ItemFTSIndex, fts_query, "main", created_after, created_before
+        )
+        with recorder.phase("match"):
+            n_matched = (
+                query.select(peewee.fn.COUNT(_ItemFTSIndex.rowid)).order_by().scalar()
+            )
+        with recorder.phase("rank"):
+            rowids = [
+                x
+                for (x,) in query.select(_ItemFTSIndex.rowid)
+                .paginate(page, settings.SQLITE_SEARCH_PAGE_SIZE)
+                .tuples()
+            ]
+        with recorder.phase("content"):
+            list(
+                _ItemFTSIndex.select(
+                    _ItemFTSIndex.rowid, _ItemFTSIndex.title, _ItemFTSIndex.notes
+                )
+                .where(_ItemFTSIndex.rowid.in_(rowids))
+                .tuples()
+            )
+        return n_matched
+
+    def _search_index(
+        self,
+        _ItemFTSIndex: type[peewee_utils.BaseFtsModelModel],
+        fts_query: str,
+        page: int,
+        created_after: datetime | None = None,
+        created_before: datetime | None = None,
+    ) -> list:
+        schemas = ArchiveDomain().get_partitions(created_after, created_before)
+        if schemas == ["main"]:
+            query = self._make_index_query(
+                _ItemFTSIndex, fts_query, "main", created_after, created_before
+            )
+            return list(query.paginate(page, settings.SQLITE_SEARCH_PAGE_SIZE))
+
+        results = []
+        for batch in ArchiveDomain().iter_attached(schemas):
+            for schema in batch:
+                query = self._make_index_query(
+                    _ItemFTSIndex, fts_query, schema, created_after, created_before
+                )
+                # The top results of all the previous pages too, to merge them.
+                results.extend(query.limit(page * settings.SQLITE_SEARCH_PAGE_SIZE))
+
+        # Merge by score, in the same order as the query. Mind that bm25 scores of
+        #  different indexes are comparable only as long as their corpora are similar.
+        results.sort(key=lambda x: x.score, reverse=True)
+        start = (page - 1) * settings.SQLITE_SEARCH_PAGE_SIZE
+        return results[start : start + settings.SQLITE_SEARCH_PAGE_SIZE]
+
+    def _make_index_query(
+        self,
+        _ItemFTSIndex: type[peewee_utils.BaseFtsModelModel],
+        fts_query: str,
+        schema: str = "main",
+        created_after: datetime | None = None,
+        created_before: datetime | None = None,
+    ) -> peewee.ModelSelect:
+        _Index = get_model_for_schema(_ItemFTSIndex, schema)
+        _ItemModel = get_model_for_schema(ItemModel, schema)
         query: peewee.ModelSelect = (
-            _ItemFTSIndex.select(
-                _ItemFTSIndex.rowid,
-                _ItemFTSIndex.bm25().alias("score"),
-                _ItemFTSIndex.title.snippet(
+            _Index.select(
+                _Index.rowid,
+                _Index.bm25().alias("score"),
+                _Index.title.snippet(
                     settings.SQLITE_SEARCH_HIGHLIGHT_SEPARATOR_START,
                     settings.SQLITE_SEARCH_HIGHLIGHT_SEPARATOR_END,
                     max_tokens=settings.SQLITE_SEARCH_SNIPPET_SIZE,
                 ).alias("title_s"),
-                _ItemFTSIndex.notes.snippet(
+                _Index.notes.snippet(
                     settings.SQLITE_SEARCH_HIGHLIGHT_SEPARATOR_START,
                     settings.SQLITE_SEARCH_HIGHLIGHT_SEPARATOR_END,
                     max_tokens=settings.SQLITE_SEARCH_SNIPPET_SIZE,
                 ).alias("notes_s"),
             )
-            .where(_ItemFTSIndex.match(text))
-            .order_by(-_ItemFTSIndex.bm25())
+            .where(_Index.match(fts_query))
+            .order_by(-_Index.bm25())
         )
+        conditions = _get_date_conditions(_ItemModel, created_after, created_before)
+        if conditions:
+            query = query.join(_ItemModel, on=(_ItemModel.id == _Index.rowid)).where(
+                *conditions
+            )
         return query
+
+    def _search_passages(
+        self,
+        fts_query: str,
+        lang: LangEnum,
+        page: int,
+        created_after: datetime | None = None,
+        created_before: datetime | None = None,
+    ) -> list:
+        """
+        Search the passages and collapse them to items: an item is ranked by its
+         best passage, which is also the one used for the snippets.
+        Only a page of passages gets snippets, so memory and latency do not depend
+         on the size of the notes.
+        Mind that passages are in the main DB only, not in the archives.
+        """
+        _PassageFTSIndex = get_passage_index_class_for_lang(lang)
+        # Mind that auxiliary functions like bm25() are not allowed in aggregates,
+        #  but the hidden `rank` column (which is bm25) is. And with MIN() the bare
+        #  column `passage.id` is the one of the best passage.
+        best_passages = list(
+            _PassageFTSIndex.select(
+                PassageModel.item_id,
+                PassageModel.id.alias("passage_id"),
+                peewee.fn.MIN(_PassageFTSIndex.rank()).alias("score"),
+            )
+            .join(PassageModel, on=(PassageModel.id == _PassageFTSIndex.rowid))
+            .join(ItemModel, on=(ItemModel.id == PassageModel.item_id))
+            .where(
+                _PassageFTSIndex.match(fts_query),
+                *_get_date_conditions(ItemModel, created_after, created_before),
+            )
+            .group_by(PassageModel.item_id)
+            .order_by(peewee.SQL("score").desc())
+            .paginate(page, settings.SQLITE_SEARCH_PAGE_SIZE)
+            .dicts()
+        )
+        snippets_by_passage_id = {
+            x.rowid: x
+            for x in _PassageFTSIndex.select(
+                _PassageFTSIndex.rowid,
+                _PassageFTSIndex.title.snippet(
+                    settings.SQLITE_SEARCH_HIGHLIGHT_SEPARATOR_START,
+                    settings.SQLITE_SEARCH_HIGHLIGHT_SEPARATOR_END,
+                    max_tokens=settings.SQLITE_SEARCH_SNIPPET_SIZE,
+                ).alias("title_s"),
+                _PassageFTSIndex.notes.snippet(
+                    settings.SQLITE_SEARCH_HIGHLIGHT_SEPARATOR_START,
+                    settings.SQLITE_SEARCH_HIGHLIGHT_SEPARATOR_END,
+                    max_tokens=settings.SQLITE_SEARCH_SNIPPET_SIZE,
+                ).alias("notes_s"),
+            ).where(
+                _PassageFTSIndex.match(fts_query)
+                & _PassageFTSIndex.rowid.in_([x["passage_id"] for x in best_passages])
+            )
+        }
+
+        _ItemFTSIndex = get_index_class_for_lang(lang)
+        return [
+            _ItemFTSIndex(
+                rowid=x["item_id"],
+                score=x["score"],
+                title_s=snippets_by_passage_id[x["passage_id"]].title_s,
+                notes_s=snippets_by_passage_id[x["passage_id"]].notes_s,
+            )
+            for x in best_passages
+        ]
+
+    def _make_search_results(
+        self,
+        items: list,
+        text: str,
+        fts_query: str,
+        lang: LangEnum,
+        page: int,
+        mode: SearchModeEnum,
+        recorder: SearchStatsRecorder | None = None,
+        n_matched: int | None = None,
+        started_at: float | None = None,
+        time_budget_ms: float | None = None,
+        vm_steps_budget: int | None = None,
+    ) -> SearchResults:
+        recorder = recorder or SearchStatsRecorder(is_enabled=False)
+        results = SearchResults(items)
+        if (
+            page == 1
+            and SearchModeEnum(mode) == SearchModeEnum.WORD
+            and len(results) < settings.SPELLING_SUGGESTIONS_MIN_RESULTS
+        ):
+            # The suggestions share the budget of the search: what is left of it.
+            if time_budget_ms and started_at is not None:
+                time_budget_ms -= (time.perf_counter() - started_at) * 1000
+                if time_budget_ms <= 0:
+                    time_budget_ms = -1
+            with recorder.phase("suggestions"):
+                results.suggestions = SpellingDomain().suggest(
+                    text, lang, time_budget_ms, vm_steps_budget
+                )
+        if recorder.is_enabled:
+            results.stats = recorder.get_stats(n_matched, len(results))
+            if SlowQueryLogDomain().is_enabled():
+                SlowQueryLogDomain().log(fts_query, lang, mode, results.stats)
+        return results
+
+    def similar_items(self, item_id: int, k: int = 10) -> list[ItemModel]:
+        """
+        "More like this": return the k items most similar to the given one, in its
+         lang, best first, with their cosine similarity (0-1) in `score`.
+        The most distinctive terms of the item (by TF-IDF, with the doc frequencies
+         of the FTS5 vocabulary) retrieve from the word index the candidates with
+         most of them, which are reranked by the cosine similarity of their TF-IDF
+         vectors, with NumPy. The terms, the postings read and the candidates are
+         bounded by settings.SIMILAR_*, so the latency does not grow with the size
+         of the DB, nor with how common the words of the item are.
+        Mind that only the main DB is searched (not the archives), and that the
+         sharded layout is not supported.
+        """
+        if ShardDomain().is_enabled():
+            raise SimilarItemsNotSupported(
+                "Similar items are not supported in the sharded layout"
+            )
+        item = ItemModel.get_or_none(ItemModel.id == item_id)
+        if item is None:
+            raise ItemNotFound(f"Item id={item_id} not found")
+        _ItemFTSIndex = get_index_class_for_lang(item.lang)
+        table = _ItemFTSIndex._meta.table_name
+        _create_similar_tables(_ItemFTSIndex)
+        averages = decode_averages(
+            get_data_block(get_connection(), table, AVERAGES_ROWID)
+        )
+        n_docs = averages[0] if averages else 0
+
+        # The query: the terms of the item with the highest TF-IDF, but those only in
+        #  the item (they retrieve nothing).
+        term_counts = _get_term_counts(_ItemFTSIndex, [item_id])
+        terms = [x[1] for x in term_counts]
+        doc_counts = _get_doc_counts(table, terms, n_docs)
+        df = np.array([doc_counts[x] for x in terms], dtype=np.float64)
+        weights = _get_tf_idf(
+            np.array([x[2] for x in term_counts], dtype=np.float64), df, n_docs
+        )
+        # The params of the postings query: (weight, term, max n. of postings).
+        query_terms = [
+            (float(weights[i]), terms[i], settings.SIMILAR_MAX_TERM_POSTINGS)
+            for i in np.argsort(-weights, kind="stable")
+            if df[i] > 1
+        ][: settings.SIMILAR_N_QUERY_TERMS]
+        if not query_terms:
+            return []
+
+        # The candidates: the items with the highest sum of the weights of the query
+        #  terms they contain (once per occurrence), read from the postings of the
+        #  index. Mind that the postings of a term are in id order, so those of the
+        #  most common terms are truncated to their oldest items.
+        postings_sql = " UNION ALL ".join(
+            f"SELECT * FROM (SELECT doc, ? AS weight FROM temp.{table}_instance"
+            " WHERE term = ? LIMIT ?)"
+            for _ in query_terms
+        )
+        candidate_ids = [
+            x
+            for (x,) in get_db().execute_sql(
+                f"SELECT doc FROM ({postings_sql}) WHERE doc != ?"
+                " GROUP BY doc ORDER BY SUM(weight) DESC, doc LIMIT ?;",
+                (
+                    *itertools.chain.from_iterable(query_terms),
+                    item_id,
+                    settings.SIMILAR_N_CANDIDATES,
+                ),
+            )
+        ]
+        if not candidate_ids:
+            return []
+
+        # The rerank: the TF-IDF vectors are sparse, as (doc, term, weight) triples,
+        #  with doc 0 the item and doc i the i-th candidate.
+        term_counts += _get_term_counts(_ItemFTSIndex, candidate_ids)
+        doc_index = {x: i for i, x in enumerate([item_id, *candidate_ids])}
+        docs, terms, counts = zip(*term_counts)
+        docs = np.array([doc_index[x] for x in docs], dtype=np.int64)
+        vocabulary = list(dict.fromkeys(terms))
+        term_index = {x: i for i, x in enumerate(vocabulary)}
+        term_ids = np.array([term_index[x] for x in terms], dtype=np.int64)
+        doc_counts = _get_doc_counts(table, vocabulary, n_docs)
+        df = np.array([doc_counts[x] for x in vocabulary], dtype=np.float64)
+        weights = _get_tf_idf(np.array(counts, dtype=np.float64), df[term_ids], n_docs)
+        query = np.zeros(len(vocabulary))
+        query[term_ids[docs == 0]] = weights[docs == 0]
+        # The sparse dot products with the item and the norms, summed by doc.
+        dots = np.bincount(docs, weights=weights * query[term_ids])
+        norms = np.sqrt(np.bincount(docs, weights=weights * weights))
+        scores = dots[1:] / (norms[1:] * norms[0])
+
+        top = np.argsort(-scores, kind="stable")[:k]
+        items_by_id = {
+            x.id: x
+            for x in ItemModel.select().where(
+                ItemModel.id.in_([candidate_ids[i] for i in top])
+            )
+        }
+        results = []
+        for i in top:
+            item = items_by_id[candidate_ids[i]]
+            item.score = float(scores[i])
+            results.append(item)
+        return results
+
+    @staticmethod
+    def clear_similar_cache() -> None:
+        _doc_counts.clear()
+
+
+def _drop_index_insert_triggers() -> list[str]:
+    """
+    Drop the triggers on insert of the word and trigram indexes. Return their SQL,
+     to create them again.
+    """
+    triggers_sql = []
+    for index_class in DEFERRED_INDEX_CLASSES:
+        name = f"update_{index_class._meta.table_name}_after_insert_on_item"
+        row = get_db().execute_sql(
+            "SELECT sql FROM sqlite_master WHERE type = 'trigger' AND name = ?;",
+            (name,),
+        )
+        triggers_sql.append(row.fetchone()[0])
+        get_db().execute_sql(f"DROP TRIGGER {name};")
+    return triggers_sql
+
+
+def _index_items(first_id: int, last_id: int) -> None:
+    """
+    Index the items with ids in [first_id, last_id] in the word and trigram indexes
+     of their lang, like their triggers on insert (so the trigram ones only when
+     settings.IS_SUBSTRING_MODE_ENABLED).
+    """
+    for index_class in DEFERRED_INDEX_CLASSES:
+        if (
+            index_class in (ItemTrigramIndexIta, ItemTrigramIndexEng)
+            and not settings.IS_SUBSTRING_MODE_ENABLED
+        ):
+            continue
+        table = index_class._meta.table_name
+        get_db().execute_sql(
+            f"INSERT INTO {table}(rowid, title, notes)"
+            f" SELECT id, title, notes FROM {ITEM_CONTENT_VIEW_NAME}"
+            " WHERE lang = ? AND id BETWEEN ? AND ?;",
+            (index_class._LANG.value, first_id, last_id),
+        )
+
+
+def _create_similar_tables(
+    _ItemFTSIndex: type[ItemFTSIndexIta | ItemFTSIndexEng],
+) -> None:
+    """
+    Create the temp tables of `similar_items()`, for the given word index: its
+     vocabulary, by term (the doc frequencies) and by posting, and a scratch FTS5
+     table with the same tokenizer, with its vocabulary by posting, to tokenize the
+     items exactly like the index does.
+    Docs: https://sqlite.org/fts5.html#the_fts5vocab_virtual_table_module
+    """
+    table = _ItemFTSIndex._meta.table_name
+    db = get_db()
+    # The tokenize option of the live index, rather than the Meta's one, which is
+    #  not updated by a reindex (see ReindexDomain).
+    sql = db.execute_sql(
+        "SELECT sql FROM sqlite_master WHERE name = ?;", (table,)
+    ).fetchone()[0]
+    tokenize = re.search(r"""tokenize\s*=\s*(['"])(.*?)\1""", sql).group(2)
+    # The same vocabulary table as SpellingDomain.
+    db.execute_sql(
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS temp.{table}_vocab"
+        f" USING fts5vocab(main, {table}, 'row');"
+    )
+    db.execute_sql(
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS temp.{table}_instance"
+        f" USING fts5vocab(main, {table}, 'instance');"
+    )
+    db.execute_sql(
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS temp.{table}_scratch"
+        f" USING fts5(title, notes, tokenize = '{tokenize}');"
+    )
+    db.execute_sql(
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS temp.{table}_scratch_instance"
+        f" USING fts5vocab(temp, {table}_scratch, 'instance');"
+    )
+
+
+def _get_term_counts(
+    _ItemFTSIndex: type[ItemFTSIndexIta | ItemFTSIndexEng], item_ids: list[int]
+) -> list[tuple[int, str, int]]:
+    """
+    Tokenize the items with the scratch table of the index (see
+     `_create_similar_tables()`). Return the (item id, term, n. of occurrences) rows.
+    """
+    table = _ItemFTSIndex._meta.table_name
+    db = get_db()
+    db.execute_sql(
+        f"INSERT INTO temp.{table}_scratch(rowid, title, notes)"
+        f" SELECT id, title, notes FROM {ITEM_CONTENT_VIEW_NAME}"
+        " WHERE id IN (SELECT value FROM json_each(?));",
+        (json.dumps(item_ids),),
+    )
+    try:
+        return list(
+            db.execute_sql(
+                f"SELECT doc, term, COUNT(*) FROM temp.{table}_scratch_instance"
+                " GROUP BY doc, term;"
+            )
+        )
+    finally:
+        db.execute_sql(f"DELETE FROM temp.{table}_scratch;")
+
+
+def _get_doc_counts(table: str, terms: Iterable[str], n_docs: int) -> dict[str, int]:
+    """
+    Return the cached doc frequencies of the index (see `_doc_counts`), with those
+     of the given terms, read from its vocabulary if missing.
+    """
+    cache_key = (settings.DB_PATH, table)
+    cached_n_docs, doc_counts = _doc_counts.get(cache_key, (n_docs, {}))
+    if (
+        abs(n_docs - cached_n_docs)
+        > cached_n_docs * settings.SIMILAR_DOC_COUNTS_MAX_DRIFT
+    ):
+        cached_n_docs, doc_counts = n_docs, {}
+    _doc_counts[cache_key] = (cached_n_docs, doc_counts)
+    if missing_terms := [x for x in terms if x not in doc_counts]:
+        # Never 0, for the terms not in the index anymore.
+        doc_counts.update(dict.fromkeys(missing_terms, 1))
+        doc_counts.update(
+            get_db().execute_sql(
+                f"SELECT term, doc FROM temp.{table}_vocab"
+                " WHERE term IN (SELECT value FROM json_each(?));",
+                (json.dumps(missing_terms),),
+            )
+        )
+    return doc_counts
+
+
+def _get_tf_idf(counts: np.ndarray, df: np.ndarray, n_docs: int) -> np.ndarray:
+    """
+    TF-IDF weights, with sublinear TF and smooth IDF (never 0, nor negative).
+    """
+    return (1 + np.log(counts)) * (np.log((1 + n_docs) / (1 + df)) + 1)
+
+
+def _get_item_columns(rows: list[tuple]) -> tuple[tuple, tuple, tuple]:
+    """
+    Validate the rows (title, notes, lang) of a bulk create, column by column, like
+     CreateItemSchema. Return the columns.
+    """
+    try:
+        titles, notes, langs = zip(*rows, strict=True)
+    except (TypeError, ValueError) as exc:
+        raise InvalidItems("Each row must be a tuple: title, notes, lang") from exc
+    if not all(isinstance(x, str) for x in titles):
+        raise InvalidItems("All titles must be strings")
+    if not all(x is None or isinstance(x, str) for x in notes):
+        raise InvalidItems("All notes must be strings or None")
+    # LangEnum is a StrEnum: its members are equal to their values.
+    if invalid_langs := set(langs) - set(LangEnum):
+        raise InvalidItems(f"Invalid langs: {sorted(map(str, invalid_langs))}")
+    return titles, notes, langs
+
+
+def _get_date_conditions(
+    _ItemModel: type[ItemModel],
+    created_after: datetime | None = None,
+    created_before: datetime | None = None,
+) -> list:
+    conditions = []
+    if created_after is not None:
+        conditions.append(_ItemModel.created_at >= created_after)
+    if created_before is not None:
+        conditions.append(_ItemModel.created_at < created_before)
+    return conditions
@@ -0,0 +1,395 @@
+"""
+Compiler from the user's search text to a safe and cheap FTS5 query string.
+
+The user's text is parsed (leniently: stray quotes, parentheses and operators are
+ dropped, not raised) into a small AST, costly constructs are rewritten or rejected
+ and then a canonical FTS5 expression is emitted, where every term is quoted.
+
+Supported syntax (a subset of https://sqlite.org/fts5.html#full_text_query_syntax):
+    zampa dente             implicit AND
+    zampa AND dente         AND, OR, NOT (uppercase only, like FTS5)
+    "la gatta al lardo"     phrase
+    zamp*                   prefix (min length: SQLITE_SEARCH_MIN_PREFIX_LENGTH)
+    title:zampa             column filter, also: title:(zampa OR dente)
+    NEAR(gatta lardo, 5)    NEAR group
+
+When the lang is given, its stopwords (settings.SQLITE_SEARCH_STOPWORDS_PATHS) are
+ removed from the AND-ed terms, as they match almost every row and so they make
+ queries walk huge doclists. Phrases are left untouched.
+
+Substring searches on the trigram indexes are compiled, instead, by
+ compile_substring_query() to a single phrase.
+
+Usage:
+    compile_query('title:gatta "al lardo" zamp*')
+    # 'title:"gatta" AND "al lardo" AND "zamp"*'
+    compile_query("la gatta di papà", LangEnum.ITA)
+    # '"gatta" AND "papà"'
+"""
+
+import functools
+import re
+from dataclasses import dataclass
+
+from ..conf import settings
+from ..data_models.db_models import LangEnum
+
+COLUMNS = ("title", "notes")
+FTS5_NEAR_DEFAULT_DISTANCE = 10
+
+_WORD_RE = re.compile(r"\w+")
+
+
+class BaseQueryCompilerException(Exception):
+    pass
+
+
+class InvalidSearchQuery(BaseQueryCompilerException):
+    pass
+
+
+# AST.
+
+
+@dataclass(frozen=True)
+class Term:
+    text: str
+    is_prefix: bool = False
+
+
+@dataclass(frozen=True)
+class Phrase:
+    terms: tuple[str, ...]
+    is_prefix: bool = False
+
+
+@dataclass(frozen=True)
+class Near:
+    phrases: tuple[Term | Phrase, ...]
+    distance: int = FTS5_NEAR_DEFAULT_DISTANCE
+
+
+@dataclass(frozen=True)
+class Column:
+    column: str
+    child: "Node"
+
+
+@dataclass(frozen=True)
+class And:
+    children: tuple["Node", ...]
+
+
+@dataclass(frozen=True)
+class Or:
+    children: tuple["Node", ...]
+
+
+@dataclass(frozen=True)
+class Not:
+    left: "Node"
+    right: "Node"
+
+
+Node = Term | Phrase | Near | Column | And | Or | Not
+
+
+# Lexer.
+
+
+@dataclass(frozen=True)
+class _Token:
+    kind: str  # One of: WORD, PHRASE, COLUMN, AND, OR, NOT, NEAR, (, ), ",".
+    value: str = ""
+    is_prefix: bool = False
+
+
+def _tokenize(text: str) -> list[_Token]:
+    tokens = []
+    i = 0
+    while i < len(text):
+        char = text[i]
+        if char.isspace():
+            i += 1
+        elif char == '"':
+            # A stray quote just quotes the rest of the text.
+            end = text.find('"', i + 1)
+            end = len(text) if end == -1 else end
+            is_prefix = text[end + 1 : end + 2] == "*"
+            tokens.append(_Token("PHRASE", text[i + 1 : end], is_prefix))
+            i = end + (2 if is_prefix else 1)
+        elif char in "(),":
+            tokens.append(_Token(char))
+            i += 1
+        else:
+            end = i
+            while end < len(text) and not (text[end].isspace() or text[end] in '"(),'):
+                end += 1
+            run = text[i:end]
+            column, sep, _ = run.partition(":")
+            if sep and column.lower() in COLUMNS:
+                tokens.append(_Token("COLUMN", column.lower()))
+                # Lex what follows the colon on its own.
+                i += len(column) + 1
+                continue
+            if run in ("AND", "OR", "NOT") or (
+                run == "NEAR" and text[end : end + 1] == "("
+            ):
+                tokens.append(_Token(run))
+            else:
+                # Leading wildcards are not supported by FTS5: they are dropped.
+                tokens.append(_Token("WORD", run, run.endswith("*")))
+            i = end
+    return tokens
+
+
+# Parser.
+
+
+class _Parser:
+    def __init__(self, tokens: list[_Token]):
+        self.tokens = tokens
+        self.pos = 0
+
+    def peek(self) -> str | None:
+        return self.tokens[self.pos].kind if self.pos < len(self.tokens) else None
+
+    def next(self) -> _Token:
+        token = self.tokens[self.pos]
+        self.pos += 1
+        return token
+
+    def parse(self) -> Node | None:
+        node = None
+        while self.peek() is not None:
+            node = _combine(And, node, self.parse_or())
+            # Skip stray closing parentheses and commas.
+            if self.peek() in (")", ","):
+                self.next()
+        return node
+
+    def parse_or(self) -> Node | None:
+        node = self.parse_and()
+        while self.peek() == "OR":
+            self.next()
+            node = _combine(Or, node, self.parse_and())
+        return node
+
+    def parse_and(self) -> Node | None:
+        node = self.parse_not()
+        while self.peek() not in (None, "OR", ")", ","):
+            if self.peek() == "AND":
+                self.next()
+            node = _combine(And, node, self.parse_not())
+        return node
+
+    def parse_not(self) -> Node | None:
+        node = self.parse_unary()
+        while self.peek() == "NOT":
+            self.next()
+            right = self.parse_unary()
+            if node is None:
+                # A leading NOT has no left operand in FTS5: keep the right one.
+                node = right
+            elif right is not None:
+                node = Not(node, right)
+        return node
+
+    def parse_unary(self) -> Node | None:
+        kind = self.peek()
+        if kind in ("AND", "NOT"):
+            # Stray operator (OR is handled by the caller).
+            self.next()
+            return None
+        if kind == "COLUMN":
+            column = self.next().value
+            child = self.parse_unary()
+            if child is None or isinstance(child, Column):
+                # FTS5 has no `a:b:term` syntax: the innermost column filter wins.
+                return child
+            return Column(column, child)
+        if kind == "(":
+            self.next()
+            node = self.parse_or()
+            if self.peek() == ")":
+                self.next()
+            return node
+        if kind == "NEAR":
+            return self.parse_near()
+        if kind in ("WORD", "PHRASE"):
+            return _make_phrase(self.next())
+        return None
+
+    def parse_near(self) -> Node | None:
+        self.next()  # NEAR.
+        self.next()  # (.
+        phrases = []
+        distance = FTS5_NEAR_DEFAULT_DISTANCE
+        while self.peek() in ("WORD", "PHRASE"):
+            phrase = _make_phrase(self.next())
+            if phrase is not None:
+                phrases.append(phrase)
+        if self.peek() == ",":
+            self.next()
+            if self.peek() == "WORD" and self.tokens[self.pos].value.isdigit():
+                distance = int(self.next().value)
+        if self.peek() == ")":
+            self.next()
+        if len(phrases) < 2:
+            return phrases[0] if phrases else None
+        distance = min(distance, settings.SQLITE_SEARCH_MAX_NEAR_DISTANCE)
+        return Near(tuple(phrases), distance)
+
+
+def _combine(klass: type[And | Or], left: Node | None, right: Node | None):
+    if left is None or right is None:
+        return left or right
+    children = []
+    for node in (left, right):
+        children.extend(node.children if isinstance(node, klass) else (node,))
+    return klass(tuple(children))
+
+
+def _make_phrase(token: _Token) -> Term | Phrase | None:
+    words = tuple(x.lower() for x in _WORD_RE.findall(token.value))
+    if not words:
+        return None
+    # Short prefixes match a huge n. of terms: they are searched as exact terms.
+    is_prefix = (
+        token.is_prefix and len(words[-1]) >= settings.SQLITE_SEARCH_MIN_PREFIX_LENGTH
+    )
+    if len(words) == 1:
+        return Term(words[0], is_prefix)
+    return Phrase(words, is_prefix)
+
+
+# Emitter.
+
+
+def _count_terms(node: Node) -> int:
+    match node:
+        case Term():
+            return 1
+        case Phrase():
+            return len(node.terms)
+        case Near():
+            return sum(_count_terms(x) for x in node.phrases)
+        case Column():
+            return _count_terms(node.child)
+        case And() | Or():
+            return sum(_count_terms(x) for x in node.children)
+        case Not():
+            return _count_terms(node.left) + _count_terms(node.right)
+
+
+def _quote(text: str) -> str:
+    return '"' + text.replace('"', '""') + '"'
+
+
+def emit(node: Node) -> str:
+    """
+    Emit the canonical FTS5 query string for the given AST.
+    """
+    match node:
+        case Term():
+            return _quote(node.text) + ("*" if node.is_prefix else "")
+        case Phrase():
+            return _quote(" ".join(node.terms)) + ("*" if node.is_prefix else "")
+        case Near():
+            phrases = " ".join(emit(x) for x in node.phrases)
+            return f"NEAR({phrases}, {node.distance})"
+        case Column():
+            return f"{node.column}:{_emit_operand(node.child)}"
+        case And():
+            return " AND ".join(_emit_operand(x) for x in node.children)
+        case Or():
+            return " OR ".join(_emit_operand(x) for x in node.children)
+        case Not():
+            return f"{_emit_operand(node.left)} NOT {_emit_operand(node.right)}"
+
+
+def _emit_operand(node: Node) -> str:
+    if isinstance(node, (And, Or, Not)):
+        return f"({emit(node)})"
+    return emit(node)
+
+
+def parse_query(text: str) -> Node:
+    node = _Parser(_tokenize(text)).parse()
+    if node is None:
+        raise InvalidSearchQuery(f"No search terms in: {text!r}")
+    n_terms = _count_terms(node)
+    if n_terms > settings.SQLITE_SEARCH_MAX_QUERY_TERMS:
+        raise InvalidSearchQuery(
+            f"Too many search terms: {n_terms} (max {settings.SQLITE_SEARCH_MAX_QUERY_TERMS})"
+        )
+    return node
+
+
+@functools.cache
+def get_stopwords(lang: LangEnum) -> frozenset[str]:
+    path = (settings.SQLITE_SEARCH_STOPWORDS_PATHS or {}).get(LangEnum(lang).value)
+    if not path:
+        return frozenset()
+    with open(path, encoding="utf-8") as fin:
+        return frozenset(
+            line.strip() for line in fin if line.strip() and not line.startswith("#")
+        )
+
+
+def remove_stopwords(node: Node, stopwords: frozenset[str]) -> Node | None:
+    """
+    Remove the stopwords from the AST.
+    When all the operands of an AND (or NEAR) are stopwords, they are all kept,
+     so it never returns an empty query for a non-empty one.
+    """
+    match node:
+        case Term():
+            return None if node.text in stopwords and not node.is_prefix else node
+        case Column():
+            child = remove_stopwords(node.child, stopwords)
+            return Column(node.column, child) if child is not None else None
+        case And():
+            children = [remove_stopwords(x, stopwords) for x in node.children]
+            children = [x for x in children if x is not None]
+            if not children:
+                return None
+            return children[0] if len(children) == 1 else And(tuple(children))
+        case Near():
+            phrases = [x for x in node.phrases if remove_stopwords(x, stopwords)]
+            return Near(tuple(phrases), node.distance) if len(phrases) > 1 else node
+        case Or():
+            return Or(tuple(remove_stopwords(x, stopwords) or x for x in node.children))
+        case Not():
+            return Not(
+                remove_stopwords(node.left, stopwords) or node.left,
+                remove_stopwords(node.right, stopwords) or node.right,
+            )
+        case _:
+            return node
+
+
+@functools.lru_cache(maxsize=settings.SQLITE_SEARCH_QUERY_COMPILER_CACHE_SIZE)
+def compile_query(text: str, lang: LangEnum | None = None) -> str:
+    """
+    Compile the user's search text to a canonical FTS5 query string.
+    Memoized in a bounded LRU cache, keyed by the raw text (and lang).
+    """
+    node = parse_query(text)
+    if lang is not None:
+        node = remove_stopwords(node, get_stopwords(lang)) or node
+    return emit(node)
+
+
+def compile_substring_query(text: str) -> str:
+    """
+    Compile the user's search text to a FTS5 query string for the trigram indexes:
+     a single phrase, matching the text as a substring.
+    """
+    text = " ".join(text.split())
+    if len(text) < 3:
+        # Shorter strings have no trigram: they cannot use the index.
+        raise InvalidSearchQuery(
+            f"Substring searches require at least 3 characters: {text!r}"
+        )
+    return _quote(text)
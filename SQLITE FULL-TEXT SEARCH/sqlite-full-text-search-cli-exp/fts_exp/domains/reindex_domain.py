@@ -0,0 +1,202 @@
+"""
+Online reindex of an FTS5 index on item, eg. to change its tokenizer, with no
+ downtime for searches:
+ 1. a shadow index is created with the new options, together with TRIGGERS that
+     mirror the writes on item into it, but only for the items already copied (with
+     id <= the checkpoint);
+ 2. the items are copied in chunks, each one in its own transaction together with
+     the checkpoint (ReindexCheckpointModel): so the process can be killed and
+     resumed, and writers are blocked only for a chunk at a time;
+ 3. the live index is dropped and the shadow index is renamed in its place, in a
+     single transaction: until its commit, searches keep using the old index.
+
+Mind that the new options are not persisted in the models' Meta: update them too,
+ or new DBs will be created with the old ones.
+
+Usage:
+    domain = ReindexDomain(IndexKindEnum.WORD, LangEnum.ITA)
+    domain.reindex("snowball italian unicode61 remove_diacritics 2")
+"""
+
+from enum import StrEnum
+from typing import Callable, Type
+
+import peewee_utils
+
+from ..conf import settings
+from ..data_models.db_models import (
+    ITEM_CONTENT_VIEW_NAME,
+    ITEM_WRITES_COUNTER,
+    CounterModel,
+    ItemModel,
+    LangEnum,
+    ReindexCheckpointModel,
+    get_index_class_for_lang,
+    get_index_triggers_names,
+    get_index_triggers_sql,
+    get_trigram_index_class_for_lang,
+)
+from ..data_models.db_utils import get_db
+
+
+class IndexKindEnum(StrEnum):
+    # ItemFTSIndexIta/Eng.
+    WORD = "word"
+    # ItemTrigramIndexIta/Eng.
+    TRIGRAM = "trigram"
+
+
+class BaseReindexDomainException(Exception):
+    pass
+
+
+class ReindexInProgress(BaseReindexDomainException):
+    pass
+
+
+class ReindexDomain:
+    def __init__(self, kind: IndexKindEnum, lang: LangEnum):
+        self.lang = LangEnum(lang)
+        if IndexKindEnum(kind) == IndexKindEnum.TRIGRAM:
+            self.index_class = get_trigram_index_class_for_lang(self.lang)
+        else:
+            self.index_class = get_index_class_for_lang(self.lang)
+        self.index_table = self.index_class._meta.table_name
+        self.shadow_table = f"{self.index_table}_shadow"
+
+    def get_checkpoint(self) -> ReindexCheckpointModel | None:
+        return ReindexCheckpointModel.get_or_none(
+            ReindexCheckpointModel.index_table == self.index_table
+        )
+
+    def start(self, tokenize: str | None = None) -> ReindexCheckpointModel:
+        """
+        Create the shadow index, its triggers and the checkpoint. Or return the
+         checkpoint of the reindex in progress, to resume it.
+        """
+        checkpoint = self.get_checkpoint()
+        if checkpoint is not None:
+            if tokenize and tokenize != checkpoint.tokenize:
+                raise ReindexInProgress(
+                    f"A reindex of {self.index_table} with tokenize={checkpoint.tokenize!r}"
+                    " is in progress: resume it or abort it first"
+                )
+            return checkpoint
+
+        tokenize = tokenize or self.index_class._meta.options["tokenize"]
+        db = get_db()
+        with db.atomic():
+            # Leftovers of a crash before the checkpoint was created.
+            self._drop_shadow()
+            self._make_shadow_class().create_table(safe=False, tokenize=tokenize)
+            max_item_id_sql = (
+                f"SELECT last_item_id FROM {ReindexCheckpointModel._meta.table_name}"
+                f" WHERE index_table = '{self.index_table}'"
+            )
+            for sql in get_index_triggers_sql(
+                self.shadow_table, self.lang, max_item_id_sql
+            ):
+                db.execute_sql(sql)
+            return ReindexCheckpointModel.create(
+                index_table=self.index_table, tokenize=tokenize
+            )
+
+    def build_chunk(self, chunk_size: int | None = None) -> int:
+        """
+        Copy the next chunk of items into the shadow index and move the checkpoint
+         forward, in a single transaction. Return the n. of items copied, 0 when
+         the copy is complete.
+        """
+        chunk_size = chunk_size or settings.REINDEX_CHUNK_SIZE
+        db = get_db()
+        with db.atomic():
+            checkpoint = self.get_checkpoint()
+            ids = [
+                x.id
+                for x in ItemModel.select(ItemModel.id)
+                .where(
+                    (ItemModel.lang == self.lang.value)
+                    & (ItemModel.id > checkpoint.last_item_id)
+                )
+                .order_by(ItemModel.id)
+                .limit(chunk_size)
+            ]
+            if not ids:
+                return 0
+            db.execute_sql(
+                f"INSERT INTO {self.shadow_table}(rowid, title, notes)"
+                f" SELECT id, title, notes FROM {ITEM_CONTENT_VIEW_NAME}"
+                " WHERE lang = ? AND id > ? AND id <= ?;",
+                (self.lang.value, checkpoint.last_item_id, ids[-1]),
+            )
+            checkpoint.last_item_id = ids[-1]
+            checkpoint.save()
+        return len(ids)
+
+    def swap(self) -> None:
+        """
+        Copy the last items (if any) and swap the shadow index in place of the live
+         one, atomically.
+        """
+        db = get_db()
+        # With the legacy behavior, ALTER TABLE RENAME does not check (and rewrite)
+        #  the triggers and views referencing the tables: the live triggers
+        #  reference the dropped live index, and they will reference the renamed
+        #  shadow index, which takes its name.
+        #  Docs: https://www.sqlite.org/pragma.html#pragma_legacy_alter_table
+        db.execute_sql("PRAGMA legacy_alter_table = ON;")
+        try:
+            with db.atomic():
+                while self.build_chunk():
+                    pass
+                self._drop_shadow_triggers()
+                db.execute_sql(f"DROP TABLE {self.index_table};")
+                db.execute_sql(
+                    f"ALTER TABLE {self.shadow_table} RENAME TO {self.index_table};"
+                )
+                self.get_checkpoint().delete_instance()
+                # Invalidate the search cache and the spelling vocabularies.
+                CounterModel.increment(ITEM_WRITES_COUNTER)
+        finally:
+            db.execute_sql("PRAGMA legacy_alter_table = OFF;")
+
+    def abort(self) -> None:
+        with get_db().atomic():
+            self._drop_shadow()
+            ReindexCheckpointModel.delete().where(
+                ReindexCheckpointModel.index_table == self.index_table
+            ).execute()
+
+    def reindex(
+        self,
+        tokenize: str | None = None,
+        chunk_size: int | None = None,
+        on_chunk_fn: Callable[[ReindexCheckpointModel], None] | None = None,
+    ) -> None:
+        """
+        Start (or resume) a reindex, build the shadow index chunk by chunk (calling
+         `on_chunk_fn` after each chunk) and swap it in place of the live one.
+        """
+        self.start(tokenize)
+        while self.build_chunk(chunk_size):
+            if on_chunk_fn:
+                on_chunk_fn(self.get_checkpoint())
+        self.swap()
+
+    def _make_shadow_class(self) -> Type[peewee_utils.BaseFtsModelModel]:
+        class Meta:
+            table_name = self.shadow_table
+
+        return type(
+            f"{self.index_class.__name__}Shadow",
+            (self.index_class,),
+            {"Meta": Meta, "__module__": __name__},
+        )
+
+    def _drop_shadow_triggers(self) -> None:
+        for name in get_index_triggers_names(self.shadow_table):
+            get_db().execute_sql(f"DROP TRIGGER IF EXISTS {name};")
+
+    def _drop_shadow(self) -> None:
+        self._drop_shadow_triggers()
+        get_db().execute_sql(f"DROP TABLE IF EXISTS {self.shadow_table};")
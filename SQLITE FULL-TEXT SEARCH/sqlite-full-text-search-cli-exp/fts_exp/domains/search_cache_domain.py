@@ -0,0 +1,143 @@
+import hashlib
+import json
+from datetime import datetime, timedelta
+
+import datetime_utils
+
+from ..conf import settings
+from ..data_models.db_models import (
+    ITEM_WRITES_COUNTER,
+    CounterModel,
+    LangEnum,
+    SearchCacheEntryModel,
+)
+from ..data_models.db_utils import get_db
+
+SEARCH_CACHE_HITS_COUNTER = "search_cache_hits"
+SEARCH_CACHE_MISSES_COUNTER = "search_cache_misses"
+
+# The hits and misses counted and not yet written, in this process.
+_counts: dict[str, int] = {}
+
+
+class SearchCacheDomain:
+    """
+    Persistent cache of search results, stored in the SQLite table
+     SearchCacheEntryModel.
+
+    An entry is valid only as long as ITEM_WRITES_COUNTER (bumped by triggers on
+     every write on item) is unchanged. Note that `PRAGMA data_version` is not an
+     option here as it is per-connection and every CLI command opens a new one.
+    The eviction is LRU, capped at settings.SEARCH_CACHE_MAX_ENTRIES.
+
+    So that a hit is a read only: the hits and misses are counted in memory and
+     written in batches of settings.SEARCH_CACHE_COUNTERS_BATCH_SIZE (mind to
+     `flush()` them before the DB is closed), and the last use of an entry is
+     written only when older than settings.SEARCH_CACHE_LAST_USED_AT_RESOLUTION_S
+     (so the LRU is approximate, within that resolution).
+    """
+
+    def make_key(
+        self,
+        fts_query: str,
+        lang: LangEnum,
+        page: int,
+        mode: str,
+        created_after: datetime | None = None,
+        created_before: datetime | None = None,
+    ) -> str:
+        key = [
+            fts_query,
+            LangEnum(lang).value,
+            page,
+            str(mode),
+            created_after.isoformat() if created_after else None,
+            created_before.isoformat() if created_before else None,
+            # Ranking and snippet config.
+            settings.SQLITE_SEARCH_PAGE_SIZE,
+            settings.SQLITE_SEARCH_SNIPPET_SIZE,
+            settings.SQLITE_SEARCH_HIGHLIGHT_SEPARATOR_START,
+            settings.SQLITE_SEARCH_HIGHLIGHT_SEPARATOR_END,
+        ]
+        return hashlib.sha256(json.dumps(key).encode()).hexdigest()
+
+    def get(self, key: str) -> list[dict] | None:
+        entry = SearchCacheEntryModel.get_or_none(SearchCacheEntryModel.key == key)
+        if entry is not None and entry.item_writes != CounterModel.get_value(
+            ITEM_WRITES_COUNTER
+        ):
+            entry.delete_instance()
+            entry = None
+
+        if entry is None:
+            self._count(SEARCH_CACHE_MISSES_COUNTER)
+            return None
+
+        self._count(SEARCH_CACHE_HITS_COUNTER)
+        now = datetime_utils.now_utc()
+        if entry.last_used_at < now - timedelta(
+            seconds=settings.SEARCH_CACHE_LAST_USED_AT_RESOLUTION_S
+        ):
+            SearchCacheEntryModel.update(last_used_at=now).where(
+                SearchCacheEntryModel.key == key
+            ).execute()
+        return json.loads(entry.results)
+
+    def _count(self, name: str) -> None:
+        _counts[name] = _counts.get(name, 0) + 1
+        if sum(_counts.values()) >= settings.SEARCH_CACHE_COUNTERS_BATCH_SIZE:
+            self.flush()
+
+    def flush(self) -> int:
+        """
+        Write the hits and misses counted in this process. Return their n.
+        """
+        if not _counts:
+            return 0
+        with get_db().atomic():
+            for name, n in _counts.items():
+                CounterModel.increment(name, by=n)
+        n_written = sum(_counts.values())
+        _counts.clear()
+        return n_written
+
+    def set(self, key: str, results: list[dict]) -> None:
+        SearchCacheEntryModel.replace(
+            key=key,
+            item_writes=CounterModel.get_value(ITEM_WRITES_COUNTER),
+            results=json.dumps(results),
+            last_used_at=datetime_utils.now_utc(),
+        ).execute()
+
+        n_extra = (
+            SearchCacheEntryModel.select().count() - settings.SEARCH_CACHE_MAX_ENTRIES
+        )
+        if n_extra > 0:
+            lru_keys = (
+                SearchCacheEntryModel.select(SearchCacheEntryModel.key)
+                .order_by(SearchCacheEntryModel.last_used_at)
+                .limit(n_extra)
+            )
+            SearchCacheEntryModel.delete().where(
+                SearchCacheEntryModel.key.in_(lru_keys)
+            ).execute()
+
+    def get_stats(self) -> dict:
+        return dict(
+            entries=SearchCacheEntryModel.select().count(),
+            max_entries=settings.SEARCH_CACHE_MAX_ENTRIES,
+            # Including the ones not yet written.
+            hits=CounterModel.get_value(SEARCH_CACHE_HITS_COUNTER)
+            + _counts.get(SEARCH_CACHE_HITS_COUNTER, 0),
+            misses=CounterModel.get_value(SEARCH_CACHE_MISSES_COUNTER)
+            + _counts.get(SEARCH_CACHE_MISSES_COUNTER, 0),
+        )
+
+    def clear(self) -> None:
+        _counts.clear()
+        SearchCacheEntryModel.delete().execute()
+        CounterModel.delete().where(
+            CounterModel.name.in_(
+                (SEARCH_CACHE_HITS_COUNTER, SEARCH_CACHE_MISSES_COUNTER)
+            )
+        ).execute()
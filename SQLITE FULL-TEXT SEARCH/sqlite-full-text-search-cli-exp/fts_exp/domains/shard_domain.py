@@ -0,0 +1,294 @@
+"""
+Sharded layout: the items are spread over N shard DB files, each one with its own
+ item table and FTS indexes (cloned from the main DB), to scale writes and
+ searches beyond a single file.
+
+ - An item is owned by the shard `id % N` (ids are sequential, so they are spread
+    evenly) and it is written only there. Ids are global: they are allocated in the
+    main DB (ITEM_IDS_COUNTER).
+ - Searches fan out to all the shards in a pool of threads, each one with its own
+    connection (sqlite3 releases the GIL while SQLite works, so they run in
+    parallel), and the top rows of each shard are merged by score.
+    As the routing spreads the items evenly and randomly wrt their text, the shards
+    are similar samples of the corpus: so their bm25 scores (which depend on the
+    stats of each index) are comparable.
+
+The layout is made (or changed) by `reshard()`, offline: the main DB keeps the
+ other tables (counters, caches, ...) and the list of shards (ShardModel).
+Mind that the passages (see PassageModel) and the archives (see ArchiveDomain) are
+ not supported in the sharded layout.
+
+Usage:
+    ShardDomain().reshard(n_shards=4)
+    item = ShardDomain().create_item(dict(title="Gatta", notes="", lang=LangEnum.ITA))
+"""
+
+import functools
+import os
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Type, TypeVar
+
+import peewee
+
+from ..conf import settings
+from ..data_models.db_models import (
+    ITEM_IDS_COUNTER,
+    ITEM_WRITES_COUNTER,
+    CounterModel,
+    ItemModel,
+    ShardModel,
+)
+from ..data_models.db_utils import (
+    attach,
+    clone_item_schema,
+    connect,
+    detach,
+    get_db,
+    get_model_for_schema,
+    query_budget,
+)
+
+ModelT = TypeVar("ModelT", bound=peewee.Model)
+
+# Schemas used to ATTACH the shards while resharding.
+SOURCE_SHARD_SCHEMA = "shard_source"
+TARGET_SHARD_SCHEMA = "shard_target"
+
+# Connections to the shards, by path, for each thread.
+_local = threading.local()
+
+
+class BaseShardDomainException(Exception):
+    pass
+
+
+class InvalidShardsNumber(BaseShardDomainException):
+    pass
+
+
+def get_shard_number(item_id: int, n_shards: int) -> int:
+    return item_id % n_shards
+
+
+class ShardDomain:
+    def get_shards(self) -> list[ShardModel]:
+        return list(ShardModel.select().order_by(ShardModel.number))
+
+    def is_enabled(self) -> bool:
+        return ShardModel.select().exists()
+
+    def create_item(self, data: dict) -> ItemModel:
+        """
+        Allocate a global id and write the item to the shard owning it.
+        """
+        shards = self.get_shards()
+        with get_db().atomic():
+            CounterModel.increment(ITEM_IDS_COUNTER)
+            item_id = CounterModel.get_value(ITEM_IDS_COUNTER)
+
+        item = ItemModel(id=item_id, **data)
+        sql, params = ItemModel.insert(item.__data__).sql()
+        shard = shards[get_shard_number(item_id, len(shards))]
+        connection = _get_connection(shard.path)
+        with connection:  # Transaction.
+            connection.execute(sql, params)
+        # The shards have no counter table: invalidate the search cache and the
+        #  spelling vocabularies here, once the item is committed (else a search in
+        #  between would cache the results without it as valid).
+        CounterModel.increment(ITEM_WRITES_COUNTER)
+        return item
+
+    def create_items(self, rows: list[tuple], fields: list[peewee.Field]) -> range:
+        """
+        Allocate a block of global ids and write the items (tuples with the DB
+         values of `fields`) to the shards owning them, in a transaction per shard.
+        Return the range of the ids.
+        """
+        shards = self.get_shards()
+        with get_db().atomic():
+            CounterModel.increment(ITEM_IDS_COUNTER, by=len(rows))
+            last_id = CounterModel.get_value(ITEM_IDS_COUNTER)
+
+        item_ids = range(last_id - len(rows) + 1, last_id + 1)
+        rows_by_shard: dict[int, list[tuple]] = {}
+        for item_id, row in zip(item_ids, rows):
+            number = get_shard_number(item_id, len(shards))
+            rows_by_shard.setdefault(number, []).append((item_id, *row))
+        sql, _ = ItemModel.insert({x: None for x in [ItemModel.id, *fields]}).sql()
+        try:
+            for number, shard_rows in rows_by_shard.items():
+                connection = _get_connection(shards[number].path)
+                with connection:  # Transaction.
+                    connection.executemany(sql, shard_rows)
+        finally:
+            # After the shard transactions, like in `create_item()`: even when one
+            #  fails, as the previous ones are committed.
+            CounterModel.increment(ITEM_WRITES_COUNTER)
+        return item_ids
+
+    def read_items(self, query: peewee.ModelSelect, item_id: int | None = None) -> list:
+        """
+        Run the query (on ItemModel) on the shard owning the given item id, or on
+         all the shards. Return the items sorted by id.
+        """
+        shards = self.get_shards()
+        if item_id is not None:
+            shards = [shards[get_shard_number(item_id, len(shards))]]
+        items = [x for rows in self._map(query, shards) for x in rows]
+        return sorted(items, key=lambda x: x.id)
+
+    def search(
+        self,
+        query: peewee.ModelSelect,
+        limit: int,
+        time_budget_ms: int | None = None,
+        vm_steps_budget: int | None = None,
+    ) -> list:
+        """
+        Run the search query (on an FTS index, selecting `score`) on all the shards
+         in parallel, each one within the given budget. Return the top `limit` rows
+         merged by score.
+        """
+        rows_by_shard = self._map(
+            query.limit(limit), self.get_shards(), time_budget_ms, vm_steps_budget
+        )
+        # Merge by score, in the same order as the query.
+        results = [x for rows in rows_by_shard for x in rows]
+        results.sort(key=lambda x: x.score, reverse=True)
+        return results[:limit]
+
+    def reshard(self, n_shards: int) -> dict[int, int]:
+        """
+        Move all the items, from the main DB or from the current shards, to a new
+         layout of `n_shards` shard DB files. Return the n. of items by shard.
+        Mind that writers must be stopped while resharding.
+        """
+        old_shards = self.get_shards()
+        if n_shards < 1:
+            raise InvalidShardsNumber(f"The n. of shards must be >= 1: {n_shards}")
+        if len(old_shards) == n_shards:
+            raise InvalidShardsNumber(f"The DB has already {n_shards} shards")
+
+        db = get_db()
+        max_id = 0
+        n_items_by_shard = {}
+        for number in range(n_shards):
+            path = self._get_path(number, n_shards)
+            # Leftovers of an interrupted reshard.
+            path.unlink(missing_ok=True)
+            attach(path, TARGET_SHARD_SCHEMA)
+            clone_item_schema(TARGET_SHARD_SCHEMA)
+            _TargetItemModel = get_model_for_schema(ItemModel, TARGET_SHARD_SCHEMA)
+            n_items_by_shard[number] = 0
+            for old_shard in old_shards or [None]:
+                schema = "main"
+                if old_shard is not None:
+                    schema = SOURCE_SHARD_SCHEMA
+                    attach(old_shard.path, schema)
+                _SourceItemModel = get_model_for_schema(ItemModel, schema)
+                with db.atomic():
+                    n_items_by_shard[number] += (
+                        _TargetItemModel.insert_from(
+                            _SourceItemModel.select().where(
+                                # Mind that `%` on a Peewee field is GLOB.
+                                peewee.Expression(
+                                    _SourceItemModel.id, peewee.OP.MOD, n_shards
+                                )
+                                == number
+                            ),
+                            ItemModel._meta.sorted_fields,
+                        )
+                        .as_rowcount()
+                        .execute()
+                    )
+                max_id = max(
+                    max_id,
+                    _SourceItemModel.select(peewee.fn.MAX(_SourceItemModel.id)).scalar()
+                    or 0,
+                )
+                if old_shard is not None:
+                    detach(schema)
+            detach(TARGET_SHARD_SCHEMA)
+
+        with db.atomic():
+            if not old_shards:
+                ItemModel.delete().execute()
+            max_id = max(max_id, CounterModel.get_value(ITEM_IDS_COUNTER))
+            CounterModel.replace(name=ITEM_IDS_COUNTER, value=max_id).execute()
+            CounterModel.increment(ITEM_WRITES_COUNTER)
+            ShardModel.delete().execute()
+            ShardModel.insert_many(
+                [
+                    dict(number=x, path=str(self._get_path(x, n_shards)))
+                    for x in range(n_shards)
+                ]
+            ).execute()
+        for old_shard in old_shards:
+            Path(old_shard.path).unlink(missing_ok=True)
+        return n_items_by_shard
+
+    def _get_path(self, number: int, n_shards: int) -> Path:
+        return (
+            Path(settings.SHARDS_DIR)
+            / f"{Path(settings.DB_PATH).stem}-shard-{number}-of-{n_shards}.sqlite3"
+        )
+
+    def _map(
+        self,
+        query: peewee.ModelSelect,
+        shards: list[ShardModel],
+        time_budget_ms: int | None = None,
+        vm_steps_budget: int | None = None,
+    ) -> list[list]:
+        # The SQL is rendered here, by Peewee, and then run on the raw connections.
+        sql, params = query.sql()
+
+        def _execute(shard: ShardModel) -> list:
+            connection = _get_connection(shard.path)
+            with query_budget(time_budget_ms, vm_steps_budget, connection):
+                cursor = connection.execute(sql, params)
+                return _make_instances(query.model, cursor)
+
+        return list(_get_pool().map(_execute, shards))
+
+
+@functools.cache
+def _get_pool() -> ThreadPoolExecutor:
+    return ThreadPoolExecutor(
+        max_workers=settings.SHARDS_SEARCH_MAX_WORKERS,
+        thread_name_prefix="shard",
+    )
+
+
+def _get_connection(path: str) -> sqlite3.Connection:
+    # Mind that a sqlite3 connection can only be used by the thread that opened it.
+    connections = _local.__dict__.setdefault("connections", {})
+    # A reshard can replace a file with a new one with the same path. And stat()
+    #  fails for a missing file, which SQLite would silently create.
+    inode = os.stat(path).st_ino
+    if path in connections and connections[path][1] != inode:
+        connections.pop(path)[0].close()
+    if path not in connections:
+        connections[path] = (connect(path), inode)
+    return connections[path][0]
+
+
+def _make_instances(model_class: Type[ModelT], cursor: sqlite3.Cursor) -> list[ModelT]:
+    """
+    Make model instances out of the rows of a raw cursor, converting the values of
+     the model's columns like Peewee does.
+    """
+    columns = [x[0] for x in cursor.description]
+    fields = [model_class._meta.columns.get(x) for x in columns]
+    return [
+        model_class(
+            **{
+                column: field.python_value(value) if field else value
+                for column, field, value in zip(columns, fields, row)
+            }
+        )
+        for row in cursor.fetchall()
+    ]
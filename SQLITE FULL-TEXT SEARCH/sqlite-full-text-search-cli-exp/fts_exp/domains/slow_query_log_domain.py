@@ -0,0 +1,160 @@
+"""
+Slow query log: the searches slower than settings.SLOW_QUERY_LOG_THRESHOLD_MS, plus
+ a random sample of all the searches (settings.SLOW_QUERY_LOG_SAMPLE_RATE), with
+ their latency breakdown, logged to SlowQueryModel. And the digest of the log: the
+ top queries by total time, p95 or frequency, estimated from the sample (so the
+ slow searches do not skew them), and the counts of the slow searches.
+
+The searches are buffered in memory and written in batches of
+ settings.SLOW_QUERY_LOG_BATCH_SIZE, so that a long-lived process does not write
+ on every search. Mind to `flush()` the buffer before the DB is closed.
+
+Usage:
+    SlowQueryLogDomain().log(fts_query, LangEnum.ITA, "word", results.stats)
+    SlowQueryLogDomain().flush()
+    digest = SlowQueryLogDomain().get_digest(DigestOrderEnum.P95)
+"""
+
+import itertools
+import json
+import math
+import random
+from enum import StrEnum
+
+from ..conf import settings
+from ..data_models.db_models import LangEnum, SlowQueryModel
+from ..data_models.db_utils import get_db
+
+# The searches logged and not yet written, in this process.
+_buffer: list[dict] = []
+
+
+class DigestOrderEnum(StrEnum):
+    TOTAL = "total"
+    P95 = "p95"
+    COUNT = "count"
+
+
+class SlowQueryLogDomain:
+    def is_enabled(self) -> bool:
+        # A snapshot DB is read-only.
+        return settings.IS_SLOW_QUERY_LOG_ENABLED and not settings.IS_DB_SNAPSHOT_MODE
+
+    def log(self, fts_query: str, lang: LangEnum, mode: str, stats: dict) -> bool:
+        """
+        Log the search if it is slow, or if it is picked by sampling. Return True
+         if logged.
+        """
+        is_slow = stats["duration_ms"] >= settings.SLOW_QUERY_LOG_THRESHOLD_MS
+        # Slow or not, so that the sample is representative of all the searches.
+        is_sampled = random.random() < settings.SLOW_QUERY_LOG_SAMPLE_RATE
+        if not is_slow and not is_sampled:
+            return False
+
+        _buffer.append(
+            dict(
+                query=fts_query,
+                lang=LangEnum(lang).value,
+                mode=str(mode),
+                duration_ms=stats["duration_ms"],
+                n_results=stats["n_returned"],
+                phases=json.dumps(
+                    {name: x["duration_ms"] for name, x in stats["phases"].items()}
+                ),
+                is_sampled=is_sampled,
+            )
+        )
+        if len(_buffer) >= settings.SLOW_QUERY_LOG_BATCH_SIZE:
+            self.flush()
+        return True
+
+    def flush(self) -> int:
+        """
+        Write the buffered searches. Return their n.
+        """
+        if not _buffer:
+            return 0
+        with get_db().atomic():
+            SlowQueryModel.insert_many(_buffer).execute()
+        n_written = len(_buffer)
+        _buffer.clear()
+        return n_written
+
+    def get_digest(
+        self, order_by: DigestOrderEnum = DigestOrderEnum.TOTAL, limit: int = 10
+    ) -> list[dict]:
+        """
+        Aggregate the log by query, lang and mode. Return the top `limit` queries,
+         with their n. of runs, total, average and p95 time, estimated from the
+         sampled runs only, weighted by 1 / settings.SLOW_QUERY_LOG_SAMPLE_RATE (mind
+         that it is the current rate), and separately the n., total and max time of
+         the slow runs. Plus the average n. of results and the average time of each
+         phase, of all the logged runs.
+        The queries with no sampled runs (eg. when the sampling is disabled) are
+         ordered by their slow runs.
+        """
+        fields = (SlowQueryModel.query, SlowQueryModel.lang, SlowQueryModel.mode)
+        rows = (
+            SlowQueryModel.select(
+                *fields,
+                SlowQueryModel.duration_ms,
+                SlowQueryModel.n_results,
+                SlowQueryModel.phases,
+                SlowQueryModel.is_sampled,
+            )
+            .order_by(*fields)
+            .tuples()
+            .iterator()
+        )
+        rate = settings.SLOW_QUERY_LOG_SAMPLE_RATE
+        weight = 1 / rate if rate else 1
+        digest = []
+        for (query, lang, mode), group in itertools.groupby(rows, key=lambda x: x[:3]):
+            group = list(group)
+            sampled = sorted(x[3] for x in group if x[6])
+            # A sampled run can be slow too.
+            slow = [
+                x[3]
+                for x in group
+                if not x[6] or x[3] >= settings.SLOW_QUERY_LOG_THRESHOLD_MS
+            ]
+            phases: dict[str, list[float]] = {}
+            for x in group:
+                for name, duration_ms in json.loads(x[5]).items():
+                    phases.setdefault(name, []).append(duration_ms)
+            digest.append(
+                dict(
+                    query=query,
+                    lang=LangEnum(lang).name,
+                    mode=mode,
+                    n_runs=round(len(sampled) * weight),
+                    n_sampled=len(sampled),
+                    total_ms=sum(sampled) * weight,
+                    avg_ms=sum(sampled) / len(sampled) if sampled else None,
+                    # Nearest-rank percentile: the weights are all the same.
+                    p95_ms=(
+                        sampled[math.ceil(0.95 * len(sampled)) - 1] if sampled else None
+                    ),
+                    n_slow=len(slow),
+                    slow_total_ms=sum(slow),
+                    slow_max_ms=max(slow, default=None),
+                    avg_n_results=sum(x[4] for x in group) / len(group),
+                    # Over the runs that have the phase (eg. the suggestions are not
+                    #  in every run).
+                    phases={name: sum(x) / len(x) for name, x in phases.items()},
+                )
+            )
+        key = {
+            DigestOrderEnum.TOTAL: lambda x: (x["total_ms"], x["slow_total_ms"]),
+            DigestOrderEnum.P95: lambda x: (
+                x["p95_ms"] or 0,
+                x["slow_max_ms"] or 0,
+            ),
+            DigestOrderEnum.COUNT: lambda x: (x["n_runs"], x["n_slow"]),
+        }[DigestOrderEnum(order_by)]
+        digest.sort(key=key, reverse=True)
+        return digest[:limit]
+
+    def clear(self) -> int:
+        _buffer.clear()
+        return SlowQueryModel.delete().execute()
@@ -0,0 +1,146 @@
+"""
+Snapshot mode, for search-only deployments (eg. a Lambda) on a published copy of
+ the DB, when settings.IS_DB_SNAPSHOT_MODE: DB_PATH is opened read-only and
+ immutable (see db_models.get_db_path()), so SQLite takes no locks and does not
+ check the file for changes made by other connections.
+Docs: https://sqlite.org/uri.html#uriimmutable
+
+And the prewarm of the pages of the word indexes, so that the first searches of a
+ process do not pay for reading them from the disk. Useful in any mode, but mostly
+ on a long-lived process (or a Lambda), to be called at its startup:
+ - "read": read the shadow tables of the word indexes into SQLite's page cache,
+    which is grown to hold them (up to settings.DB_PREWARM_MAX_CACHE_MB). The cache
+    is per connection, so this is lost when the connection is closed.
+ - "mmap": make SQLite read the DB file with mmap (up to settings.SQLITE_MMAP_SIZE)
+    and fault all its pages into the OS cache, which is shared by the processes.
+
+Usage:
+    SnapshotDomain().check()
+    stats = SnapshotDomain().prewarm(PrewarmModeEnum.MMAP)
+"""
+
+import mmap
+import time
+from enum import StrEnum
+from pathlib import Path
+
+from ..conf import settings
+from ..data_models.db_models import ItemFTSIndexEng, ItemFTSIndexIta
+from ..data_models.db_utils import get_connection, get_db, is_read_only
+from ..data_models.sqlite_capi import get_cache_counters
+
+# The shadow tables of the word indexes read by the searches: the segments, their
+#  index and the sizes of the docs (for bm25).
+PREWARM_SHADOW_TABLE_SUFFIXES = ("_data", "_idx", "_docsize")
+
+
+class PrewarmModeEnum(StrEnum):
+    READ = "read"
+    MMAP = "mmap"
+
+
+class BaseSnapshotDomainException(Exception):
+    pass
+
+
+class SnapshotNotReadOnly(BaseSnapshotDomainException):
+    pass
+
+
+class SnapshotDomain:
+    def is_enabled(self) -> bool:
+        return settings.IS_DB_SNAPSHOT_MODE
+
+    def check(self) -> None:
+        """
+        Check that the DB was actually opened read-only: it is not if its URI
+         filename was not honored when opening the connection.
+        """
+        if not is_read_only():
+            raise SnapshotNotReadOnly(
+                "The DB was not opened read-only: DB_PATH must be opened as a URI"
+            )
+
+    def prewarm(self, mode: PrewarmModeEnum | str | None = None) -> dict:
+        """
+        Prewarm the pages of the word indexes with the given mode (defaults to
+         settings.DB_PREWARM). Return the n. of pages prewarmed and, like
+         SearchStatsRecorder, the duration and the pages read from the page cache
+         (hits) and from the DB file (misses), counted as 0 when the SQLite C API
+         is not available.
+        """
+        mode = PrewarmModeEnum(mode or settings.DB_PREWARM)
+        connection = get_connection()
+        n_hits, n_misses = get_cache_counters(connection)
+        start = time.perf_counter()
+        if mode == PrewarmModeEnum.READ:
+            n_pages = self._read_index_pages()
+        else:
+            n_pages = self._mmap_db_file()
+        duration_ms = (time.perf_counter() - start) * 1000
+        n_hits_end, n_misses_end = get_cache_counters(connection)
+        return dict(
+            mode=mode.value,
+            n_pages=n_pages,
+            duration_ms=duration_ms,
+            n_cache_hits=n_hits_end - n_hits,
+            n_cache_misses=n_misses_end - n_misses,
+        )
+
+    def _read_index_pages(self) -> int:
+        """
+        Read the b-tree pages of the shadow tables of the word indexes, and return
+         their n. (from `dbstat`, so without the C API too).
+        Docs: https://sqlite.org/dbstat.html
+        """
+        db = get_db()
+        page_size = db.execute_sql("PRAGMA page_size;").fetchone()[0]
+        page_count = db.execute_sql("PRAGMA page_count;").fetchone()[0]
+        # Grow the page cache (never shrink it), or the pages read would evict each
+        #  other. A negative size is in KiB.
+        cache_size = db.execute_sql("PRAGMA cache_size;").fetchone()[0]
+        if cache_size < 0:
+            cache_size = -cache_size * 1024 // page_size
+        max_cache_size = settings.DB_PREWARM_MAX_CACHE_MB * 1024 * 1024 // page_size
+        if cache_size < min(page_count, max_cache_size):
+            db.execute_sql(f"PRAGMA cache_size = {min(page_count, max_cache_size)};")
+
+        tables = [
+            f"{index_class._meta.table_name}{suffix}"
+            for index_class in (ItemFTSIndexIta, ItemFTSIndexEng)
+            for suffix in PREWARM_SHADOW_TABLE_SUFFIXES
+        ]
+        for table in tables:
+            # A full scan of the b-tree: all its pages are read (not the overflow
+            #  ones, which hold the parts of the cells that do not fit in a page).
+            db.execute_sql(f"SELECT count(*) FROM {table};")
+        return db.execute_sql(
+            "SELECT count(*) FROM dbstat('main')"
+            f" WHERE pagetype != 'overflow' AND name IN ({', '.join('?' * len(tables))});",
+            tables,
+        ).fetchone()[0]
+
+    def _mmap_db_file(self) -> int:
+        db = get_db()
+        path = db.execute_sql("PRAGMA database_list;").fetchone()[2]
+        if not path:  # In-memory DB.
+            return 0
+        # It returns the actual size, capped by SQLite's SQLITE_MAX_MMAP_SIZE.
+        mmap_size = db.execute_sql(
+            f"PRAGMA mmap_size = {settings.SQLITE_MMAP_SIZE};"
+        ).fetchone()[0]
+        size = min(Path(path).stat().st_size, mmap_size)
+        if not size:
+            return 0
+        # SQLite maps the file itself: here it is mapped only to fault its pages
+        #  into the OS cache, where SQLite's map reads them.
+        with (
+            open(path, "rb") as f,
+            mmap.mmap(f.fileno(), size, access=mmap.ACCESS_READ) as mapped,
+        ):
+            if hasattr(mapped, "madvise"):
+                mapped.madvise(mmap.MADV_WILLNEED)
+            for offset in range(0, size, mmap.PAGESIZE):
+                mapped[offset]
+        page_size = db.execute_sql("PRAGMA page_size;").fetchone()[0]
+        return size // page_size
@@ -0,0 +1,305 @@
+"""
+"Did you mean" spelling suggestions.
+
+The suggestions are the terms of the FTS5 vocabulary of ItemFTSIndexIta/Eng
+ (read through an fts5vocab table) closest to the user's words by edit distance,
+ found with a BK-tree: https://en.wikipedia.org/wiki/BK-tree
+
+Mind that the vocabulary is made of stems (eg. "dentist" for "dentista"), so the
+ suggestions are stems too, which are valid search terms anyway.
+
+Loading a vocabulary means reading the whole fts5vocab table, a full scan of the
+ index, so it is never refreshed on the search path: the stale vocabulary is used
+ until it is refreshed, off the search path, with `refresh()` (sfts
+ admin-spelling-refresh), which saves it to the sidecar file too. The search path
+ only loads a vocabulary when there is none (in memory or in the sidecar file),
+ within what is left of the search budget.
+A long-lived process reloads the sidecar file when it changes.
+
+Usage:
+    SpellingDomain().suggest("frist", LangEnum.ENG)
+    SpellingDomain().refresh(LangEnum.ENG)
+"""
+
+import pickle
+import re
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from ..conf import settings
+from ..data_models.db_models import (
+    ITEM_WRITES_COUNTER,
+    CounterModel,
+    LangEnum,
+    get_index_class_for_lang,
+)
+from ..data_models.db_utils import QueryBudgetExceeded, get_db, query_budget
+from . import query_compiler
+
+# In-memory cache of the vocabularies, for long-lived processes.
+#  {(db path, index table name): _Vocabulary}
+_vocabularies: dict[tuple[str, str], "_Vocabulary"] = {}
+# Modification time of the sidecar file when it was last loaded or saved.
+_sidecar_mtime: float | None = None
+
+
+def levenshtein(a: str, b: str) -> int:
+    if len(a) < len(b):
+        a, b = b, a
+    previous_row = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current_row = [i]
+        for j, char_b in enumerate(b, 1):
+            current_row.append(
+                min(
+                    previous_row[j] + 1,  # Deletion.
+                    current_row[j - 1] + 1,  # Insertion.
+                    previous_row[j - 1] + (char_a != char_b),  # Substitution.
+                )
+            )
+        previous_row = current_row
+    return previous_row[-1]
+
+
+class BKTree:
+    """
+    BK-tree over the Levenshtein distance.
+    Nodes are lists: [term, {distance: child node}].
+    """
+
+    def __init__(self):
+        self.root: list | None = None
+        self.size = 0
+
+    def add(self, term: str) -> None:
+        if self.root is None:
+            self.root = [term, {}]
+            self.size += 1
+            return
+        node = self.root
+        while True:
+            distance = levenshtein(term, node[0])
+            if distance == 0:
+                return
+            child = node[1].get(distance)
+            if child is None:
+                node[1][distance] = [term, {}]
+                self.size += 1
+                return
+            node = child
+
+    def search(self, term: str, max_distance: int) -> list[tuple[int, str]]:
+        """
+        Return the (distance, term) pairs within max_distance from the given term.
+        """
+        results = []
+        nodes = [self.root] if self.root is not None else []
+        while nodes:
+            node = nodes.pop()
+            distance = levenshtein(term, node[0])
+            if distance <= max_distance:
+                results.append((distance, node[0]))
+            # Triangle inequality: only these children can be within max_distance.
+            for child_distance, child in node[1].items():
+                if distance - max_distance <= child_distance <= distance + max_distance:
+                    nodes.append(child)
+        return results
+
+    def __len__(self) -> int:
+        return self.size
+
+
+@dataclass
+class _Vocabulary:
+    tree: BKTree = field(default_factory=BKTree)
+    # {term: n. of docs}, for the terms currently in the index.
+    doc_counts: dict[str, int] = field(default_factory=dict)
+    # Value of ITEM_WRITES_COUNTER when the vocabulary was loaded.
+    item_writes: int = -1
+
+
+class SpellingDomain:
+    def suggest(
+        self,
+        text: str,
+        lang: LangEnum,
+        time_budget_ms: float | None = None,
+        vm_steps_budget: int | None = None,
+    ) -> list[str]:
+        """
+        Return up to settings.SPELLING_SUGGESTIONS_MAX alternative search texts,
+         where the unknown words are replaced by the closest terms in the index.
+        The budget (defaults to settings) is the one of loading the vocabulary,
+         when there is none: a negative time budget means that it is used up.
+        """
+        try:
+            words = _get_words(query_compiler.parse_query(text))
+        except query_compiler.InvalidSearchQuery:
+            return []
+
+        vocabulary = self._get_vocabulary(lang, time_budget_ms, vm_steps_budget)
+        candidates_by_word = {}
+        for word in words:
+            if _is_known_word(word, vocabulary):
+                continue
+            max_distance = 1 if len(word) <= 4 else 2
+            candidates = [
+                (distance, -vocabulary.doc_counts[term], term)
+                for distance, term in vocabulary.tree.search(word, max_distance)
+                # Terms removed from the index are still in the tree.
+                if term in vocabulary.doc_counts
+            ]
+            if candidates:
+                candidates_by_word[word] = [x[2] for x in sorted(candidates)]
+        if not candidates_by_word:
+            return []
+
+        suggestions = []
+        for i in range(settings.SPELLING_SUGGESTIONS_MAX):
+            suggestion = text
+            for word, candidates in candidates_by_word.items():
+                replacement = candidates[min(i, len(candidates) - 1)]
+                suggestion = re.sub(
+                    rf"\b{re.escape(word)}\b",
+                    replacement,
+                    suggestion,
+                    flags=re.IGNORECASE,
+                )
+            if suggestion not in suggestions:
+                suggestions.append(suggestion)
+        return suggestions
+
+    def refresh(self, lang: LangEnum) -> int:
+        """
+        Refresh the vocabulary of the given lang, with no budget, and save all the
+         vocabularies to the sidecar file. Return the n. of terms.
+        """
+        vocabulary = self._get_cached_vocabulary(lang)
+        self._refresh_vocabulary(vocabulary, lang)
+        _save_sidecar()
+        return len(vocabulary.doc_counts)
+
+    def _get_vocabulary(
+        self,
+        lang: LangEnum,
+        time_budget_ms: float | None = None,
+        vm_steps_budget: int | None = None,
+    ) -> _Vocabulary:
+        """
+        Get the vocabulary from the in-memory cache or the sidecar file, even if
+         stale. Load it from the index only when there is none, within the budget:
+         when over budget, the empty vocabulary is returned.
+        """
+        vocabulary = self._get_cached_vocabulary(lang)
+        if vocabulary.item_writes != -1:
+            return vocabulary
+
+        if time_budget_ms is None:
+            time_budget_ms = settings.SQLITE_SEARCH_TIME_BUDGET_MS
+        if vm_steps_budget is None:
+            vm_steps_budget = settings.SQLITE_SEARCH_VM_STEPS_BUDGET
+        if time_budget_ms < 0:
+            return vocabulary
+        try:
+            with query_budget(time_budget_ms, vm_steps_budget):
+                self._refresh_vocabulary(vocabulary, lang)
+        except QueryBudgetExceeded:
+            pass
+        return vocabulary
+
+    def _get_cached_vocabulary(self, lang: LangEnum) -> _Vocabulary:
+        global _sidecar_mtime
+        cache_key = (settings.DB_PATH, get_index_class_for_lang(lang)._meta.table_name)
+        mtime = _get_sidecar_mtime()
+        if mtime is not None and mtime != _sidecar_mtime:
+            # The newer vocabularies, eg. refreshed by another process.
+            for key, value in _load_sidecar().items():
+                if key not in _vocabularies or (
+                    value.item_writes > _vocabularies[key].item_writes
+                ):
+                    _vocabularies[key] = value
+            _sidecar_mtime = mtime
+        return _vocabularies.setdefault(cache_key, _Vocabulary())
+
+    def _refresh_vocabulary(self, vocabulary: _Vocabulary, lang: LangEnum) -> None:
+        item_writes = CounterModel.get_value(ITEM_WRITES_COUNTER)
+        if vocabulary.item_writes == item_writes:
+            return
+
+        index_table = get_index_class_for_lang(lang)._meta.table_name
+        vocab_table = f"{index_table}_vocab"
+        db = get_db()
+        db.execute_sql(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS temp.{vocab_table}"
+            f" USING fts5vocab(main, {index_table}, 'row');"
+        )
+        doc_counts = dict(db.execute_sql(f"SELECT term, doc FROM temp.{vocab_table};"))
+        # Only new terms are added to the tree (a BK-tree has no delete).
+        for term in doc_counts.keys() - vocabulary.doc_counts.keys():
+            vocabulary.tree.add(term)
+        vocabulary.doc_counts = doc_counts
+        vocabulary.item_writes = item_writes
+
+    @staticmethod
+    def clear_cache() -> None:
+        global _sidecar_mtime
+        _vocabularies.clear()
+        _sidecar_mtime = None
+
+
+def _get_words(node: query_compiler.Node) -> list[str]:
+    match node:
+        case query_compiler.Term():
+            return [node.text]
+        case query_compiler.Phrase():
+            return list(node.terms)
+        case query_compiler.Near():
+            return [x for phrase in node.phrases for x in _get_words(phrase)]
+        case query_compiler.Column():
+            return _get_words(node.child)
+        case query_compiler.And() | query_compiler.Or():
+            return [x for child in node.children for x in _get_words(child)]
+        case query_compiler.Not():
+            return _get_words(node.left) + _get_words(node.right)
+
+
+def _is_known_word(word: str, vocabulary: _Vocabulary) -> bool:
+    # The vocabulary is made of stems: a word is known when the word itself or one
+    #  of its longest prefixes (a likely stem, as stemmers mostly strip suffixes) is
+    #  in the vocabulary.
+    for length in range(len(word), max(len(word) - 4, 2), -1):
+        if word[:length] in vocabulary.doc_counts:
+            return True
+    return False
+
+
+def _get_sidecar_mtime() -> float | None:
+    if not settings.SPELLING_SIDECAR_PATH:
+        return None
+    try:
+        return Path(settings.SPELLING_SIDECAR_PATH).stat().st_mtime
+    except OSError:
+        return None
+
+
+def _load_sidecar() -> dict:
+    if not settings.SPELLING_SIDECAR_PATH:
+        return {}
+    try:
+        with open(settings.SPELLING_SIDECAR_PATH, "rb") as fin:
+            return pickle.load(fin)
+    except (OSError, pickle.UnpicklingError, EOFError):
+        return {}
+
+
+def _save_sidecar() -> None:
+    global _sidecar_mtime
+    if not settings.SPELLING_SIDECAR_PATH:
+        return
+    try:
+        with open(Path(settings.SPELLING_SIDECAR_PATH), "wb") as fout:
+            pickle.dump(_vocabularies, fout)
+        _sidecar_mtime = _get_sidecar_mtime()
+    except OSError:
+        # Eg. a read-only deployment: the in-memory cache is enough.
+        pass
@@ -0,0 +1,81 @@
+import json
+from typing import IO, Iterator
+
+import click
+import peewee_utils
+
+from ...domains.change_journal_domain import (
+    BaseChangeJournalDomainException,
+    ChangeJournalDomain,
+    InvalidChange,
+)
+from ..base_cli_view import (
+    BaseClickCommand,
+    BaseCmdViewException,
+    ConsoleAdapter,
+    handle_common_exc,
+    require_writable_db,
+)
+
+console = ConsoleAdapter()
+
+
+class ApplyChangesFailed(BaseCmdViewException):
+    pass
+
+
+@click.command(
+    cls=BaseClickCommand,
+    name="admin-apply-changes",
+    help="""Apply to this DB, a replica, the changes (JSONL) streamed by
+    `sfts admin-changes` on the primary, from the file SOURCE or stdin.
+    The FTS indexes are updated by the triggers, and the cursor of the replica
+    is stored with each batch of changes.
+
+    \b
+    eg. sfts admin-apply-changes changes.jsonl
+    eg. sfts admin-apply-changes --show-cursor
+    """,
+)
+@click.argument("source", metavar="SOURCE", type=click.File("r"), default="-")
+@click.option(
+    "--show-cursor",
+    "do_show_cursor",
+    is_flag=True,
+    default=False,
+    help="Only print the cursor: the version of the last change applied",
+)
+def admin_apply_changes_cli_view(source: IO[str], do_show_cursor: bool = False):
+    admin_apply_changes_cmd_view(source, do_show_cursor)
+
+
+@require_writable_db()
+@handle_common_exc()
+@peewee_utils.use_db()
+def admin_apply_changes_cmd_view(source: IO[str], do_show_cursor: bool = False) -> int:
+    domain = ChangeJournalDomain()
+    if do_show_cursor:
+        cursor = domain.get_cursor()
+        click.echo(cursor)
+        return cursor
+
+    n_changes = 0
+
+    def read_changes() -> Iterator[dict]:
+        nonlocal n_changes
+        for i, line in enumerate(source, 1):
+            if not line.strip():
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError as exc:
+                raise InvalidChange(f"Invalid JSON at line {i}: {exc}") from exc
+            n_changes += 1
+
+    try:
+        cursor = domain.apply_changes(read_changes())
+    except BaseChangeJournalDomainException as exc:
+        console.error(f"Apply failed: {exc}")
+        raise ApplyChangesFailed(str(exc)) from exc
+    console.log(f"Applied {n_changes} changes, cursor: {cursor}")
+    return cursor
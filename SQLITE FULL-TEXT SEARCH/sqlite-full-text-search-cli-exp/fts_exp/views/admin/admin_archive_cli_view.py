@@ -0,0 +1,58 @@
+import click
+import peewee_utils
+
+from ...conf import settings
+from ...domains.archive_domain import ArchiveDomain, BaseArchiveDomainException
+from ..base_cli_view import (
+    BaseClickCommand,
+    BaseCmdViewException,
+    ConsoleAdapter,
+    handle_common_exc,
+    require_writable_db,
+)
+
+console = ConsoleAdapter()
+
+
+class ArchiveFailed(BaseCmdViewException):
+    pass
+
+
+@click.command(
+    cls=BaseClickCommand,
+    name="admin-archive",
+    help="""Move the old items to the archive DBs (a file per year).
+
+    \b
+    eg. sfts admin-archive
+    eg. sfts admin-archive --older-than-days 90
+    """,
+)
+@click.option(
+    "--older-than-days",
+    "older_than_days",
+    type=int,
+    default=settings.ARCHIVE_AGE_DAYS,
+    show_default=True,
+    help="Archive the items created before this n. of days ago",
+)
+def admin_archive_cli_view(older_than_days: int = settings.ARCHIVE_AGE_DAYS):
+    admin_archive_cmd_view(older_than_days)
+
+
+@require_writable_db()
+@handle_common_exc()
+@peewee_utils.use_db()
+def admin_archive_cmd_view(
+    older_than_days: int = settings.ARCHIVE_AGE_DAYS,
+) -> dict[int, int]:
+    try:
+        n_items_by_year = ArchiveDomain().archive(older_than_days)
+    except BaseArchiveDomainException as exc:
+        console.error(str(exc))
+        raise ArchiveFailed(str(exc)) from exc
+    for year, n_items in n_items_by_year.items():
+        console.log(f"#{n_items} items archived in: {year}")
+    if not n_items_by_year:
+        console.log("No items to archive")
+    return n_items_by_year
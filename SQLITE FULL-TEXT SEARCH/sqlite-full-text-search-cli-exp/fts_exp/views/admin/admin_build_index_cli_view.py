@@ -0,0 +1,64 @@
+import os
+import time
+
+import click
+import peewee_utils
+
+from ...data_models.db_models import LangEnum
+from ...domains.index_build_domain import IndexBuildDomain
+from ..base_cli_view import (
+    BaseClickCommand,
+    ConsoleAdapter,
+    handle_common_exc,
+    require_writable_db,
+)
+
+console = ConsoleAdapter()
+
+
+@click.command(
+    cls=BaseClickCommand,
+    name="admin-build-index",
+    help="""Build the word indexes from scratch, offline, with parallel workers.
+    Stop the writers first.
+
+    \b
+    eg. sfts admin-build-index --workers 8
+    eg. sfts admin-build-index --workers 8 --lang ita
+    """,
+)
+@click.option(
+    "--workers",
+    "n_workers",
+    type=click.IntRange(min=1),
+    default=os.cpu_count() or 1,
+    show_default=True,
+    help="N. of worker processes",
+)
+@click.option(
+    "--lang",
+    "lang",
+    type=click.Choice(LangEnum, case_sensitive=False),
+    required=False,
+    help="Language [default: all]",
+)
+def admin_build_index_cli_view(n_workers: int, lang: LangEnum | None = None):
+    admin_build_index_cmd_view(n_workers, lang)
+
+
+@require_writable_db()
+@handle_common_exc()
+@peewee_utils.use_db()
+def admin_build_index_cmd_view(
+    n_workers: int, lang: LangEnum | None = None
+) -> dict[LangEnum, int]:
+    n_items_by_lang = {}
+    for x in [lang] if lang else LangEnum:
+        domain = IndexBuildDomain(x)
+        start = time.perf_counter()
+        n_items_by_lang[x] = domain.build(n_workers)
+        console.log(
+            f"#{n_items_by_lang[x]} items indexed in {domain.index_table}"
+            f" by {n_workers} workers in {time.perf_counter() - start:.1f} secs"
+        )
+    return n_items_by_lang
@@ -0,0 +1,60 @@
+import json
+
+import click
+import peewee_utils
+from rich.console import Console
+
+from ...conf import settings
+from ...domains.change_journal_domain import ChangeJournalDomain
+from ..base_cli_view import BaseClickCommand, handle_common_exc
+
+# Mind that stdout is for the changes only.
+stderr_console = Console(stderr=True)
+
+
+@click.command(
+    cls=BaseClickCommand,
+    name="admin-changes",
+    help="""Stream, as JSONL to stdout, the items changed since the given cursor
+    (the version of the last change applied by a replica), from the change journal
+    (requires IS_CHANGE_JOURNAL_ENABLED). To be applied to a replica with
+    `sfts admin-apply-changes`.
+
+    \b
+    eg. sfts admin-changes --since 1200 > changes.jsonl
+    eg. sfts admin-changes --since "$(ssh replica sfts admin-apply-changes --show-cursor)" \\
+          | ssh replica sfts admin-apply-changes
+    """,
+)
+@click.option(
+    "--since",
+    "since",
+    type=click.IntRange(min=0),
+    default=0,
+    show_default=True,
+    help="The cursor: only the changes with a greater version",
+)
+def admin_changes_cli_view(since: int = 0):
+    admin_changes_cmd_view(since)
+
+
+@handle_common_exc()
+@peewee_utils.use_db()
+def admin_changes_cmd_view(since: int = 0) -> int:
+    domain = ChangeJournalDomain()
+    n_changes = 0
+    # Mind that the rich console would wrap the lines.
+    for change in domain.read_changes(since):
+        click.echo(json.dumps(change))
+        n_changes += 1
+
+    if settings.ARE_CONSOLE_LOGS_ENABLED:
+        if not domain.is_enabled():
+            stderr_console.print(
+                "[bold white on red]The change journal is disabled:"
+                " set IS_CHANGE_JOURNAL_ENABLED[/]"
+            )
+        stderr_console.print(
+            f"{n_changes} changes since {since}, version: {domain.get_version()}"
+        )
+    return n_changes
@@ -0,0 +1,117 @@
+from pathlib import Path
+
+import click
+import peewee_utils
+from rich.prompt import Confirm
+
+from ...conf import settings
+from ...domains.backup_domain import BackupDomain, BaseBackupDomainException
+from ..base_cli_view import (
+    BaseClickCommand,
+    BaseCmdViewException,
+    ConsoleAdapter,
+    handle_common_exc,
+)
+
+console = ConsoleAdapter()
+
+
+class BackupFailed(BaseCmdViewException):
+    pass
+
+
+@click.command(
+    cls=BaseClickCommand,
+    name="admin-db-backup",
+    help="""Backup the DB online, to the file DEST, with SQLite's backup API.
+    Writers are not stalled while the copy runs.
+
+    \b
+    eg. sfts admin-db-backup /backups/fts-exp-db.sqlite3
+    eg. sfts admin-db-backup /backups/fts-exp-db.sqlite3 --vacuum
+    """,
+)
+@click.argument("dest_path", metavar="DEST", type=click.Path(dir_okay=False))
+@click.option(
+    "--pages-per-step",
+    "pages_per_step",
+    type=click.IntRange(min=1),
+    default=settings.BACKUP_PAGES_PER_STEP,
+    show_default=True,
+    help="N. of pages copied per step",
+)
+@click.option(
+    "--sleep-ms",
+    "sleep_ms",
+    type=click.IntRange(min=0),
+    default=settings.BACKUP_SLEEP_MS,
+    show_default=True,
+    help="Pause between steps, in ms",
+)
+@click.option(
+    "--vacuum",
+    "do_vacuum",
+    is_flag=True,
+    default=False,
+    help="Make a compacted copy with VACUUM INTO, in a single step",
+)
+@click.option(
+    "--no-confirmation",
+    "-y",
+    "do_skip_confirmation",
+    is_flag=True,
+    default=False,
+    help="Skip all confirmation inputs",
+)
+def admin_db_backup_cli_view(
+    dest_path: str,
+    pages_per_step: int = settings.BACKUP_PAGES_PER_STEP,
+    sleep_ms: int = settings.BACKUP_SLEEP_MS,
+    do_vacuum: bool = False,
+    do_skip_confirmation: bool = False,
+):
+    admin_db_backup_cmd_view(
+        dest_path, pages_per_step, sleep_ms, do_vacuum, do_skip_confirmation
+    )
+
+
+@handle_common_exc()
+@peewee_utils.use_db()
+def admin_db_backup_cmd_view(
+    dest_path: str,
+    pages_per_step: int = settings.BACKUP_PAGES_PER_STEP,
+    sleep_ms: int = settings.BACKUP_SLEEP_MS,
+    do_vacuum: bool = False,
+    do_skip_confirmation: bool = False,
+) -> None:
+    do_overwrite = False
+    if Path(dest_path).exists():
+        if not do_skip_confirmation and not Confirm.ask(
+            f"Overwrite the existing file: [bold blue_violet on yellow2]{dest_path}[/]?"
+        ):
+            raise BackupFailed("Abort")
+        do_overwrite = True
+
+    # Log at every 10% of the pages copied.
+    last_decile = -1
+
+    def on_progress_fn(n_copied_pages: int, n_total_pages: int) -> None:
+        nonlocal last_decile
+        decile = n_copied_pages * 10 // max(n_total_pages, 1)
+        if decile > last_decile:
+            last_decile = decile
+            console.log(f"Copied {n_copied_pages}/{n_total_pages} pages")
+
+    try:
+        BackupDomain().backup(
+            dest_path,
+            pages_per_step,
+            sleep_ms,
+            do_vacuum,
+            do_overwrite,
+            on_progress_fn,
+        )
+    except BaseBackupDomainException as exc:
+        console.error(f"Backup failed: {exc!r}")
+        raise BackupFailed(repr(exc)) from exc
+    console.log(f"Backup done and verified: {dest_path}")
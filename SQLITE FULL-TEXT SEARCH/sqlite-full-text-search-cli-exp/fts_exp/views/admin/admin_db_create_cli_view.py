@@ -2,7 +2,7 @@ import click
 import peewee_utils
 
 from ...conf import settings
-from ..base_cli_view import BaseClickCommand, ConsoleAdapter
+from ..base_cli_view import BaseClickCommand, ConsoleAdapter, require_writable_db
 from .admin_db_load_fixtures_cli_view import (
     DropDbException,
     admin_db_load_fixtures_cmd_view,
@@ -32,6 +32,7 @@ def admin_db_create_cli_view(do_load_sample_fixtures: bool | None = None):
     admin_db_create_cmd_view(do_load_sample_fixtures)
 
 
+@require_writable_db()
 @peewee_utils.use_db()
 def admin_db_create_cmd_view(do_load_sample_fixtures: bool | None = None) -> None:
     peewee_utils.create_all_tables()
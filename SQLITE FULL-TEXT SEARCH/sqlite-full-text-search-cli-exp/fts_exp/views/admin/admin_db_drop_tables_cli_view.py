@@ -6,7 +6,12 @@ from rich.prompt import Confirm
 
 from ...conf import settings
 from ...conf.settings import ROOT_DIR
-from ..base_cli_view import BaseClickCommand, ConsoleAdapter, handle_common_exc
+from ..base_cli_view import (
+    BaseClickCommand,
+    ConsoleAdapter,
+    handle_common_exc,
+    require_writable_db,
+)
 
 console = ConsoleAdapter()
 
@@ -36,6 +41,7 @@ def admin_db_drop_tables_cli_view(do_skip_confirmation: bool = False):
     admin_db_drop_tables_cmd_view(do_skip_confirmation)
 
 
+@require_writable_db()
 @handle_common_exc()
 @peewee_utils.use_db()
 def admin_db_drop_tables_cmd_view(do_skip_confirmation: bool = False) -> None:
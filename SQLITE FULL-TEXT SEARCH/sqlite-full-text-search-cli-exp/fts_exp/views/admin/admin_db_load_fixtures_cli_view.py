@@ -1,3 +1,4 @@
+import time
 from pathlib import Path
 
 import click
@@ -6,9 +7,16 @@ from rich.prompt import Confirm
 
 from ...conf import settings
 from ...conf.settings import ROOT_DIR
+from ...data_models.db_fixtures.generated_data_db_fixture import generate_items
 from ...data_models.db_fixtures.sample_data_db_fixture import ITEM_MODEL_FIXTURES
 from ...data_models.db_models import ItemModel
-from ..base_cli_view import BaseClickCommand, ConsoleAdapter, handle_common_exc
+from ...domains.item_domain import ItemDomain
+from ..base_cli_view import (
+    BaseClickCommand,
+    ConsoleAdapter,
+    handle_common_exc,
+    require_writable_db,
+)
 
 console = ConsoleAdapter()
 
@@ -20,12 +28,31 @@ class DropDbException(Exception):
 @click.command(
     cls=BaseClickCommand,
     name="admin-db-load-fixtures",
-    help="""Load sample fixtures in the db.
+    help="""Load sample fixtures in the db. Or, with --count, N synthetic items
+    generated with the words of the sample fixtures (half Italian, half English),
+    for performance tests: they are loaded in a single transaction and indexed at
+    the end.
     
     \b
     eg. sfts admin-db-load-fixtures
+    eg. sfts admin-db-load-fixtures --count 1000000 --seed 7 -y
     """,
 )
+@click.option(
+    "--count",
+    "count",
+    type=click.IntRange(min=1),
+    required=False,
+    help="N. of synthetic items to generate and load",
+)
+@click.option(
+    "--seed",
+    "seed",
+    type=int,
+    default=42,
+    show_default=True,
+    help="Seed of the synthetic items: the same seed generates the same items",
+)
 @click.option(
     "--no-confirmation",
     "-y",
@@ -34,13 +61,18 @@ class DropDbException(Exception):
     default=False,
     help="Skip all confirmation inputs",
 )
-def admin_db_load_fixtures_cli_view(do_skip_confirmation: bool = False):
-    admin_db_load_fixtures_cmd_view(do_skip_confirmation)
+def admin_db_load_fixtures_cli_view(
+    count: int | None = None, seed: int = 42, do_skip_confirmation: bool = False
+):
+    admin_db_load_fixtures_cmd_view(count, seed, do_skip_confirmation)
 
 
+@require_writable_db()
 @handle_common_exc()
 @peewee_utils.use_db()
-def admin_db_load_fixtures_cmd_view(do_skip_confirmation: bool = False) -> None:
+def admin_db_load_fixtures_cmd_view(
+    count: int | None = None, seed: int = 42, do_skip_confirmation: bool = False
+) -> None:
     if not do_skip_confirmation:
         in_data = Confirm.ask(
             f"Load sample fixtures in the existing DB: [bold blue_violet on yellow2]{Path(settings.DB_PATH).relative_to(ROOT_DIR.parent)}[/]?"
@@ -48,6 +80,19 @@ def admin_db_load_fixtures_cmd_view(do_skip_confirmation: bool = False) -> None:
         if not in_data:
             raise DropDbException("Abort")
 
+    if count:
+        start = time.perf_counter()
+        item_ids = ItemDomain().create_items(
+            generate_items(count, seed), do_defer_indexing=True
+        )
+        secs = time.perf_counter() - start
+        console.log(
+            f"#{len(item_ids)} generated items (ids {item_ids.start}-{item_ids.stop - 1})"
+            f" loaded in {secs:.1f} secs ({len(item_ids) / secs:.0f} items/sec) in:"
+            f" {settings.DB_PATH}"
+        )
+        return
+
     count = 0
     for data in ITEM_MODEL_FIXTURES:
         ItemModel.create(**data)
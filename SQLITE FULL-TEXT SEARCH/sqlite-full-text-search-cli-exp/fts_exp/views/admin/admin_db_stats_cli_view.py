@@ -0,0 +1,101 @@
+import json
+
+import click
+import peewee_utils
+from rich.table import Table
+
+from ...domains.db_stats_domain import BaseDbStatsDomainException, DbStatsDomain
+from ..base_cli_view import (
+    BaseClickCommand,
+    BaseCmdViewException,
+    ConsoleAdapter,
+    handle_common_exc,
+)
+
+console = ConsoleAdapter()
+
+
+class DbStatsFailed(BaseCmdViewException):
+    pass
+
+
+@click.command(
+    cls=BaseClickCommand,
+    name="admin-db-stats",
+    help="""Show the storage stats of the DB: pages and bytes of each table and
+    index, the segments and levels of the FTS5 indexes, the freelist and the n. of
+    items by lang.
+
+    \b
+    eg. sfts admin-db-stats
+    eg. sfts admin-db-stats --format json
+    """,
+)
+@click.option(
+    "--format",
+    "output_format",
+    type=click.Choice(["table", "json"], case_sensitive=False),
+    default="table",
+    show_default=True,
+    help="Output format",
+)
+def admin_db_stats_cli_view(output_format: str = "table"):
+    admin_db_stats_cmd_view(output_format)
+
+
+@handle_common_exc()
+@peewee_utils.use_db()
+def admin_db_stats_cmd_view(output_format: str = "table") -> dict:
+    try:
+        stats = DbStatsDomain().get_stats()
+    except BaseDbStatsDomainException as exc:
+        console.error(f"DB stats failed: {exc!r}")
+        raise DbStatsFailed(repr(exc)) from exc
+
+    if output_format == "json":
+        console.print(json.dumps(stats, indent=2), markup=False, highlight=False)
+        return stats
+
+    db = stats["db"]
+    console.print(
+        f"Size: {db['bytes']} bytes ({db['page_count']} pages of {db['page_size']})\n"
+        f"Freelist: {db['freelist_bytes']} bytes ({db['freelist_count']} pages)\n"
+        "Items: " + ", ".join(f"{lang} {n}" for lang, n in stats["langs"].items())
+    )
+
+    table = Table(title="Tables and indexes")
+    table.add_column("Name", overflow="fold")
+    table.add_column("Table", overflow="fold")
+    for column in ("Pages", "Bytes", "Unused", "Rows", "Avg row"):
+        table.add_column(column, justify="right")
+    for x in stats["btrees"]:
+        table.add_row(
+            x["name"],
+            x["table"] if x["table"] != x["name"] else "",
+            *[
+                str(x[k])
+                for k in ("n_pages", "bytes", "unused_bytes", "n_rows", "avg_row_bytes")
+            ],
+        )
+    console.print(table)
+
+    table = Table(title="FTS5 indexes")
+    table.add_column("Name", overflow="fold")
+    for column in ("Rows", "Tokens", "Segments"):
+        table.add_column(column, justify="right")
+    table.add_column("Levels (segments/pages)")
+    for x in stats["fts5"]:
+        levels = "?"
+        if x["levels"] is not None:
+            levels = " ".join(
+                f"L{y['level']}:{y['n_segments']}/{y['n_pages']}" for y in x["levels"]
+            )
+        table.add_row(
+            x["name"],
+            str(x["n_rows"]),
+            str(sum(x["n_tokens"].values())),
+            "?" if x["n_segments"] is None else str(x["n_segments"]),
+            levels,
+        )
+    console.print(table)
+    return stats
@@ -0,0 +1,113 @@
+import json
+
+import click
+import peewee_utils
+from rich.table import Table
+
+from ...domains.slow_query_log_domain import DigestOrderEnum, SlowQueryLogDomain
+from ..base_cli_view import (
+    BaseClickCommand,
+    ConsoleAdapter,
+    handle_common_exc,
+    require_writable_db,
+)
+
+console = ConsoleAdapter()
+
+
+@click.command(
+    cls=BaseClickCommand,
+    name="admin-query-digest",
+    help="""Show the top queries of the slow query log (requires
+    IS_SLOW_QUERY_LOG_ENABLED), by total time, p95 or n. of runs, estimated from
+    the sampled runs (SLOW_QUERY_LOG_SAMPLE_RATE), and their slow runs.
+
+    \b
+    eg. sfts admin-query-digest
+    eg. sfts admin-query-digest --order-by p95 --limit 20
+    eg. sfts admin-query-digest --format json --clear
+    """,
+)
+@click.option(
+    "--order-by",
+    "order_by",
+    type=click.Choice(DigestOrderEnum, case_sensitive=False),
+    default=DigestOrderEnum.TOTAL,
+    show_default=True,
+    help="Order the queries by total time, p95 time or n. of runs",
+)
+@click.option(
+    "--limit",
+    "limit",
+    type=click.IntRange(min=1),
+    default=10,
+    show_default=True,
+    help="N. of queries",
+)
+@click.option(
+    "--format",
+    "output_format",
+    type=click.Choice(["table", "json"], case_sensitive=False),
+    default="table",
+    show_default=True,
+    help="Output format",
+)
+@click.option(
+    "--clear",
+    "do_clear",
+    is_flag=True,
+    default=False,
+    help="Empty the log, after showing the digest",
+)
+def admin_query_digest_cli_view(
+    order_by: DigestOrderEnum = DigestOrderEnum.TOTAL,
+    limit: int = 10,
+    output_format: str = "table",
+    do_clear: bool = False,
+):
+    admin_query_digest_cmd_view(order_by, limit, output_format, do_clear)
+
+
+@handle_common_exc()
+@peewee_utils.use_db()
+def admin_query_digest_cmd_view(
+    order_by: DigestOrderEnum = DigestOrderEnum.TOTAL,
+    limit: int = 10,
+    output_format: str = "table",
+    do_clear: bool = False,
+) -> list[dict]:
+    domain = SlowQueryLogDomain()
+    digest = domain.get_digest(order_by, limit)
+    if output_format == "json":
+        console.print(json.dumps(digest, indent=2), markup=False, highlight=False)
+    else:
+        table = Table(
+            title=f"Top queries by {DigestOrderEnum(order_by).value}",
+            caption="Runs, total and p95 are estimated from the sampled runs",
+        )
+        table.add_column("Query", overflow="fold")
+        table.add_column("Lang")
+        table.add_column("Mode")
+        for column in ("Runs", "Total ms", "p95 ms", "Slow runs", "Slow ms", "Results"):
+            table.add_column(column, justify="right")
+        table.add_column("Slowest phase")
+        for x in digest:
+            slowest_phase = max(x["phases"], key=x["phases"].get, default="")
+            table.add_row(
+                x["query"],
+                x["lang"],
+                x["mode"],
+                str(x["n_runs"]),
+                f"{x['total_ms']:.1f}",
+                f"{x['p95_ms']:.1f}" if x["p95_ms"] is not None else "-",
+                str(x["n_slow"]),
+                f"{x['slow_total_ms']:.1f}",
+                f"{x['avg_n_results']:.1f}",
+                slowest_phase,
+            )
+        console.print(table)
+    if do_clear:
+        with require_writable_db():
+            domain.clear()
+        console.log("Slow query log cleared")
+    return digest
@@ -0,0 +1,114 @@
+import click
+import peewee_utils
+
+from ...conf import settings
+from ...data_models.db_models import LangEnum, ReindexCheckpointModel
+from ...domains.reindex_domain import IndexKindEnum, ReindexDomain, ReindexInProgress
+from ..base_cli_view import (
+    BaseClickCommand,
+    BaseCmdViewException,
+    ConsoleAdapter,
+    handle_common_exc,
+    require_writable_db,
+)
+
+console = ConsoleAdapter()
+
+
+class ReindexFailed(BaseCmdViewException):
+    pass
+
+
+@click.command(
+    cls=BaseClickCommand,
+    name="admin-reindex",
+    help="""Rebuild an index online, eg. with a new tokenizer, and swap it in place
+    of the live one. Searches keep using the live index until the swap.
+    The reindex is resumable: if interrupted, run the same command again.
+
+    \b
+    eg. sfts admin-reindex --lang ita --tokenize "snowball italian unicode61 remove_diacritics 2"
+    eg. sfts admin-reindex --lang ita --index trigram
+    eg. sfts admin-reindex --lang ita --abort
+    """,
+)
+@click.option(
+    "--lang",
+    "lang",
+    type=click.Choice(LangEnum, case_sensitive=False),
+    required=True,
+    help="Language",
+)
+@click.option(
+    "--index",
+    "kind",
+    type=click.Choice(IndexKindEnum, case_sensitive=False),
+    default=IndexKindEnum.WORD,
+    show_default=True,
+    help="Index to rebuild",
+)
+@click.option(
+    "--tokenize",
+    "tokenize",
+    type=str,
+    required=False,
+    help="FTS5 tokenize option of the new index [default: the one in the model]",
+)
+@click.option(
+    "--chunk-size",
+    "chunk_size",
+    type=int,
+    default=settings.REINDEX_CHUNK_SIZE,
+    show_default=True,
+    help="N. of items copied per transaction",
+)
+@click.option(
+    "--abort",
+    "do_abort",
+    is_flag=True,
+    default=False,
+    help="Abort the reindex in progress and drop the new index",
+)
+def admin_reindex_cli_view(
+    lang: LangEnum,
+    kind: IndexKindEnum = IndexKindEnum.WORD,
+    tokenize: str | None = None,
+    chunk_size: int = settings.REINDEX_CHUNK_SIZE,
+    do_abort: bool = False,
+):
+    admin_reindex_cmd_view(lang, kind, tokenize, chunk_size, do_abort)
+
+
+@require_writable_db()
+@handle_common_exc()
+@peewee_utils.use_db()
+def admin_reindex_cmd_view(
+    lang: LangEnum,
+    kind: IndexKindEnum = IndexKindEnum.WORD,
+    tokenize: str | None = None,
+    chunk_size: int = settings.REINDEX_CHUNK_SIZE,
+    do_abort: bool = False,
+) -> None:
+    domain = ReindexDomain(kind, lang)
+    if do_abort:
+        domain.abort()
+        console.log(f"Reindex of {domain.index_table} aborted")
+        return
+
+    def on_chunk_fn(checkpoint: ReindexCheckpointModel) -> None:
+        console.log(f"Indexed items up to id: {checkpoint.last_item_id}")
+
+    checkpoint = domain.get_checkpoint()
+    if checkpoint is not None and not (tokenize and tokenize != checkpoint.tokenize):
+        console.log(
+            f"Resuming the reindex of {domain.index_table} from item id: {checkpoint.last_item_id}"
+        )
+    try:
+        domain.reindex(tokenize, chunk_size, on_chunk_fn)
+    except ReindexInProgress as exc:
+        console.error(str(exc))
+        raise ReindexFailed(str(exc)) from exc
+    console.log(
+        f"Reindex of {domain.index_table} done. Mind to update the tokenize option"
+        " in its model too"
+    )
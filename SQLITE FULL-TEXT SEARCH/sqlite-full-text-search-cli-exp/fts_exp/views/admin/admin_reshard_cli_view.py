@@ -0,0 +1,52 @@
+import click
+import peewee_utils
+
+from ...domains.shard_domain import InvalidShardsNumber, ShardDomain
+from ..base_cli_view import (
+    BaseClickCommand,
+    BaseCmdViewException,
+    ConsoleAdapter,
+    handle_common_exc,
+    require_writable_db,
+)
+
+console = ConsoleAdapter()
+
+
+class ReshardFailed(BaseCmdViewException):
+    pass
+
+
+@click.command(
+    cls=BaseClickCommand,
+    name="admin-reshard",
+    help="""Move the items to a sharded layout of N DB files (or to a new N).
+    Stop the writers first.
+
+    \b
+    eg. sfts admin-reshard --shards 4
+    """,
+)
+@click.option(
+    "--shards",
+    "n_shards",
+    type=click.IntRange(min=1),
+    required=True,
+    help="N. of shard DB files",
+)
+def admin_reshard_cli_view(n_shards: int):
+    admin_reshard_cmd_view(n_shards)
+
+
+@require_writable_db()
+@handle_common_exc()
+@peewee_utils.use_db()
+def admin_reshard_cmd_view(n_shards: int) -> dict[int, int]:
+    try:
+        n_items_by_shard = ShardDomain().reshard(n_shards)
+    except InvalidShardsNumber as exc:
+        console.error(str(exc))
+        raise ReshardFailed(str(exc)) from exc
+    for number, n_items in n_items_by_shard.items():
+        console.log(f"#{n_items} items in shard: {number}")
+    return n_items_by_shard
@@ -0,0 +1,53 @@
+import click
+import peewee_utils
+
+from ...domains.search_cache_domain import SearchCacheDomain
+from ..base_cli_view import (
+    BaseClickCommand,
+    ConsoleAdapter,
+    handle_common_exc,
+    require_writable_db,
+)
+
+console = ConsoleAdapter()
+
+
+@click.command(
+    cls=BaseClickCommand,
+    name="admin-search-cache-stats",
+    help="""Show the stats of the persistent search cache.
+
+    \b
+    eg. sfts admin-search-cache-stats
+    eg. sfts admin-search-cache-stats --clear
+    """,
+)
+@click.option(
+    "--clear",
+    "do_clear",
+    is_flag=True,
+    default=False,
+    help="Empty the cache and reset its stats, after showing them",
+)
+def admin_search_cache_stats_cli_view(do_clear: bool = False):
+    admin_search_cache_stats_cmd_view(do_clear)
+
+
+@handle_common_exc()
+@peewee_utils.use_db()
+def admin_search_cache_stats_cmd_view(do_clear: bool = False) -> dict:
+    domain = SearchCacheDomain()
+    stats = domain.get_stats()
+    n_lookups = stats["hits"] + stats["misses"]
+    hit_ratio = stats["hits"] / n_lookups if n_lookups else 0
+    console.print(
+        f"Entries: {stats['entries']}/{stats['max_entries']}\n"
+        f"Hits: {stats['hits']}\n"
+        f"Misses: {stats['misses']}\n"
+        f"Hit ratio: {hit_ratio:.1%}"
+    )
+    if do_clear:
+        with require_writable_db():
+            domain.clear()
+        console.log("Search cache cleared")
+    return stats
@@ -0,0 +1,50 @@
+import time
+
+import click
+import peewee_utils
+
+from ...data_models.db_models import LangEnum
+from ...domains.spelling_domain import SpellingDomain
+from ..base_cli_view import BaseClickCommand, ConsoleAdapter, handle_common_exc
+
+console = ConsoleAdapter()
+
+
+@click.command(
+    cls=BaseClickCommand,
+    name="admin-spelling-refresh",
+    help="""Refresh the vocabularies of the spelling suggestions, off the search
+    path, and save them to the sidecar file (SPELLING_SIDECAR_PATH), if set.
+    Run it periodically, eg. after bulk writes: the searches use the stale
+    vocabularies until then.
+
+    \b
+    eg. sfts admin-spelling-refresh
+    eg. sfts admin-spelling-refresh --lang ita
+    """,
+)
+@click.option(
+    "--lang",
+    "lang",
+    type=click.Choice(LangEnum, case_sensitive=False),
+    required=False,
+    help="Language [default: all]",
+)
+def admin_spelling_refresh_cli_view(lang: LangEnum | None = None):
+    admin_spelling_refresh_cmd_view(lang)
+
+
+@handle_common_exc()
+@peewee_utils.use_db()
+def admin_spelling_refresh_cmd_view(
+    lang: LangEnum | None = None,
+) -> dict[LangEnum, int]:
+    n_terms_by_lang = {}
+    for x in [lang] if lang else LangEnum:
+        start = time.perf_counter()
+        n_terms_by_lang[x] = SpellingDomain().refresh(x)
+        console.log(
+            f"#{n_terms_by_lang[x]} terms in the {x.name.lower()} vocabulary, refreshed in"
+            f" {time.perf_counter() - start:.1f} secs"
+        )
+    return n_terms_by_lang
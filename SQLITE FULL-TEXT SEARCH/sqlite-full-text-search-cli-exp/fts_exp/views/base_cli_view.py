@@ -1,5 +1,7 @@
 import contextlib
 import sys
+from pathlib import Path
+from typing import IO, Iterable
 
 import click
 import log_utils as logger
@@ -7,6 +9,8 @@ import peewee
 from rich.console import Console
 
 from ..conf import settings
+from ..data_models.db_utils import QueryBudgetExceeded, connect, sql_trace
+from ..domains.query_compiler import InvalidSearchQuery
 
 # Set the rich adapter to be used in peewee-utils libs and all other libs in
 #  utils-monorepo.
@@ -37,6 +41,31 @@ class handle_common_exc(contextlib.ContextDecorator):
             msg = "Have you created the db?! Run: sfts admin-db-create"
             ConsoleAdapter().error(msg)
             raise NoSqliteDbFile(msg) from exc_instance
+        if exc_type == QueryBudgetExceeded:
+            msg = f"The search was too expensive and was aborted ({exc_instance})"
+            ConsoleAdapter().error(msg)
+            raise SearchAborted(msg) from exc_instance
+        if exc_type == InvalidSearchQuery:
+            msg = f"Invalid search query: {exc_instance}"
+            ConsoleAdapter().error(msg)
+            raise InvalidSearchText(msg) from exc_instance
+        return False  # Do not suppress the exc.
+
+
+class require_writable_db(contextlib.ContextDecorator):
+    """
+    Refuse to run a command that writes to the DB in snapshot mode, where the DB is
+     read-only, see settings.IS_DB_SNAPSHOT_MODE.
+    """
+
+    def __enter__(self):
+        if settings.IS_DB_SNAPSHOT_MODE:
+            msg = "The DB is a read-only snapshot (IS_DB_SNAPSHOT_MODE is set)"
+            ConsoleAdapter().error(msg)
+            raise ReadOnlySnapshotDb(msg)
+        return self
+
+    def __exit__(self, exc_type, exc_instance, traceback):
         return False  # Do not suppress the exc.
 
 
@@ -44,10 +73,22 @@ class BaseCmdViewException(Exception):
     pass
 
 
+class ReadOnlySnapshotDb(BaseCmdViewException):
+    pass
+
+
 class NoSqliteDbFile(BaseCmdViewException):
     pass
 
 
+class SearchAborted(BaseCmdViewException):
+    pass
+
+
+class InvalidSearchText(BaseCmdViewException):
+    pass
+
+
 class ConsoleAdapter:
     def __init__(self):
         self.stdout_console = Console(file=sys.stdout)
@@ -66,3 +107,65 @@ class ConsoleAdapter:
         if not settings.ARE_CONSOLE_PRINTS_ENABLED:
             return
         self.stdout_console.print(*args, **kwargs)
+
+
+def read_item_ids(
+    item_ids: Iterable[int] = (), source: IO[str] | None = None
+) -> list[int] | None:
+    """
+    Return the given item ids plus those in the file `source` (1 per line, blank
+     lines and lines starting with # are skipped). Or None if there are none.
+    """
+    item_ids = list(item_ids)
+    if source is not None:
+        for i, line in enumerate(source, 1):
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            try:
+                item_ids.append(int(line))
+            except ValueError as exc:
+                raise click.BadParameter(
+                    f"Invalid item id at line {i}: {line!r}", param_hint="--ids-file"
+                ) from exc
+    return item_ids or None
+
+
+def print_sql_trace(
+    trace: sql_trace, n_statements: int = settings.SQL_TRACE_SUMMARY_N_STATEMENTS
+) -> None:
+    """
+    Print, to stderr, the summary of the trace and its slowest statements, with the
+     statements run by their triggers and their query plans.
+    """
+    if not settings.ARE_CONSOLE_PRINTS_ENABLED:
+        return
+    # The connection used by the command is closed by now: the query plans are
+    #  computed on a new one.
+    if Path(settings.DB_PATH).is_file():
+        with contextlib.closing(connect(settings.DB_PATH)) as connection:
+            trace.explain(connection)
+
+    summary = trace.get_summary()
+    console = Console(stderr=True)
+    console.print(
+        f"[bold]SQL trace[/]: {summary['n_statements']} statements,"
+        f" {summary['duration_ms']:.2f} ms, {summary['n_rows']} rows returned,"
+        f" {summary['n_changes']} rows changed"
+    )
+    for i, statement in enumerate(summary["statements"][:n_statements], 1):
+        console.print(
+            f"[bold]#{i}[/] {statement['duration_ms']:.2f} ms,"
+            f" {statement['n_runs']} runs, {statement['n_rows']} rows returned,"
+            f" {statement['n_changes']} rows changed"
+        )
+        console.print(f"  {statement['sql']}", markup=False, highlight=False)
+        for line in statement["plan"] or []:
+            console.print(f"  | {line}", markup=False, highlight=False)
+        for sql, sub_statement in statement["sub_statements"].items():
+            console.print(
+                f"  -> {sub_statement['n_runs']} runs,"
+                f" {sub_statement['duration_ms']:.2f} ms: {sql}",
+                markup=False,
+                highlight=False,
+            )
@@ -1,13 +1,29 @@
 import click
 import peewee_utils
 
-from ..data_models.db_models import ItemFTSIndexEng, ItemFTSIndexIta, ItemModel
+from ..data_models.db_models import (
+    ItemFTSIndexEng,
+    ItemFTSIndexIta,
+    ItemModel,
+    ItemSignatureModel,
+)
+from ..domains.dedupe_domain import DuplicateItem
 from ..domains.item_domain import CreateItemSchema, ItemDomain, LangEnum
-from .base_cli_view import BaseClickCommand, ConsoleAdapter, handle_common_exc
+from .base_cli_view import (
+    BaseClickCommand,
+    BaseCmdViewException,
+    ConsoleAdapter,
+    handle_common_exc,
+    require_writable_db,
+)
 
 console = ConsoleAdapter()
 
 
+class ItemRejected(BaseCmdViewException):
+    pass
+
+
 @click.command(
     cls=BaseClickCommand,
     name="create",
@@ -42,13 +58,24 @@ def create_cli_view(title: str, notes: str, lang: LangEnum):
     create_cmd_view(title, notes, lang)
 
 
+@require_writable_db()
 @handle_common_exc()
 @peewee_utils.use_db()
 def create_cmd_view(
     title: str, notes: str, lang: LangEnum
 ) -> tuple[ItemModel, ItemFTSIndexEng | ItemFTSIndexIta]:
     domain = ItemDomain()
-    item = domain.create_item(CreateItemSchema(title=title, notes=notes, lang=lang))
+    try:
+        item = domain.create_item(CreateItemSchema(title=title, notes=notes, lang=lang))
+    except DuplicateItem as exc:
+        console.error(f"Item rejected: {exc}")
+        raise ItemRejected(str(exc)) from exc
     # TODO use output schema?
     console.print(f"Created item id={item.id}")
+    signature = ItemSignatureModel.get_or_none(ItemSignatureModel.item_id == item.id)
+    if signature and signature.duplicate_of_id is not None:
+        console.print(
+            f"Flagged as a near-duplicate of the item id={signature.duplicate_of_id}"
+            f" (similarity: {signature.similarity:.2f})"
+        )
     return item
@@ -0,0 +1,152 @@
+from datetime import datetime
+from typing import IO
+
+import click
+import peewee_utils
+from rich.prompt import Confirm
+
+from ..conf import settings
+from ..domains.item_domain import BaseItemDomainException, ItemDomain, LangEnum
+from .base_cli_view import (
+    BaseClickCommand,
+    BaseCmdViewException,
+    ConsoleAdapter,
+    handle_common_exc,
+    read_item_ids,
+    require_writable_db,
+)
+
+console = ConsoleAdapter()
+
+
+class DeleteFailed(BaseCmdViewException):
+    pass
+
+
+@click.command(
+    cls=BaseClickCommand,
+    name="delete",
+    help="""Delete items by id and/or by filters, in chunks of items per
+    statement and transaction.
+
+    \b
+    eg. sfts delete --id 1 --id 2
+    eg. sfts delete --ids-file ids.txt -y
+    eg. sfts delete --lang ita --created-before 2024-01-01
+    """,
+)
+@click.option(
+    "--id",
+    "item_ids",
+    type=int,
+    multiple=True,
+    help="Item id, can be repeated",
+)
+@click.option(
+    "--ids-file",
+    "ids_file",
+    type=click.File("r"),
+    required=False,
+    help="File with the item ids, 1 per line",
+)
+@click.option(
+    "--lang",
+    "lang",
+    type=click.Choice(LangEnum, case_sensitive=False),
+    required=False,
+    help="Only items in this language",
+)
+@click.option(
+    "--created-after",
+    "created_after",
+    type=click.DateTime(),
+    required=False,
+    help="Only items created at or after this date (UTC)",
+)
+@click.option(
+    "--created-before",
+    "created_before",
+    type=click.DateTime(),
+    required=False,
+    help="Only items created before this date (UTC)",
+)
+@click.option(
+    "--all",
+    "do_all",
+    is_flag=True,
+    default=False,
+    help="Delete all items, when no ids nor filters are given",
+)
+@click.option(
+    "--chunk-size",
+    "chunk_size",
+    type=click.IntRange(min=1),
+    default=settings.BULK_WRITE_CHUNK_SIZE,
+    show_default=True,
+    help="N. of items deleted per statement and transaction",
+)
+@click.option(
+    "--no-confirmation",
+    "-y",
+    "do_skip_confirmation",
+    is_flag=True,
+    default=False,
+    help="Skip all confirmation inputs",
+)
+def delete_cli_view(
+    item_ids: tuple[int, ...] = (),
+    ids_file: IO[str] | None = None,
+    lang: LangEnum | None = None,
+    created_after: datetime | None = None,
+    created_before: datetime | None = None,
+    do_all: bool = False,
+    chunk_size: int = settings.BULK_WRITE_CHUNK_SIZE,
+    do_skip_confirmation: bool = False,
+):
+    delete_cmd_view(
+        read_item_ids(item_ids, ids_file),
+        lang,
+        created_after,
+        created_before,
+        do_all,
+        chunk_size,
+        do_skip_confirmation,
+    )
+
+
+@require_writable_db()
+@handle_common_exc()
+@peewee_utils.use_db()
+def delete_cmd_view(
+    item_ids: list[int] | None = None,
+    lang: LangEnum | None = None,
+    created_after: datetime | None = None,
+    created_before: datetime | None = None,
+    do_all: bool = False,
+    chunk_size: int = settings.BULK_WRITE_CHUNK_SIZE,
+    do_skip_confirmation: bool = False,
+) -> dict:
+    if not do_skip_confirmation and not Confirm.ask("Delete the selected items?"):
+        raise DeleteFailed("Abort")
+
+    def on_chunk_fn(n_items: int) -> None:
+        console.log(f"Deleted items: {n_items}")
+
+    try:
+        stats = ItemDomain().delete_items(
+            item_ids,
+            lang,
+            created_after,
+            created_before,
+            do_all,
+            chunk_size,
+            on_chunk_fn,
+        )
+    except BaseItemDomainException as exc:
+        console.error(f"Delete failed: {exc}")
+        raise DeleteFailed(str(exc)) from exc
+    console.print(
+        f"Deleted {stats['n_items']} items in {stats['duration_ms']:.2f} ms"
+        f" ({stats['n_items_per_sec']:.0f} items/sec)"
+    )
+    return stats
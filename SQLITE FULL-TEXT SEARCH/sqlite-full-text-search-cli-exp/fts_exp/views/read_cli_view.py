@@ -1,3 +1,5 @@
+from datetime import datetime
+
 import click
 import peewee
 import peewee_utils
@@ -16,6 +18,7 @@ console = ConsoleAdapter()
     \b
     eg. sfts read
     eg. sfts read --id 1
+    eg. sfts read --created-after 2024-01-01 --created-before 2025-01-01
     """,
 )
 @click.option(
@@ -25,15 +28,37 @@ console = ConsoleAdapter()
     required=False,
     help="Item id",
 )
-def read_cli_view(item_id: int | None = None):
-    read_cmd_view(item_id)
+@click.option(
+    "--created-after",
+    "created_after",
+    type=click.DateTime(),
+    required=False,
+    help="Only items created at or after this date (UTC)",
+)
+@click.option(
+    "--created-before",
+    "created_before",
+    type=click.DateTime(),
+    required=False,
+    help="Only items created before this date (UTC)",
+)
+def read_cli_view(
+    item_id: int | None = None,
+    created_after: datetime | None = None,
+    created_before: datetime | None = None,
+):
+    read_cmd_view(item_id, created_after, created_before)
 
 
 @handle_common_exc()
 @peewee_utils.use_db()
-def read_cmd_view(item_id: int | None = None) -> peewee.ModelSelect:
+def read_cmd_view(
+    item_id: int | None = None,
+    created_after: datetime | None = None,
+    created_before: datetime | None = None,
+) -> peewee.SelectBase:
     domain = ItemDomain()
-    items = domain.read_items(item_id)
+    items = domain.read_items(item_id, created_after, created_before)
     for item in items:
         # TODO use output schema?
         console.print(item)
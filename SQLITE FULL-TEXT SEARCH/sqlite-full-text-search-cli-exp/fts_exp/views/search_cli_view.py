@@ -1,15 +1,39 @@
+import time
+from datetime import datetime
+
 import click
-import peewee
 import peewee_utils
+from rich.table import Table
 
 from ..conf import settings
 from ..data_models.db_models import LangEnum
-from ..domains.item_domain import ItemDomain
-from .base_cli_view import BaseClickCommand, ConsoleAdapter, handle_common_exc
+from ..domains.item_domain import (
+    ItemDomain,
+    SearchModeEnum,
+    SearchResults,
+    SubstringModeNotEnabled,
+)
+from ..domains.search_cache_domain import SearchCacheDomain
+from ..domains.slow_query_log_domain import SlowQueryLogDomain
+from ..domains.snapshot_domain import SnapshotDomain, SnapshotNotReadOnly
+from .base_cli_view import (
+    BaseClickCommand,
+    BaseCmdViewException,
+    ConsoleAdapter,
+    handle_common_exc,
+)
 
 console = ConsoleAdapter()
 
 
+class InvalidSnapshotDb(BaseCmdViewException):
+    pass
+
+
+class InvalidSearchMode(BaseCmdViewException):
+    pass
+
+
 @click.command(
     cls=BaseClickCommand,
     name="search",
@@ -17,6 +41,11 @@ console = ConsoleAdapter()
 
     \b
     eg. sfts search "la zampina" --lang ita
+    eg. sfts search "zamp" --lang ita --mode substring
+    eg. sfts search "dentista" --lang ita --mode passage
+    eg. sfts search "dentista" --lang ita --created-after 2024-01-01
+    eg. sfts search "la zampina" --lang ita --stats
+    eg. IS_DB_SNAPSHOT_MODE=1 DB_PREWARM=mmap sfts search "la zampina" --lang ita
     """,
 )
 @click.argument("text", type=str)
@@ -27,15 +56,128 @@ console = ConsoleAdapter()
     required=True,
     help="Language",
 )
-def search_cli_view(text: str, lang: LangEnum):
-    search_cmd_view(text, lang)
+@click.option(
+    "--mode",
+    "mode",
+    type=click.Choice(SearchModeEnum, case_sensitive=False),
+    default=SearchModeEnum.WORD,
+    show_default=True,
+    help="Stemmed word search, substring search (requires IS_SUBSTRING_MODE_ENABLED)"
+    " or passage search (requires IS_PASSAGE_MODE_ENABLED)",
+)
+@click.option(
+    "--page",
+    "page",
+    type=int,
+    default=1,
+    show_default=True,
+    help="Page of results",
+)
+@click.option(
+    "--time-budget-ms",
+    "time_budget_ms",
+    type=int,
+    required=False,
+    help="Abort the search when it takes longer, 0 for no budget [default: settings]",
+)
+@click.option(
+    "--cache/--no-cache",
+    "do_use_cache",
+    default=None,
+    help="Use the persistent search cache [default: settings]",
+)
+@click.option(
+    "--created-after",
+    "created_after",
+    type=click.DateTime(),
+    required=False,
+    help="Only items created at or after this date (UTC)",
+)
+@click.option(
+    "--created-before",
+    "created_before",
+    type=click.DateTime(),
+    required=False,
+    help="Only items created before this date (UTC)",
+)
+@click.option(
+    "--stats",
+    "do_show_stats",
+    is_flag=True,
+    default=False,
+    help="Show the latency breakdown by phase, the n. of matching rows and the"
+    " pages read from the page cache and from the DB file",
+)
+def search_cli_view(
+    text: str,
+    lang: LangEnum,
+    mode: SearchModeEnum = SearchModeEnum.WORD,
+    page: int = 1,
+    time_budget_ms: int | None = None,
+    do_use_cache: bool | None = None,
+    created_after: datetime | None = None,
+    created_before: datetime | None = None,
+    do_show_stats: bool = False,
+):
+    search_cmd_view(
+        text,
+        lang,
+        mode,
+        page,
+        time_budget_ms,
+        do_use_cache,
+        created_after,
+        created_before,
+        do_show_stats,
+        # The start of the DB connection, for the stats.
+        started_at=time.perf_counter(),
+    )
 
 
 @handle_common_exc()
 @peewee_utils.use_db()
-def search_cmd_view(text: str, lang: LangEnum) -> peewee.ModelSelect:
+def search_cmd_view(
+    text: str,
+    lang: LangEnum,
+    mode: SearchModeEnum = SearchModeEnum.WORD,
+    page: int = 1,
+    time_budget_ms: int | None = None,
+    do_use_cache: bool | None = None,
+    created_after: datetime | None = None,
+    created_before: datetime | None = None,
+    do_show_stats: bool = False,
+    started_at: float | None = None,
+) -> SearchResults:
+    connected_at = time.perf_counter()
+    snapshot = SnapshotDomain()
+    if snapshot.is_enabled():
+        try:
+            snapshot.check()
+        except SnapshotNotReadOnly as exc:
+            console.error(str(exc))
+            raise InvalidSnapshotDb(str(exc)) from exc
+    prewarm = snapshot.prewarm() if settings.DB_PREWARM else None
     domain = ItemDomain()
-    items = domain.search_items(text, lang)
+    try:
+        items = domain.search_items(
+            text,
+            lang,
+            page=page,
+            mode=mode,
+            time_budget_ms=time_budget_ms,
+            do_use_cache=do_use_cache,
+            created_after=created_after,
+            created_before=created_before,
+            do_collect_stats=do_show_stats,
+        )
+    except SubstringModeNotEnabled as exc:
+        console.error(str(exc))
+        raise InvalidSearchMode(str(exc)) from exc
+    # Write the searches logged to the slow query log and the search cache counters,
+    #  if any.
+    SlowQueryLogDomain().flush()
+    SearchCacheDomain().flush()
+    rendering_started_at = time.perf_counter()
     for item in items:
         # TODO use output schema?
         title = item.title_s.replace(
@@ -47,4 +189,55 @@ def search_cmd_view(text: str, lang: LangEnum) -> peewee.ModelSelect:
             "[bold black on green_yellow]",
         ).replace(settings.SQLITE_SEARCH_HIGHLIGHT_SEPARATOR_END, "[/]")
         console.print(f"{title}\n{notes}\n")
+    if items.suggestions:
+        console.print(f"Did you mean: {' | '.join(items.suggestions)}")
+
+    if do_show_stats:
+        now = time.perf_counter()
+        stats = items.stats
+        # The phases out of the domain: the DB connection (with the extensions
+        #  load), the prewarm and the rendering.
+        phases = {
+            "connect": dict(
+                duration_ms=(connected_at - (started_at or connected_at)) * 1000,
+                n_cache_hits=0,
+                n_cache_misses=0,
+            )
+        }
+        if prewarm:
+            phases["prewarm"] = {
+                x: prewarm[x] for x in ("duration_ms", "n_cache_hits", "n_cache_misses")
+            }
+        phases.update(stats["phases"])
+        phases["render"] = dict(
+            duration_ms=(now - rendering_started_at) * 1000,
+            n_cache_hits=0,
+            n_cache_misses=0,
+        )
+        stats["phases"] = phases
+        stats["duration_ms"] = (now - (started_at or connected_at)) * 1000
+        _print_stats(stats)
     return items
+
+
+def _print_stats(stats: dict) -> None:
+    table = Table(title="Search stats")
+    table.add_column("Phase")
+    for column in ("ms", "Cache hits", "Cache misses"):
+        table.add_column(column, justify="right")
+    for name, phase in stats["phases"].items():
+        table.add_row(
+            name,
+            f"{phase['duration_ms']:.2f}",
+            str(phase["n_cache_hits"]),
+            str(phase["n_cache_misses"]),
+        )
+    table.add_row(
+        "[bold]total[/]",
+        f"{stats['duration_ms']:.2f}",
+        str(stats["n_cache_hits"]),
+        str(stats["n_cache_misses"]),
+    )
+    console.print(table)
+    n_matched = "?" if stats["n_matched"] is None else stats["n_matched"]
+    console.print(f"Rows: {stats['n_returned']} returned, {n_matched} matched")
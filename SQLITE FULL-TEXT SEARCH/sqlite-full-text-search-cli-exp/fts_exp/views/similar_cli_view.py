@@ -0,0 +1,61 @@
+import click
+import peewee_utils
+from rich.table import Table
+
+from ..data_models.db_models import ItemModel
+from ..domains.item_domain import BaseItemDomainException, ItemDomain
+from .base_cli_view import (
+    BaseClickCommand,
+    BaseCmdViewException,
+    ConsoleAdapter,
+    handle_common_exc,
+)
+
+console = ConsoleAdapter()
+
+
+class SimilarItemsFailed(BaseCmdViewException):
+    pass
+
+
+@click.command(
+    cls=BaseClickCommand,
+    name="similar",
+    help="""Find the items most similar to the given one ("more like this"), in its
+    lang, by the TF-IDF cosine similarity of their terms.
+
+    \b
+    eg. sfts similar 1
+    eg. sfts similar 1 -k 5
+    """,
+)
+@click.argument("item_id", type=int)
+@click.option(
+    "-k",
+    "k",
+    type=click.IntRange(min=1),
+    default=10,
+    show_default=True,
+    help="N. of similar items",
+)
+def similar_cli_view(item_id: int, k: int = 10):
+    similar_cmd_view(item_id, k)
+
+
+@handle_common_exc()
+@peewee_utils.use_db()
+def similar_cmd_view(item_id: int, k: int = 10) -> list[ItemModel]:
+    try:
+        items = ItemDomain().similar_items(item_id, k)
+    except BaseItemDomainException as exc:
+        console.error(str(exc))
+        raise SimilarItemsFailed(str(exc)) from exc
+
+    table = Table(title=f"Items similar to the item id={item_id}")
+    table.add_column("Id", justify="right")
+    table.add_column("Similarity", justify="right")
+    table.add_column("Title", overflow="fold")
+    for item in items:
+        table.add_row(str(item.id), f"{item.score:.2f}", item.title)
+    console.print(table)
+    return items
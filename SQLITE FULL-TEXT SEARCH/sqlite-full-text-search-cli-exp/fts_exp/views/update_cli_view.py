@@ -0,0 +1,184 @@
+from datetime import datetime
+from typing import IO
+
+import click
+import peewee_utils
+from rich.prompt import Confirm
+
+from ..conf import settings
+from ..domains.item_domain import (
+    BaseItemDomainException,
+    ItemDomain,
+    LangEnum,
+    UpdateItemsSchema,
+)
+from .base_cli_view import (
+    BaseClickCommand,
+    BaseCmdViewException,
+    ConsoleAdapter,
+    handle_common_exc,
+    read_item_ids,
+    require_writable_db,
+)
+
+console = ConsoleAdapter()
+
+
+class UpdateFailed(BaseCmdViewException):
+    pass
+
+
+@click.command(
+    cls=BaseClickCommand,
+    name="update",
+    help="""Update the title, notes and/or lang of items selected by id and/or by
+    filters, in chunks of items per statement and transaction.
+
+    \b
+    eg. sfts update --id 1 --set-title "My new title"
+    eg. sfts update --ids-file ids.txt --set-lang eng -y
+    eg. sfts update --lang ita --created-before 2024-01-01 --set-notes ""
+    """,
+)
+@click.option(
+    "--set-title",
+    "title",
+    type=str,
+    required=False,
+    help="New title for the items",
+)
+@click.option(
+    "--set-notes",
+    "notes",
+    type=str,
+    required=False,
+    help="New notes for the items",
+)
+@click.option(
+    "--set-lang",
+    "new_lang",
+    type=click.Choice(LangEnum, case_sensitive=False),
+    required=False,
+    help="New language for the items",
+)
+@click.option(
+    "--id",
+    "item_ids",
+    type=int,
+    multiple=True,
+    help="Item id, can be repeated",
+)
+@click.option(
+    "--ids-file",
+    "ids_file",
+    type=click.File("r"),
+    required=False,
+    help="File with the item ids, 1 per line",
+)
+@click.option(
+    "--lang",
+    "lang",
+    type=click.Choice(LangEnum, case_sensitive=False),
+    required=False,
+    help="Only items in this language",
+)
+@click.option(
+    "--created-after",
+    "created_after",
+    type=click.DateTime(),
+    required=False,
+    help="Only items created at or after this date (UTC)",
+)
+@click.option(
+    "--created-before",
+    "created_before",
+    type=click.DateTime(),
+    required=False,
+    help="Only items created before this date (UTC)",
+)
+@click.option(
+    "--all",
+    "do_all",
+    is_flag=True,
+    default=False,
+    help="Update all items, when no ids nor filters are given",
+)
+@click.option(
+    "--chunk-size",
+    "chunk_size",
+    type=click.IntRange(min=1),
+    default=settings.BULK_WRITE_CHUNK_SIZE,
+    show_default=True,
+    help="N. of items updated per statement and transaction",
+)
+@click.option(
+    "--no-confirmation",
+    "-y",
+    "do_skip_confirmation",
+    is_flag=True,
+    default=False,
+    help="Skip all confirmation inputs",
+)
+def update_cli_view(
+    title: str | None = None,
+    notes: str | None = None,
+    new_lang: LangEnum | None = None,
+    item_ids: tuple[int, ...] = (),
+    ids_file: IO[str] | None = None,
+    lang: LangEnum | None = None,
+    created_after: datetime | None = None,
+    created_before: datetime | None = None,
+    do_all: bool = False,
+    chunk_size: int = settings.BULK_WRITE_CHUNK_SIZE,
+    do_skip_confirmation: bool = False,
+):
+    update_cmd_view(
+        UpdateItemsSchema(title=title, notes=notes, lang=new_lang),
+        read_item_ids(item_ids, ids_file),
+        lang,
+        created_after,
+        created_before,
+        do_all,
+        chunk_size,
+        do_skip_confirmation,
+    )
+
+
+@require_writable_db()
+@handle_common_exc()
+@peewee_utils.use_db()
+def update_cmd_view(
+    schema: UpdateItemsSchema,
+    item_ids: list[int] | None = None,
+    lang: LangEnum | None = None,
+    created_after: datetime | None = None,
+    created_before: datetime | None = None,
+    do_all: bool = False,
+    chunk_size: int = settings.BULK_WRITE_CHUNK_SIZE,
+    do_skip_confirmation: bool = False,
+) -> dict:
+    if not do_skip_confirmation and not Confirm.ask("Update the selected items?"):
+        raise UpdateFailed("Abort")
+
+    def on_chunk_fn(n_items: int) -> None:
+        console.log(f"Updated items: {n_items}")
+
+    try:
+        stats = ItemDomain().update_items(
+            schema,
+            item_ids,
+            lang,
+            created_after,
+            created_before,
+            do_all,
+            chunk_size,
+            on_chunk_fn,
+        )
+    except BaseItemDomainException as exc:
+        console.error(f"Update failed: {exc}")
+        raise UpdateFailed(str(exc)) from exc
+    console.print(
+        f"Updated {stats['n_items']} items in {stats['duration_ms']:.2f} ms"
+        f" ({stats['n_items_per_sec']:.0f} items/sec)"
+    )
+    return stats
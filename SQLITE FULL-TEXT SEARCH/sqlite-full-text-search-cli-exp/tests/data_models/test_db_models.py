@@ -109,6 +109,16 @@ class TestItemModel:
         assert (a.updated_at - prev_updated_at) > timedelta(seconds=0)
         assert (a.updated_at - prev_updated_at) < timedelta(seconds=1)
 
+    def test_trigger_updated_at_other_items(self):
+        # The goal is to ensure that the trigger updates only the updated item.
+        for test_datum in TEST_DATA_ENG[:2]:
+            ItemModel.create(
+                title=test_datum["title"], notes=test_datum["notes"], lang=LangEnum.ENG
+            )
+        prev_updated_at = ItemModel.get_by_id(2).updated_at
+        ItemModel.update(title="title bis").where(ItemModel.id == 1).execute()
+        assert ItemModel.get_by_id(2).updated_at == prev_updated_at
+
 
 class TestItemFTSIndexIta_TriggerOnInsertItem:
     # The goal is to test that the ITA index (ItemFTSIndexIta) is built after
@@ -672,3 +682,44 @@ class TestItemFTSIndexEng_TriggerOnUpdateItem:
         assert query.count() == 0
         query = _make_search_query(ItemFTSIndexIta, "viaggiamo")
         assert query.count() == 2
+
+
+class TestCompressedNotes:
+    def setup_method(self):
+        self.notes = " ".join(["La gatta va al lardo e ci lascia lo zampino"] * 20)
+
+    def test_compressed(self, monkeypatch):
+        monkeypatch.setattr(settings, "IS_NOTES_COMPRESSION_ENABLED", True)
+        item = ItemModel.create(title="Gatta", notes=self.notes, lang=LangEnum.ITA)
+
+        raw_notes = ItemModel._meta.database.execute_sql(
+            "SELECT notes FROM item WHERE id = ?;", (item.id,)
+        ).fetchone()[0]
+        assert isinstance(raw_notes, bytes)
+        assert len(raw_notes) < len(self.notes)
+        assert ItemModel.get_by_id(item.id).notes == self.notes
+
+        results = list(_make_search_query(ItemFTSIndexIta, "zampino"))
+        assert len(results) == 1
+        assert results[0].notes_s.startswith(
+            f"La gatta va al lardo e ci lascia lo {settings.SQLITE_SEARCH_HIGHLIGHT_SEPARATOR_START}zampino"
+        )
+
+    def test_short_notes_not_compressed(self, monkeypatch):
+        monkeypatch.setattr(settings, "IS_NOTES_COMPRESSION_ENABLED", True)
+        item = ItemModel.create(title="Gatta", notes="Zampino", lang=LangEnum.ITA)
+        raw_notes = ItemModel._meta.database.execute_sql(
+            "SELECT notes FROM item WHERE id = ?;", (item.id,)
+        ).fetchone()[0]
+        assert raw_notes == "Zampino"
+
+    def test_update_and_delete_mixed(self, monkeypatch):
+        item = ItemModel.create(title="Gatta", notes=self.notes, lang=LangEnum.ITA)
+        monkeypatch.setattr(settings, "IS_NOTES_COMPRESSION_ENABLED", True)
+        item.notes = self.notes.replace("zampino", "dente")
+        item.save()
+        assert len(list(_make_search_query(ItemFTSIndexIta, "zampino"))) == 0
+        assert len(list(_make_search_query(ItemFTSIndexIta, "dente"))) == 1
+
+        item.delete_instance()
+        assert len(list(_make_search_query(ItemFTSIndexIta, "dente"))) == 0
@@ -0,0 +1,64 @@
+from fts_exp.data_models.db_models import ItemModel, LangEnum
+from fts_exp.data_models.db_utils import get_connection, get_db, is_read_only, sql_trace
+
+
+class TestSqlTrace:
+    def setup_method(self):
+        for i in range(5):
+            ItemModel.create(title=f"Gatta n. {i}", notes="zampa", lang=LangEnum.ITA)
+
+    def test_statements(self):
+        with sql_trace() as trace:
+            items = list(ItemModel.select().where(ItemModel.lang == LangEnum.ITA))
+        assert len(items) == 5
+        statement = trace.statements[-1]
+        assert statement.sql.startswith('SELECT "t1"."id"')
+        assert "= 'I'" in statement.expanded_sql
+        assert statement.n_rows == 5
+        assert statement.duration_ms > 0
+
+    def test_triggers(self):
+        with sql_trace() as trace:
+            ItemModel.update(title="Gatto").where(ItemModel.id == 3).execute()
+        statement = trace.get_summary()["statements"][0]
+        assert statement["sql"].startswith('UPDATE "item"')
+        sub_statements = statement["sub_statements"]
+        assert sub_statements["TRIGGER update_indices_after_update_on_item_1"]
+        # The item is reindexed once (not again for the UPDATE of updated_at made by
+        #  its trigger), and the other items are left untouched.
+        assert [
+            x["n_runs"]
+            for sql, x in sub_statements.items()
+            if sql.startswith("INSERT INTO itemftsindexita(rowid")
+        ] == [1]
+        assert statement["n_changes"] > 0
+
+    def test_explain(self):
+        with sql_trace(get_connection()) as trace:
+            ItemModel.get_by_id(2)
+            list(ItemModel.select().where(ItemModel.title == "Gatta n. 1"))
+        trace.explain()
+        assert trace.statements[0].plan == [
+            "SEARCH t1 USING INTEGER PRIMARY KEY (rowid=?)"
+        ]
+        assert trace.statements[1].plan == ["SCAN t1"]
+
+    def test_not_traced_after_exit(self):
+        with sql_trace() as trace:
+            ItemModel.get_by_id(2)
+        ItemModel.get_by_id(3)
+        assert len(trace.statements) == 1
+
+
+class TestIsReadOnly:
+    def test_writable(self):
+        assert not is_read_only()
+        tables = get_db().get_tables()
+        assert "_is_read_only_check" not in tables
+
+    def test_query_only(self):
+        get_db().execute_sql("PRAGMA query_only = 1;")
+        try:
+            assert is_read_only()
+        finally:
+            get_db().execute_sql("PRAGMA query_only = 0;")
@@ -0,0 +1,39 @@
+import pytest
+
+from fts_exp.data_models import sqlite_capi
+from fts_exp.data_models.db_models import ItemModel, LangEnum
+from fts_exp.data_models.db_utils import get_connection
+from fts_exp.data_models.sqlite_capi import (
+    SQLITE_DBSTATUS_CACHE_MISS,
+    SqliteCapiNotAvailable,
+    get_db_status,
+    get_handle,
+    is_known_layout,
+)
+from fts_exp.domains.item_domain import ItemDomain
+
+
+class TestGetHandle:
+    @pytest.fixture(autouse=True)
+    def setup(self):
+        is_known_layout.cache_clear()
+        yield
+        is_known_layout.cache_clear()
+
+    def test_happy_flow(self):
+        assert get_handle(get_connection())
+        assert get_db_status(get_connection(), SQLITE_DBSTATUS_CACHE_MISS) >= 0
+
+    def test_unknown_layout(self, monkeypatch):
+        monkeypatch.setattr(sqlite_capi, "CPYTHON_VERSIONS", ())
+        with pytest.raises(SqliteCapiNotAvailable):
+            get_handle(get_connection())
+
+    def test_search_stats_without_capi(self, monkeypatch):
+        ItemModel.create(title="Gatta", lang=LangEnum.ITA)
+        monkeypatch.setattr(sqlite_capi, "CPYTHON_VERSIONS", ())
+        results = ItemDomain().search_items(
+            "gatta", LangEnum.ITA, do_collect_stats=True
+        )
+        assert len(results) == 1
+        assert results.stats["n_cache_hits"] == results.stats["n_cache_misses"] == 0
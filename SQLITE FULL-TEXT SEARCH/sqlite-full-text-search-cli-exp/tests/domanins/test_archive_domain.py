@@ -0,0 +1,195 @@
+import sqlite3
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from fts_exp.conf import settings
+from fts_exp.data_models.db_models import (
+    ArchivePartitionModel,
+    ItemFTSIndexIta,
+    ItemModel,
+    LangEnum,
+)
+from fts_exp.data_models.db_utils import (
+    get_connection,
+    get_db,
+    get_model_for_schema,
+)
+from fts_exp.domains.archive_domain import (
+    ArchiveDomain,
+    ItemIdNotAutoincrement,
+    TooManyAttachedDbs,
+)
+from fts_exp.domains.item_domain import ItemDomain, SearchModeEnum
+
+
+def _create_item(title: str, created_at: datetime, lang=LangEnum.ITA) -> ItemModel:
+    return ItemModel.create(title=title, notes="", lang=lang, created_at=created_at)
+
+
+def _get_attached() -> list[str]:
+    return [
+        x[1]
+        for x in get_db().execute_sql("PRAGMA database_list;")
+        if x[1] not in ("main", "temp")
+    ]
+
+
+class TestArchive:
+    @pytest.fixture(autouse=True)
+    def setup(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(settings, "ARCHIVE_DIR", str(tmp_path))
+        # The trigram indexes are archived too.
+        monkeypatch.setattr(settings, "IS_SUBSTRING_MODE_ENABLED", True)
+        self.tmp_path = tmp_path
+        self.domain = ArchiveDomain()
+        self.item_domain = ItemDomain()
+        now = datetime.now(timezone.utc)
+        self.items = [
+            _create_item("Gatta del 2020", datetime(2020, 3, 1, tzinfo=timezone.utc)),
+            _create_item("Gatta del 2021", datetime(2021, 3, 1, tzinfo=timezone.utc)),
+            _create_item("Gatta di ieri", now - timedelta(days=1)),
+            _create_item("Gatta di oggi", now),
+        ]
+
+    def test_archive(self):
+        assert self.domain.archive(older_than_days=30) == {2020: 1, 2021: 1}
+        assert ItemModel.select().count() == 2
+        assert (
+            ItemFTSIndexIta.select().where(ItemFTSIndexIta.match("gatta")).count() == 2
+        )
+        assert [x.year for x in ArchivePartitionModel.select()] == [2020, 2021]
+        assert any(
+            x.name.endswith("-archive-2020.sqlite3") for x in self.tmp_path.iterdir()
+        )
+
+    def test_ids_are_not_reused(self):
+        ItemModel.delete().where(ItemModel.id > 2).execute()
+        assert self.domain.archive(older_than_days=30) == {2020: 1, 2021: 1}
+        item = _create_item("Gatta nuova", datetime.now(timezone.utc))
+        assert item.id == 5
+        assert [x.title for x in self.item_domain.read_items(item_id=5)] == [
+            "Gatta nuova"
+        ]
+
+    def test_item_id_not_autoincrement(self):
+        db = get_db()
+        db.execute_sql("DROP TABLE item;")
+        db.execute_sql(
+            "CREATE TABLE item (id INTEGER NOT NULL PRIMARY KEY, created_at, updated_at,"
+            " title, notes, lang);"
+        )
+        with pytest.raises(ItemIdNotAutoincrement):
+            self.domain.archive(older_than_days=30)
+
+    def test_search_all_partitions(self):
+        self.domain.archive(older_than_days=30)
+        results = self.item_domain.search_items("gatta", LangEnum.ITA)
+        assert {x.rowid for x in results} == {1, 2, 3, 4}
+
+    def test_search_pruned(self):
+        self.domain.archive(older_than_days=30)
+        assert self.domain.get_partitions(
+            created_after=datetime(2021, 1, 1, tzinfo=timezone.utc)
+        ) == ["main", "archive_2021"]
+
+        results = self.item_domain.search_items(
+            "gatta",
+            LangEnum.ITA,
+            created_after=datetime(2020, 6, 1, tzinfo=timezone.utc),
+            created_before=datetime(2022, 1, 1, tzinfo=timezone.utc),
+        )
+        assert [x.rowid for x in results] == [2]
+
+    def test_update_in_archive(self):
+        self.domain.archive(older_than_days=30)
+        with self.domain.attached(["archive_2020"]):
+            _ItemModel = get_model_for_schema(ItemModel, "archive_2020")
+            _ItemModel.update(title="Cane del 2020").where(_ItemModel.id == 1).execute()
+        results = self.item_domain.search_items("cane", LangEnum.ITA)
+        assert [x.rowid for x in results] == [1]
+        results = self.item_domain.search_items("gatta", LangEnum.ITA)
+        assert {x.rowid for x in results} == {2, 3, 4}
+
+    def test_search_substring(self):
+        self.domain.archive(older_than_days=30)
+        results = self.item_domain.search_items(
+            "del 20", LangEnum.ITA, mode=SearchModeEnum.SUBSTRING
+        )
+        assert {x.rowid for x in results} == {1, 2}
+
+    def test_search_pagination(self, monkeypatch):
+        self.domain.archive(older_than_days=30)
+        monkeypatch.setattr(settings, "SQLITE_SEARCH_PAGE_SIZE", 3)
+        page_1 = self.item_domain.search_items("gatta", LangEnum.ITA, page=1)
+        page_2 = self.item_domain.search_items("gatta", LangEnum.ITA, page=2)
+        assert len(page_1) == 3
+        assert {x.rowid for x in page_1 + page_2} == {1, 2, 3, 4}
+
+    def test_read(self):
+        self.domain.archive(older_than_days=30)
+        assert {x.id for x in self.item_domain.read_items()} == {1, 2, 3, 4}
+        assert [x.title for x in self.item_domain.read_items(item_id=1)] == [
+            "Gatta del 2020"
+        ]
+        items = self.item_domain.read_items(
+            created_before=datetime(2021, 1, 1, tzinfo=timezone.utc)
+        )
+        assert [x.id for x in items] == [1]
+
+
+class TestManyArchives:
+    """
+    More yearly archives than SQLITE_LIMIT_ATTACHED (10 by default).
+    """
+
+    YEARS = range(2008, 2021)
+
+    @pytest.fixture(autouse=True)
+    def setup(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(settings, "ARCHIVE_DIR", str(tmp_path))
+        self.domain = ArchiveDomain()
+        self.item_domain = ItemDomain()
+        for year in self.YEARS:
+            _create_item(f"Gatta del {year}", datetime(year, 3, 1, tzinfo=timezone.utc))
+        _create_item("Gatta di oggi", datetime.now(timezone.utc))
+        self.n_items = len(self.YEARS) + 1
+        assert len(self.YEARS) > get_connection().getlimit(
+            sqlite3.SQLITE_LIMIT_ATTACHED
+        )
+
+    def test_archive(self):
+        assert self.domain.archive(older_than_days=365) == {x: 1 for x in self.YEARS}
+        assert ArchivePartitionModel.select().count() == len(self.YEARS)
+        assert _get_attached() == []
+
+    def test_search(self):
+        self.domain.archive(older_than_days=365)
+        results = self.item_domain.search_items("gatta", LangEnum.ITA)
+        assert {x.rowid for x in results} == set(range(1, self.n_items + 1))
+        assert _get_attached() == []
+
+    def test_read(self):
+        self.domain.archive(older_than_days=365)
+        items = self.item_domain.read_items()
+        assert sorted(x.id for x in items) == list(range(1, self.n_items + 1))
+        assert _get_attached() == []
+
+    def test_iter_attached_batches(self):
+        self.domain.archive(older_than_days=365)
+        limit = get_connection().getlimit(sqlite3.SQLITE_LIMIT_ATTACHED)
+        schemas = self.domain.get_partitions()
+        batches = []
+        for batch in self.domain.iter_attached(schemas):
+            assert set(_get_attached()) == set(batch) - {"main"}
+            batches.append(batch)
+        assert [x for batch in batches for x in batch] == schemas
+        assert max(len(set(x) - {"main"}) for x in batches) == limit
+        assert _get_attached() == []
+
+    def test_attached_too_many(self):
+        self.domain.archive(older_than_days=365)
+        with pytest.raises(TooManyAttachedDbs):
+            with self.domain.attached(self.domain.get_partitions()):
+                pass
+        assert _get_attached() == []
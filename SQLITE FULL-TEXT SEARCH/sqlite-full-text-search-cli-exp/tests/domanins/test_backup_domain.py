@@ -0,0 +1,54 @@
+import sqlite3
+
+import pytest
+
+from fts_exp.data_models.db_models import ItemModel, LangEnum
+from fts_exp.data_models.db_utils import connect
+from fts_exp.domains.backup_domain import BackupDestinationExists, BackupDomain
+
+
+class TestBackup:
+    @pytest.fixture(autouse=True)
+    def setup(self, tmp_path):
+        self.dest_path = tmp_path / "backup.sqlite3"
+        self.domain = BackupDomain()
+        for i in range(200):
+            ItemModel.create(
+                title=f"Gatta n. {i}", notes="zampa " * 100, lang=LangEnum.ITA
+            )
+            ItemModel.create(title=f"Cat n. {i}", notes="paw " * 100, lang=LangEnum.ENG)
+
+    def _search(self, text: str) -> list:
+        connection = connect(self.dest_path)
+        return connection.execute(
+            "SELECT rowid FROM itemftsindexita WHERE itemftsindexita MATCH ?;", (text,)
+        ).fetchall()
+
+    def test_backup(self):
+        progress = []
+        self.domain.backup(
+            self.dest_path,
+            pages_per_step=10,
+            sleep_ms=0,
+            on_progress_fn=lambda *x: progress.append(x),
+        )
+        assert len(self._search("gatta")) == 200
+        assert len(progress) > 1
+        assert progress[-1][0] == progress[-1][1]
+        assert not self.dest_path.with_name("backup.sqlite3.tmp").exists()
+
+    def test_backup_vacuum(self):
+        ItemModel.delete().where(ItemModel.id > 10).execute()
+        plain_path = self.dest_path.with_name("plain.sqlite3")
+        self.domain.backup(plain_path)
+        self.domain.backup(self.dest_path, do_vacuum=True)
+        assert len(self._search("gatta")) == 5
+        assert self.dest_path.stat().st_size < plain_path.stat().st_size
+
+    def test_destination_exists(self):
+        self.dest_path.write_text("")
+        with pytest.raises(BackupDestinationExists):
+            self.domain.backup(self.dest_path)
+        self.domain.backup(self.dest_path, do_overwrite=True)
+        connection = sqlite3.connect(self.dest_path)
+        assert connection.execute("SELECT count(*) FROM item;").fetchone()[0] == 400
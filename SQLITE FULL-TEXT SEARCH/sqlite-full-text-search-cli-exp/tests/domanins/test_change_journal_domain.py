@@ -0,0 +1,125 @@
+import peewee_utils
+import pytest
+
+from fts_exp.conf import settings
+from fts_exp.data_models.db_models import (
+    ITEM_WRITES_COUNTER,
+    ChangeModel,
+    CounterModel,
+    ItemFTSIndexIta,
+    ItemModel,
+    LangEnum,
+)
+from fts_exp.domains.backup_domain import BackupDomain
+from fts_exp.domains.change_journal_domain import (
+    ChangeJournalDomain,
+    ChangeOpEnum,
+    InvalidChange,
+)
+
+
+class TestChangeJournal:
+    @pytest.fixture(autouse=True)
+    def setup(self, monkeypatch):
+        monkeypatch.setattr(settings, "IS_CHANGE_JOURNAL_ENABLED", True)
+        self.domain = ChangeJournalDomain()
+        self.items = [
+            ItemModel.create(title=f"Gatta n. {i}", notes="zampa", lang=LangEnum.ITA)
+            for i in range(3)
+        ]
+
+    def test_read_changes(self):
+        version = self.domain.get_version()
+        ItemModel.update(title="Gattino").where(
+            ItemModel.id == self.items[1].id
+        ).execute()
+        ItemModel.delete().where(ItemModel.id == self.items[2].id).execute()
+
+        changes = list(self.domain.read_changes())
+        assert [(x["item_id"], x["op"]) for x in changes] == [
+            (self.items[0].id, ChangeOpEnum.INSERT),
+            (self.items[1].id, ChangeOpEnum.UPDATE),
+            (self.items[2].id, ChangeOpEnum.DELETE),
+        ]
+        assert changes[0]["item"]["title"] == "Gatta n. 0"
+        assert changes[1]["item"]["title"] == "Gattino"
+        assert changes[2]["item"] is None
+        assert [x["version"] for x in changes] == sorted(x["version"] for x in changes)
+        assert self.domain.get_version() == changes[-1]["version"]
+
+        changes = list(self.domain.read_changes(since=version))
+        assert [x["item_id"] for x in changes] == [self.items[1].id, self.items[2].id]
+
+    def test_one_version_per_update(self):
+        version = self.domain.get_version()
+        n_writes = CounterModel.get_value(ITEM_WRITES_COUNTER)
+        ItemModel.update(title="Gattino").where(
+            ItemModel.id == self.items[0].id
+        ).execute()
+        # Not a 2nd time for the UPDATE of updated_at made by its trigger.
+        assert self.domain.get_version() == version + 1
+        assert CounterModel.get_value(ITEM_WRITES_COUNTER) == n_writes + 1
+
+    def test_compact(self):
+        for title in ("Gattino", "Gattone", "Gattaccio"):
+            ItemModel.update(title=title).where(
+                ItemModel.id == self.items[0].id
+            ).execute()
+        assert ChangeModel.select().count() == 3
+        changes = list(self.domain.read_changes())
+        assert changes[-1]["item"]["title"] == "Gattaccio"
+
+    def test_batches(self, monkeypatch):
+        monkeypatch.setattr(settings, "CHANGE_JOURNAL_BATCH_SIZE", 2)
+        item = ItemModel.create(title="Gattino", lang=LangEnum.ITA)
+        changes = list(self.domain.read_changes())
+        assert [x["item_id"] for x in changes] == [x.id for x in self.items + [item]]
+
+    def test_disabled(self, monkeypatch):
+        monkeypatch.setattr(settings, "IS_CHANGE_JOURNAL_ENABLED", False)
+        ItemModel.delete().execute()
+        assert {x.op for x in ChangeModel.select()} == {ChangeOpEnum.INSERT}
+
+    def test_apply_changes(self, monkeypatch, tmp_path):
+        replica_path = tmp_path / "replica.sqlite3"
+        BackupDomain().backup(replica_path)
+        ItemModel.update(title="Gattino").where(
+            ItemModel.id == self.items[1].id
+        ).execute()
+        ItemModel.delete().where(ItemModel.id == self.items[2].id).execute()
+        # It reuses the id of the deleted item.
+        item = ItemModel.create(title="Cane", notes="coda", lang=LangEnum.ITA)
+        changes = list(self.domain.read_changes())
+        updated_at = ItemModel.get_by_id(self.items[1].id).updated_at
+
+        monkeypatch.setattr(settings, "DB_PATH", str(replica_path))
+        with peewee_utils.use_db(do_force_new_db_init=True):
+            assert self.domain.get_cursor() == 0
+            cursor = self.domain.apply_changes(changes)
+            assert cursor == changes[-1]["version"]
+            assert self.domain.get_cursor() == cursor
+            # Idempotent.
+            assert self.domain.apply_changes(changes[1:]) == cursor
+
+            assert [x.title for x in ItemModel.select().order_by(ItemModel.id)] == [
+                "Gatta n. 0",
+                "Gattino",
+                "Cane",
+            ]
+            assert ItemModel.get_by_id(self.items[1].id).updated_at == updated_at
+            # The FTS indexes are updated by the triggers.
+            assert [
+                x.rowid
+                for x in ItemFTSIndexIta.select().where(
+                    ItemFTSIndexIta.match("gattino OR cane")
+                )
+            ] == [self.items[1].id, item.id]
+            assert not list(
+                ItemFTSIndexIta.select().where(ItemFTSIndexIta.match("zampa AND 2"))
+            )
+
+    def test_apply_invalid_change(self):
+        with pytest.raises(InvalidChange):
+            self.domain.apply_changes([dict(version=1, op="X", item_id=1, item=None)])
+        with pytest.raises(InvalidChange):
+            self.domain.apply_changes([dict(version=1, op="U", item_id=1, item=None)])
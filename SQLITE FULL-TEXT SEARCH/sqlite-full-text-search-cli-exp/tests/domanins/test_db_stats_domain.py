@@ -0,0 +1,47 @@
+import json
+
+import pytest
+
+from fts_exp.data_models.db_models import ItemModel, LangEnum
+from fts_exp.domains.db_stats_domain import DbStatsDomain
+
+
+class TestDbStats:
+    @pytest.fixture(autouse=True)
+    def setup(self):
+        for i in range(50):
+            ItemModel.create(
+                title=f"Gatta n. {i}", notes="zampa " * 20, lang=LangEnum.ITA
+            )
+        ItemModel.create(title="Cat", notes="paw", lang=LangEnum.ENG)
+        self.stats = DbStatsDomain().get_stats()
+
+    def test_json_serializable(self):
+        assert json.loads(json.dumps(self.stats)) == self.stats
+
+    def test_db(self):
+        db = self.stats["db"]
+        assert db["bytes"] == db["page_size"] * db["page_count"]
+        assert db["page_count"] == sum(x["n_pages"] for x in self.stats["btrees"]) + (
+            db["freelist_count"]
+        )
+
+    def test_btrees(self):
+        btrees = {x["name"]: x for x in self.stats["btrees"]}
+        assert btrees["item"]["n_rows"] == 51
+        assert btrees["item"]["avg_row_bytes"] > 0
+        assert btrees["itemftsindexita_docsize"]["table"] == "itemftsindexita"
+        assert btrees["itemftsindexita_docsize"]["n_rows"] == 50
+        index = btrees["searchcacheentrymodel_last_used_at"]
+        assert (index["type"], index["table"]) == ("index", "searchcacheentry")
+
+    def test_fts5(self):
+        fts5 = {x["name"]: x for x in self.stats["fts5"]}
+        index = fts5["itemftsindexita"]
+        assert index["n_rows"] == 50
+        assert index["n_tokens"]["notes"] == 50 * 20
+        assert index["n_segments"] == sum(x["n_segments"] for x in index["levels"])
+        assert index["n_segments"] > 0
+
+    def test_langs(self):
+        assert self.stats["langs"] == {"ITA": 50, "ENG": 1}
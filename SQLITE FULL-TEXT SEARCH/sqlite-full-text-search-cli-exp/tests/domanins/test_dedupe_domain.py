@@ -0,0 +1,94 @@
+import pytest
+
+from fts_exp.conf import settings
+from fts_exp.data_models.db_models import (
+    ItemModel,
+    ItemSignatureModel,
+    LangEnum,
+    LshBandModel,
+)
+from fts_exp.domains.dedupe_domain import DedupeDomain, DuplicateItem
+from fts_exp.domains.item_domain import CreateItemSchema, ItemDomain
+
+TITLE = "Il primo titolo di papà: tanto va la gatta al lardo che ci lascia lo zampino"
+NOTES = (
+    "La prima nota è che il dente sta dal dentista diventato anche quello di mio zio"
+    " e che la zia dentistica al computer ha i denti sani come quelli del nonno"
+)
+
+
+def _create_item(title: str = TITLE, notes: str = NOTES) -> ItemModel:
+    return ItemDomain().create_item(
+        CreateItemSchema(title=title, notes=notes, lang=LangEnum.ITA)
+    )
+
+
+class TestDedupe:
+    @pytest.fixture(autouse=True)
+    def setup(self, monkeypatch):
+        monkeypatch.setattr(settings, "IS_DEDUPE_ENABLED", True)
+        self.domain = DedupeDomain()
+        self.item = _create_item()
+
+    def test_signature(self):
+        signature = self.domain.get_signature(TITLE, NOTES)
+        assert len(signature) == settings.DEDUPE_N_BANDS * settings.DEDUPE_BAND_SIZE
+        assert signature == self.domain.get_signature(TITLE.upper(), NOTES)
+        assert self.domain.get_signature("", None) is None
+        assert LshBandModel.select().count() == settings.DEDUPE_N_BANDS
+
+    def test_flag(self):
+        item = _create_item(notes=NOTES.replace("nonno", "bisnonno"))
+        signature = ItemSignatureModel.get_by_id(item.id)
+        assert signature.duplicate_of_id == self.item.id
+        assert signature.similarity >= settings.DEDUPE_THRESHOLD
+        assert [x.item_id for x in self.domain.get_duplicates(self.item.id)] == [
+            item.id
+        ]
+
+    def test_not_duplicate(self):
+        item = _create_item(
+            title="I secondi titoli del santo Papa: lardi ecumenici su zampette",
+            notes="I denti sani sono della zia dentistica",
+        )
+        assert ItemSignatureModel.get_by_id(item.id).duplicate_of_id is None
+
+    def test_reject(self, monkeypatch):
+        monkeypatch.setattr(settings, "DEDUPE_ACTION", "reject")
+        with pytest.raises(DuplicateItem):
+            _create_item(notes=NOTES.replace("nonno", "bisnonno"))
+        assert ItemModel.select().count() == 1
+
+    def test_bulk(self, monkeypatch):
+        monkeypatch.setattr(settings, "DEDUPE_ACTION", "reject")
+        new_row = ("Un titolo nuovo", "Con una nota sulla gatta e il suo zampino", "I")
+        rows = [new_row, (TITLE, NOTES, "I"), new_row, ("Another title", None, "E")]
+        item_ids = ItemDomain().create_items(rows)
+        # The duplicates of an existing item and of a previous row are rejected.
+        items = ItemModel.select().where(ItemModel.id.in_(list(item_ids)))
+        assert [x.title for x in items] == ["Un titolo nuovo", "Another title"]
+
+    def test_bulk_flag(self):
+        rows = [("Un titolo nuovo", "Sulla gatta", "I")] * 2
+        item_ids = ItemDomain().create_items(rows)
+        signature = ItemSignatureModel.get_by_id(item_ids[1])
+        assert (signature.duplicate_of_id, signature.similarity) == (item_ids[0], 1)
+
+    def test_after_update_and_delete(self):
+        ItemModel.update(notes="Altro").where(ItemModel.id == self.item.id).execute()
+        assert ItemSignatureModel.select().count() == 0
+        assert LshBandModel.select().count() == 0
+        item = _create_item()
+        assert ItemSignatureModel.get_by_id(item.id).duplicate_of_id is None
+
+        item.delete_instance()
+        assert ItemSignatureModel.select().count() == 0
+        assert LshBandModel.select().count() == 0
+
+    def test_disabled(self, monkeypatch):
+        monkeypatch.setattr(settings, "IS_DEDUPE_ENABLED", False)
+        item = _create_item()
+        assert (
+            ItemSignatureModel.get_or_none(ItemSignatureModel.item_id == item.id)
+            is None
+        )
@@ -0,0 +1,78 @@
+from fts_exp.data_models.db_models import (
+    ItemFTSIndexEng,
+    ItemFTSIndexIta,
+    ItemModel,
+    LangEnum,
+)
+from fts_exp.data_models.db_utils import get_db
+from fts_exp.data_models.fts5_utils import Fts5Level, Fts5Structure
+from fts_exp.domains.index_build_domain import IndexBuildDomain
+from fts_exp.domains.item_domain import ItemDomain
+
+
+def _integrity_check(index_table: str) -> None:
+    # It raises when the index is corrupted. Mind that it cannot be checked against
+    #  the content (rank 1), as the content view has the items of all the langs.
+    get_db().execute_sql(
+        f"INSERT INTO {index_table}({index_table}, rank) VALUES('integrity-check', 0);"
+    )
+
+
+def _get_structure(index_table: str) -> Fts5Structure:
+    block = (
+        get_db()
+        .execute_sql(f"SELECT block FROM {index_table}_data WHERE id = 10;")
+        .fetchone()[0]
+    )
+    return Fts5Structure.decode(block)
+
+
+class TestBuild:
+    def setup_method(self):
+        for i in range(1, 11):
+            ItemModel.create(
+                title=f"Gatta n. {i}", notes="La zampa nel lardo", lang=LangEnum.ITA
+            )
+            ItemModel.create(title=f"Cat n. {i}", notes="The paw", lang=LangEnum.ENG)
+
+    def test_build(self):
+        expected = ItemDomain().search_items("gatta zampa", LangEnum.ITA)
+        assert IndexBuildDomain(LangEnum.ITA).build(n_workers=3) == 10
+        _integrity_check(ItemFTSIndexIta._meta.table_name)
+        assert (
+            len(_get_structure(ItemFTSIndexIta._meta.table_name).levels[-1].segments)
+            == 3
+        )
+        results = ItemDomain().search_items("gatta zampa", LangEnum.ITA)
+        assert [(x.rowid, x.score, x.notes_s) for x in results] == [
+            (x.rowid, x.score, x.notes_s) for x in expected
+        ]
+
+    def test_build_then_write(self):
+        IndexBuildDomain(LangEnum.ENG).build(n_workers=2)
+        ItemModel.create(title="Black cat", notes="", lang=LangEnum.ENG)
+        ItemModel.get(ItemModel.title == "Cat n. 1").delete_instance()
+        _integrity_check(ItemFTSIndexEng._meta.table_name)
+        results = ItemDomain().search_items("cat", LangEnum.ENG)
+        assert len(results) == 10
+
+    def test_more_workers_than_items(self):
+        ItemModel.delete().where(
+            (ItemModel.lang == LangEnum.ITA) & (ItemModel.id > 3)
+        ).execute()
+        assert IndexBuildDomain(LangEnum.ITA).build(n_workers=8) == 2
+        _integrity_check(ItemFTSIndexIta._meta.table_name)
+
+
+class TestStructure:
+    def test_roundtrip(self):
+        structure = Fts5Structure(
+            cookie=b"\x00\x00\x00\x07",
+            write_counter=300,
+            levels=[
+                Fts5Level(0, [(1, 1, 200)]),
+                Fts5Level(),
+                Fts5Level(2, [(2, 1, 1), (3, 1, 70000)]),
+            ],
+        )
+        assert Fts5Structure.decode(structure.encode()) == structure
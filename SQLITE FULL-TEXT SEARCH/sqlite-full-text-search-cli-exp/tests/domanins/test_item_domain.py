@@ -1,11 +1,27 @@
 from typing import Sequence
 
+import pytest
+
 from fts_exp.conf import settings
+from fts_exp.data_models import db_utils
+from fts_exp.data_models.db_fixtures.generated_data_db_fixture import generate_items
 from fts_exp.data_models.db_models import (
     ItemModel,
     LangEnum,
+    PassageModel,
+)
+from fts_exp.domains.item_domain import (
+    DEFERRED_INDEX_CLASSES,
+    CreateItemSchema,
+    InvalidBulkWrite,
+    InvalidItems,
+    ItemDomain,
+    ItemNotFound,
+    SearchModeEnum,
+    SubstringModeNotEnabled,
+    UpdateItemsSchema,
 )
-from fts_exp.domains.item_domain import CreateItemSchema, ItemDomain
+from fts_exp.domains.query_compiler import InvalidSearchQuery
 
 TEST_DATA_ENG = [
     dict(
@@ -70,6 +86,69 @@ class TestCreateItem:
             assert item.notes == TEST_DATA[i]["notes"]
 
 
+class TestCreateItems:
+    def setup_method(self):
+        self.domain = ItemDomain()
+
+    def test_happy_flow(self):
+        rows = [(x["title"], x["notes"], x["lang"]) for x in TEST_DATA]
+        item_ids = self.domain.create_items(iter(rows), chunk_size=3)
+        assert item_ids == range(1, len(TEST_DATA) + 1)
+        items = ItemModel.select().order_by(ItemModel.id)
+        assert [(x.title, x.notes, x.lang) for x in items] == rows
+        # The same timestamp for a chunk.
+        assert items[0].created_at == items[2].created_at
+        results = self.domain.search_items("zampe*", LangEnum.ITA)
+        assert {x.rowid for x in results} == {3, 4}
+
+    def test_after_existing_items(self):
+        ItemModel.create(title="Existing", notes=None, lang=LangEnum.ENG)
+        item_ids = self.domain.create_items([("New", "Notes", "E")] * 2)
+        assert item_ids == range(2, 4)
+
+    def test_empty(self):
+        assert len(self.domain.create_items([])) == 0
+
+    def test_defer_indexing(self, monkeypatch):
+        monkeypatch.setattr(settings, "IS_SUBSTRING_MODE_ENABLED", True)
+        ItemModel.create(title="Existing", notes=None, lang=LangEnum.ITA)
+        item_ids = self.domain.create_items(
+            generate_items(10, seed=1), chunk_size=3, do_defer_indexing=True
+        )
+        assert item_ids == range(2, 12)
+        results = self.domain.search_items("existing", LangEnum.ITA)
+        assert [x.rowid for x in results] == [1]
+        # The triggers are created again.
+        item = ItemModel.create(title="Gatta", notes=None, lang=LangEnum.ITA)
+        results = self.domain.search_items("gatt", LangEnum.ITA, mode="substring")
+        assert item.id in {x.rowid for x in results}
+        for index_class in DEFERRED_INDEX_CLASSES:
+            table = index_class._meta.table_name
+            db_utils.get_db().execute_sql(
+                f"INSERT INTO {table}({table}) VALUES('integrity-check');"
+            )
+            # A count(*) on an external-content index would count its content (all langs).
+            n_indexed = db_utils.get_db().execute_sql(
+                f"SELECT count(*) FROM {table}_docsize;"
+            )
+            n_items = ItemModel.select().where(ItemModel.lang == index_class._LANG)
+            assert n_indexed.fetchone()[0] == n_items.count()
+
+    @pytest.mark.parametrize(
+        "rows",
+        [
+            [("Title", None, LangEnum.ITA), ("Title", None, "X")],
+            [("Title", None, LangEnum.ITA), ("Title", None)],
+            [(None, None, LangEnum.ITA)],
+            [("Title", 1, LangEnum.ITA)],
+        ],
+    )
+    def test_invalid(self, rows):
+        with pytest.raises(InvalidItems):
+            self.domain.create_items(rows)
+        assert ItemModel.select().count() == 0
+
+
 class TestReadAllItems:
     def setup_method(self):
         self.items = [x for x in _create_items(TEST_DATA)]
@@ -79,6 +158,82 @@ class TestReadAllItems:
         assert items.count() == len(TEST_DATA)
 
 
+class TestUpdateItems:
+    def setup_method(self):
+        self.items = [x for x in _create_items(TEST_DATA)]
+        self.domain = ItemDomain()
+
+    def test_by_ids(self):
+        stats = self.domain.update_items(
+            UpdateItemsSchema(title="Archaeology"), item_ids=[1, 3, 99], chunk_size=1
+        )
+        assert stats["n_items"] == 2
+        assert [x.title for x in ItemModel.select().order_by(ItemModel.id)] == [
+            "Archaeology",
+            TEST_DATA[1]["title"],
+            "Archaeology",
+            TEST_DATA[3]["title"],
+        ]
+        # The FTS indexes are updated by the triggers.
+        results = self.domain.search_items("archaeology", LangEnum.ITA)
+        assert [x.rowid for x in results] == [3]
+
+    def test_by_filters(self):
+        n_chunks = []
+        stats = self.domain.update_items(
+            UpdateItemsSchema(lang=LangEnum.ENG),
+            lang=LangEnum.ITA,
+            chunk_size=1,
+            on_chunk_fn=n_chunks.append,
+        )
+        assert stats["n_items"] == 2
+        assert n_chunks == [1, 2, 2]
+        assert ItemModel.select().where(ItemModel.lang == LangEnum.ENG).count() == 4
+        results = self.domain.search_items("zampino", LangEnum.ENG)
+        assert [x.rowid for x in results] == [3]
+
+    def test_no_fields(self):
+        with pytest.raises(InvalidBulkWrite):
+            self.domain.update_items(UpdateItemsSchema(), item_ids=[1])
+
+    @pytest.mark.parametrize("chunk_size", [0, -1])
+    def test_invalid_chunk_size(self, chunk_size):
+        with pytest.raises(InvalidBulkWrite):
+            self.domain.update_items(
+                UpdateItemsSchema(title="Archaeology"),
+                do_all=True,
+                chunk_size=chunk_size,
+            )
+        assert ItemModel.select().where(ItemModel.title == "Archaeology").count() == 0
+
+    def test_no_selection(self):
+        with pytest.raises(InvalidBulkWrite):
+            self.domain.update_items(UpdateItemsSchema(title="Archaeology"))
+        stats = self.domain.update_items(
+            UpdateItemsSchema(title="Archaeology"), do_all=True
+        )
+        assert stats["n_items"] == 4
+
+
+class TestDeleteItems:
+    def setup_method(self):
+        self.items = [x for x in _create_items(TEST_DATA)]
+        self.domain = ItemDomain()
+
+    def test_by_ids_and_filters(self):
+        stats = self.domain.delete_items(item_ids=[1, 2, 3], lang=LangEnum.ITA)
+        assert stats["n_items"] == 1
+        assert [x.id for x in ItemModel.select().order_by(ItemModel.id)] == [1, 2, 4]
+        results = self.domain.search_items("zampe*", LangEnum.ITA)
+        assert [x.rowid for x in results] == [4]
+
+    def test_all(self):
+        stats = self.domain.delete_items(do_all=True, chunk_size=3)
+        assert stats["n_items"] == 4
+        assert ItemModel.select().count() == 0
+        assert len(self.domain.search_items("zampe*", LangEnum.ITA)) == 0
+
+
 class TestSearchItems:
     # Light testing the actual full-text search feature as it is heavily tested in
     #  test_db_models_search.py.
@@ -116,3 +271,242 @@ class TestSearchItems:
         assert results[0].notes_s == _highlight_token(
             TEST_DATA[2]["notes"], "diventato"
         )
+
+
+class TestSearchItemsQueryBudget:
+    def setup_method(self):
+        self.domain = ItemDomain()
+        self.items = [x for x in _create_items(TEST_DATA)]
+
+    def test_within_budget(self):
+        results = self.domain.search_items("first", LangEnum.ENG, time_budget_ms=5000)
+        assert len(results) == 2
+
+    def test_vm_steps_budget_exceeded(self, monkeypatch):
+        monkeypatch.setattr(settings, "SQLITE_PROGRESS_HANDLER_N_STEPS", 1)
+        count = db_utils.get_aborted_queries_count()
+        with pytest.raises(db_utils.QueryBudgetExceeded):
+            self.domain.search_items("first", LangEnum.ENG, vm_steps_budget=1)
+        assert db_utils.get_aborted_queries_count() == count + 1
+
+    def test_no_budget(self, monkeypatch):
+        monkeypatch.setattr(settings, "SQLITE_PROGRESS_HANDLER_N_STEPS", 1)
+        results = self.domain.search_items(
+            "first", LangEnum.ENG, time_budget_ms=0, vm_steps_budget=0
+        )
+        assert len(results) == 2
+
+
+class TestSearchItemsStats:
+    def setup_method(self):
+        self.domain = ItemDomain()
+        self.items = [x for x in _create_items(TEST_DATA)]
+
+    def test_phases(self, monkeypatch):
+        monkeypatch.setattr(settings, "SQLITE_SEARCH_PAGE_SIZE", 1)
+        results = self.domain.search_items("first", LangEnum.ENG, do_collect_stats=True)
+        stats = results.stats
+        assert list(stats["phases"]) == [
+            "compile",
+            "match",
+            "rank",
+            "content",
+            "snippet",
+        ]
+        assert (stats["n_matched"], stats["n_returned"]) == (2, 1)
+        assert stats["duration_ms"] == sum(
+            x["duration_ms"] for x in stats["phases"].values()
+        )
+        assert stats["n_cache_hits"] + stats["n_cache_misses"] > 0
+
+    def test_same_results(self):
+        results = self.domain.search_items("first", LangEnum.ENG, do_collect_stats=True)
+        assert [x.rowid for x in results] == [
+            x.rowid for x in self.domain.search_items("first", LangEnum.ENG)
+        ]
+
+    def test_suggestions(self):
+        results = self.domain.search_items("firts", LangEnum.ENG, do_collect_stats=True)
+        assert "suggestions" in results.stats["phases"]
+
+    def test_passage(self, monkeypatch):
+        monkeypatch.setattr(settings, "IS_PASSAGE_MODE_ENABLED", True)
+        ItemModel.create(title="My first passage", notes="", lang=LangEnum.ENG)
+        results = self.domain.search_items(
+            "passage", LangEnum.ENG, mode=SearchModeEnum.PASSAGE, do_collect_stats=True
+        )
+        assert list(results.stats["phases"]) == ["compile", "query"]
+        assert results.stats["n_matched"] is None
+        assert results.stats["n_returned"] == 1
+
+    def test_disabled(self):
+        assert self.domain.search_items("first", LangEnum.ENG).stats is None
+
+
+class TestSearchItemsSubstring:
+    @pytest.fixture(autouse=True)
+    def setup(self, monkeypatch):
+        monkeypatch.setattr(settings, "IS_SUBSTRING_MODE_ENABLED", True)
+        self.domain = ItemDomain()
+        self.items = [x for x in _create_items(TEST_DATA)]
+
+    def test_ita_zamp(self):
+        results = self.domain.search_items(
+            "zamp", LangEnum.ITA, mode=SearchModeEnum.SUBSTRING
+        )
+        assert len(results) == 2
+        assert {x.rowid for x in results} == {3, 4}
+
+    def test_eng_substring_across_words(self):
+        results = self.domain.search_items(
+            "rst tit", LangEnum.ENG, mode=SearchModeEnum.SUBSTRING
+        )
+        assert len(results) == 1
+        assert results[0].rowid == 1
+
+    def test_other_lang(self):
+        results = self.domain.search_items(
+            "zamp", LangEnum.ENG, mode=SearchModeEnum.SUBSTRING
+        )
+        assert len(results) == 0
+
+    def test_after_update(self):
+        item = self.items[2]
+        item.title = "Un titolo nuovo"
+        item.save()
+        results = self.domain.search_items(
+            "zamp", LangEnum.ITA, mode=SearchModeEnum.SUBSTRING
+        )
+        assert [x.rowid for x in results] == [4]
+
+    def test_too_short(self):
+        with pytest.raises(InvalidSearchQuery):
+            self.domain.search_items("za", LangEnum.ITA, mode=SearchModeEnum.SUBSTRING)
+
+    def test_disabled(self, monkeypatch):
+        monkeypatch.setattr(settings, "IS_SUBSTRING_MODE_ENABLED", False)
+        item = ItemModel.create(title="Zampognaro", notes=None, lang=LangEnum.ITA)
+        self.domain.create_items(
+            [("Zampillo", None, LangEnum.ITA)], do_defer_indexing=True
+        )
+        item.delete_instance()
+        with pytest.raises(SubstringModeNotEnabled):
+            self.domain.search_items(
+                "zamp", LangEnum.ITA, mode=SearchModeEnum.SUBSTRING
+            )
+
+        # The trigram index is left as it was.
+        monkeypatch.setattr(settings, "IS_SUBSTRING_MODE_ENABLED", True)
+        results = self.domain.search_items(
+            "zamp", LangEnum.ITA, mode=SearchModeEnum.SUBSTRING
+        )
+        assert {x.rowid for x in results} == {3, 4}
+
+
+class TestSearchItemsPassage:
+    @pytest.fixture(autouse=True)
+    def setup(self, monkeypatch):
+        monkeypatch.setattr(settings, "IS_PASSAGE_MODE_ENABLED", True)
+        self.domain = ItemDomain()
+        self.items = [x for x in _create_items(TEST_DATA)]
+
+    def test_eng_first(self):
+        results = self.domain.search_items(
+            "first", LangEnum.ENG, mode=SearchModeEnum.PASSAGE
+        )
+        assert {x.rowid for x in results} == {1, 2}
+
+    def test_ita_zampeSTAR(self):
+        results = self.domain.search_items(
+            "zampe*", LangEnum.ITA, mode=SearchModeEnum.PASSAGE
+        )
+        assert {x.rowid for x in results} == {3, 4}
+
+    def test_long_notes(self, monkeypatch):
+        monkeypatch.setattr(settings, "PASSAGE_SIZE_N_WORDS", 10)
+        monkeypatch.setattr(settings, "PASSAGE_OVERLAP_N_WORDS", 2)
+        notes = " ".join(["filler"] * 100 + ["archaeology"] + ["filler"] * 100)
+        item = ItemModel.create(title="A long one", notes=notes, lang=LangEnum.ENG)
+        assert (
+            PassageModel.select().where(PassageModel.item_id == item.id).count() == 25
+        )
+
+        results = self.domain.search_items(
+            "archaeology", LangEnum.ENG, mode=SearchModeEnum.PASSAGE
+        )
+        assert {x.rowid for x in results} == {2, item.id}
+        # The snippet is taken from the passage, not from the whole notes.
+        result = [x for x in results if x.rowid == item.id][0]
+        assert result.notes_s.count("filler") < 10
+        assert "<<archaeology>>" in result.notes_s
+
+    def test_after_update_and_delete(self):
+        item = self.items[2]
+        item.title = "Un titolo nuovo"
+        item.save()
+        results = self.domain.search_items(
+            "zampe*", LangEnum.ITA, mode=SearchModeEnum.PASSAGE
+        )
+        assert [x.rowid for x in results] == [4]
+
+        self.items[3].delete_instance()
+        results = self.domain.search_items(
+            "zampe*", LangEnum.ITA, mode=SearchModeEnum.PASSAGE
+        )
+        assert len(results) == 0
+        assert PassageModel.select().where(PassageModel.item_id == 4).count() == 0
+
+    def test_disabled(self, monkeypatch):
+        monkeypatch.setattr(settings, "IS_PASSAGE_MODE_ENABLED", False)
+        ItemModel.create(title="Archaeology", notes="", lang=LangEnum.ENG)
+        results = self.domain.search_items(
+            "archaeology", LangEnum.ENG, mode=SearchModeEnum.PASSAGE
+        )
+        assert [x.rowid for x in results] == [2]
+
+
+class TestSimilarItems:
+    def setup_method(self):
+        ItemDomain.clear_similar_cache()
+        self.domain = ItemDomain()
+        self.items = [x for x in _create_items(TEST_DATA)]
+        self.duplicate = ItemModel.create(
+            title="My first books were about dentistry and leadership",
+            notes="My first note is a lead to archaeological things in a computer",
+            lang=LangEnum.ENG,
+        )
+        self.unrelated = ItemModel.create(
+            title="Gardening tips", notes="Tomatoes need sun", lang=LangEnum.ENG
+        )
+
+    def test_happy_flow(self):
+        results = self.domain.similar_items(self.items[1].id)
+        # Never the item itself, nor the items in other langs or with no common terms.
+        assert [x.id for x in results] == [self.duplicate.id, self.items[0].id]
+        assert 0.8 < results[0].score <= 1
+        assert results[0].score > results[1].score > 0
+
+    def test_k(self):
+        results = self.domain.similar_items(self.items[1].id, k=1)
+        assert [x.id for x in results] == [self.duplicate.id]
+
+    def test_no_common_terms(self):
+        assert self.domain.similar_items(self.unrelated.id) == []
+
+    def test_truncated_postings(self, monkeypatch):
+        assert len(self.domain.similar_items(self.items[0].id)) == 2
+        monkeypatch.setattr(settings, "SIMILAR_MAX_TERM_POSTINGS", 1)
+        # The postings of each term are truncated to its first occurrence, which is
+        #  in the item itself, the oldest.
+        assert self.domain.similar_items(self.items[0].id) == []
+
+    def test_after_update(self):
+        self.duplicate.title = "Gardening"
+        self.duplicate.notes = "Tomatoes"
+        self.duplicate.save()
+        results = self.domain.similar_items(self.items[1].id)
+        assert [x.id for x in results] == [self.items[0].id]
+
+    def test_not_found(self):
+        with pytest.raises(ItemNotFound):
+            self.domain.similar_items(999)
@@ -0,0 +1,157 @@
+import pytest
+
+from fts_exp.conf import settings
+from fts_exp.data_models.db_models import ItemModel, LangEnum
+from fts_exp.domains.item_domain import ItemDomain
+from fts_exp.domains.query_compiler import (
+    And,
+    Column,
+    InvalidSearchQuery,
+    Near,
+    Or,
+    Phrase,
+    Term,
+    compile_query,
+    parse_query,
+)
+
+
+class TestParseQuery:
+    def test_implicit_and(self):
+        assert parse_query("Zampa dente") == And((Term("zampa"), Term("dente")))
+
+    def test_phrase(self):
+        assert parse_query('"la Gatta"') == Phrase(("la", "gatta"))
+
+    def test_column_filter(self):
+        assert parse_query("title:zampa") == Column("title", Term("zampa"))
+
+    def test_near(self):
+        assert parse_query("NEAR(gatta lardo, 5)") == Near(
+            (Term("gatta"), Term("lardo")), 5
+        )
+
+
+class TestCompileQuery:
+    def setup_method(self):
+        compile_query.cache_clear()
+
+    def test_term(self):
+        assert compile_query("dente") == '"dente"'
+
+    def test_prefix(self):
+        assert compile_query("zampe*") == '"zampe"*'
+
+    def test_short_prefix_is_exact(self):
+        assert compile_query("za*") == '"za"'
+
+    def test_leading_wildcard_is_dropped(self):
+        assert compile_query("*ampe") == '"ampe"'
+
+    def test_operators(self):
+        assert (
+            compile_query("gatta OR lardo NOT zio") == '"gatta" OR ("lardo" NOT "zio")'
+        )
+
+    def test_column_with_group(self):
+        assert (
+            compile_query("notes:(dente OR zio) papà")
+            == 'notes:("dente" OR "zio") AND "papà"'
+        )
+
+    def test_nested_column_keeps_the_innermost(self):
+        assert compile_query("notes:title:gatta") == 'title:"gatta"'
+
+    def test_near_distance_is_capped(self):
+        assert (
+            compile_query("NEAR(gatta lardo, 1000)")
+            == f'NEAR("gatta" "lardo", {settings.SQLITE_SEARCH_MAX_NEAR_DISTANCE})'
+        )
+
+    def test_stray_quote(self):
+        assert compile_query('la "gatta al') == '"la" AND "gatta al"'
+
+    def test_stray_operators_and_parens(self):
+        assert compile_query("OR gatta AND ) lardo (") == '"gatta" AND "lardo"'
+
+    def test_punctuation(self):
+        assert compile_query("papà: zampa-ino") == '"papà" AND "zampa ino"'
+
+    def test_empty(self):
+        with pytest.raises(InvalidSearchQuery):
+            compile_query(' "" * AND ')
+
+    def test_too_many_terms(self):
+        text = " OR ".join(f"term{i}" for i in range(100))
+        with pytest.raises(InvalidSearchQuery):
+            compile_query(text)
+
+    def test_memoization(self):
+        compile_query("dente")
+        compile_query("dente")
+        assert compile_query.cache_info().hits == 1
+
+
+class TestCompileQueryStopwords:
+    def setup_method(self):
+        compile_query.cache_clear()
+
+    def test_stopwords_are_removed(self):
+        assert compile_query("la gatta di papà", LangEnum.ITA) == '"gatta" AND "papà"'
+        assert compile_query("the first of my books", LangEnum.ENG) == (
+            '"first" AND "books"'
+        )
+
+    def test_no_lang(self):
+        assert compile_query("la gatta") == '"la" AND "gatta"'
+
+    def test_only_stopwords_are_kept(self):
+        assert compile_query("di la", LangEnum.ITA) == '"di" AND "la"'
+
+    def test_phrase_is_untouched(self):
+        assert compile_query('"la gatta" di', LangEnum.ITA) == '"la gatta"'
+
+    def test_or_operand_is_kept(self):
+        assert compile_query("la OR gatta", LangEnum.ITA) == '"la" OR "gatta"'
+
+    def test_column(self):
+        assert compile_query("title:the books", LangEnum.ENG) == '"books"'
+
+    def test_near(self):
+        assert parse_query("NEAR(gatta la lardo)") == Near(
+            (Term("gatta"), Term("la"), Term("lardo"))
+        )
+        assert compile_query("NEAR(gatta la lardo)", LangEnum.ITA) == (
+            'NEAR("gatta" "lardo", 10)'
+        )
+
+    def test_or_of_ands(self):
+        assert parse_query("(la gatta) OR dente") == Or(
+            (And((Term("la"), Term("gatta"))), Term("dente"))
+        )
+        assert compile_query("(la gatta) OR dente", LangEnum.ITA) == (
+            '"gatta" OR "dente"'
+        )
+
+
+class TestSearchItemsWithCompiledQuery:
+    def setup_method(self):
+        self.domain = ItemDomain()
+        ItemModel.create(
+            title="My first books", notes='A "quoted" note', lang=LangEnum.ENG
+        )
+
+    def test_stray_quote(self):
+        results = self.domain.search_items('"quoted', LangEnum.ENG)
+        assert len(results) == 1
+
+    def test_column_filter(self):
+        assert len(self.domain.search_items("title:books", LangEnum.ENG)) == 1
+        assert len(self.domain.search_items("notes:books", LangEnum.ENG)) == 0
+
+    def test_nested_column_filter(self):
+        assert len(self.domain.search_items("notes:title:books", LangEnum.ENG)) == 1
+        assert len(self.domain.search_items("title:notes:books", LangEnum.ENG)) == 0
+
+    def test_stopwords(self):
+        assert len(self.domain.search_items("the first of my books", LangEnum.ENG)) == 1
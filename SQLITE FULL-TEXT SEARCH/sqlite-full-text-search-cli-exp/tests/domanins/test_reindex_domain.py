@@ -0,0 +1,97 @@
+import pytest
+
+from fts_exp.data_models.db_models import (
+    ItemFTSIndexIta,
+    ItemModel,
+    LangEnum,
+    ReindexCheckpointModel,
+)
+from fts_exp.data_models.db_utils import get_db
+from fts_exp.domains.item_domain import ItemDomain
+from fts_exp.domains.reindex_domain import (
+    IndexKindEnum,
+    ReindexDomain,
+    ReindexInProgress,
+)
+
+# Unlike the live one, it removes the diacritics.
+TOKENIZE = "porter unicode61 remove_diacritics 2"
+
+
+def _get_index_sql(table_name: str) -> str | None:
+    row = (
+        get_db()
+        .execute_sql("SELECT sql FROM sqlite_master WHERE name = ?;", (table_name,))
+        .fetchone()
+    )
+    return row[0] if row else None
+
+
+class TestReindex:
+    def setup_method(self):
+        self.domain = ReindexDomain(IndexKindEnum.WORD, LangEnum.ITA)
+        self.search_domain = ItemDomain()
+        for i in range(5):
+            ItemModel.create(title=f"Il signor Müller {i}", notes="", lang=LangEnum.ITA)
+        ItemModel.create(title="Mister Müller", notes="", lang=LangEnum.ENG)
+
+    def _search(self, text: str) -> set[int]:
+        return {x.rowid for x in self.search_domain.search_items(text, LangEnum.ITA)}
+
+    def test_happy_flow(self):
+        assert self._search("muller") == set()
+        self.domain.reindex(TOKENIZE, chunk_size=2)
+        assert self._search("muller") == {1, 2, 3, 4, 5}
+        assert "remove_diacritics 2" in _get_index_sql("itemftsindexita")
+        assert _get_index_sql("itemftsindexita_shadow") is None
+        assert ReindexCheckpointModel.select().count() == 0
+
+    def test_live_triggers_after_swap(self):
+        self.domain.reindex(TOKENIZE)
+        item = ItemModel.create(title="Un altro Müller", notes="", lang=LangEnum.ITA)
+        assert self._search("muller") == {1, 2, 3, 4, 5, item.id}
+        item.delete_instance()
+        assert self._search("muller") == {1, 2, 3, 4, 5}
+
+    def test_writes_during_the_build(self):
+        self.domain.start(TOKENIZE)
+        assert self.domain.build_chunk(2) == 2
+        # Searches still use the live index.
+        assert self._search("muller") == set()
+
+        # Written items: before and after the checkpoint.
+        ItemModel.update(title="Tazza").where(ItemModel.id == 1).execute()
+        ItemModel.update(title="Tazza").where(ItemModel.id == 4).execute()
+        ItemModel.get_by_id(2).delete_instance()
+        new_item = ItemModel.create(title="Nuovo Müller", notes="", lang=LangEnum.ITA)
+        ItemModel.update(lang=LangEnum.ITA).where(ItemModel.id == 6).execute()
+
+        self.domain.swap()
+        assert self._search("muller") == {3, 5, 6, new_item.id}
+        assert self._search("tazza") == {1, 4}
+        assert (
+            ItemFTSIndexIta.select().where(ItemFTSIndexIta.match("muller")).count() == 4
+        )
+
+    def test_resume(self):
+        self.domain.start(TOKENIZE)
+        self.domain.build_chunk(2)
+        # Eg. the process was killed and restarted.
+        domain = ReindexDomain(IndexKindEnum.WORD, LangEnum.ITA)
+        assert domain.start().last_item_id == 2
+        domain.reindex(chunk_size=2)
+        assert self._search("muller") == {1, 2, 3, 4, 5}
+
+    def test_in_progress_with_other_options(self):
+        self.domain.start(TOKENIZE)
+        with pytest.raises(ReindexInProgress):
+            self.domain.start("unicode61")
+
+    def test_abort(self):
+        self.domain.start(TOKENIZE)
+        self.domain.build_chunk(2)
+        self.domain.abort()
+        assert _get_index_sql("itemftsindexita_shadow") is None
+        assert ReindexCheckpointModel.select().count() == 0
+        # Writes still work.
+        ItemModel.create(title="Müller", notes="", lang=LangEnum.ITA)
@@ -0,0 +1,98 @@
+import pytest
+
+from fts_exp.conf import settings
+from fts_exp.data_models.db_models import (
+    ITEM_WRITES_COUNTER,
+    CounterModel,
+    ItemModel,
+    LangEnum,
+    SearchCacheEntryModel,
+)
+from fts_exp.domains import search_cache_domain
+from fts_exp.domains.item_domain import ItemDomain
+from fts_exp.domains.search_cache_domain import (
+    SEARCH_CACHE_HITS_COUNTER,
+    SEARCH_CACHE_MISSES_COUNTER,
+    SearchCacheDomain,
+)
+
+
+class TestItemWritesCounter:
+    def test_triggers(self):
+        assert CounterModel.get_value(ITEM_WRITES_COUNTER) == 0
+        item = ItemModel.create(title="My first title", lang=LangEnum.ENG)
+        assert CounterModel.get_value(ITEM_WRITES_COUNTER) == 1
+        item.title = "My second title"
+        item.save()
+        assert CounterModel.get_value(ITEM_WRITES_COUNTER) > 1
+        value = CounterModel.get_value(ITEM_WRITES_COUNTER)
+        item.delete_instance()
+        assert CounterModel.get_value(ITEM_WRITES_COUNTER) == value + 1
+
+
+class TestSearchItemsWithCache:
+    @pytest.fixture(autouse=True)
+    def setup(self, monkeypatch):
+        monkeypatch.setattr(search_cache_domain, "_counts", {})
+        self.domain = ItemDomain()
+        self.cache = SearchCacheDomain()
+        ItemModel.create(title="My first title", notes="My note", lang=LangEnum.ENG)
+
+    def test_hit(self):
+        results = self.domain.search_items("first", LangEnum.ENG, do_use_cache=True)
+        assert self.cache.get_stats()["misses"] == 1
+        cached_results = self.domain.search_items(
+            "first", LangEnum.ENG, do_use_cache=True
+        )
+        assert self.cache.get_stats()["hits"] == 1
+        assert len(cached_results) == len(results) == 1
+        assert cached_results[0].rowid == results[0].rowid
+        assert cached_results[0].title_s == results[0].title_s
+
+    def test_invalidation_on_write(self):
+        self.domain.search_items("first", LangEnum.ENG, do_use_cache=True)
+        ItemModel.create(title="My first book", lang=LangEnum.ENG)
+        results = self.domain.search_items("first", LangEnum.ENG, do_use_cache=True)
+        assert len(results) == 2
+        assert self.cache.get_stats()["hits"] == 0
+        assert self.cache.get_stats()["misses"] == 2
+
+    def test_lru_eviction(self, monkeypatch):
+        monkeypatch.setattr(settings, "SEARCH_CACHE_MAX_ENTRIES", 2)
+        for text in ("first", "title", "note"):
+            self.domain.search_items(text, LangEnum.ENG, do_use_cache=True)
+        assert SearchCacheEntryModel.select().count() == 2
+        # The LRU entry ("first") was evicted.
+        self.domain.search_items("first", LangEnum.ENG, do_use_cache=True)
+        assert self.cache.get_stats()["hits"] == 0
+
+    def test_clear(self):
+        self.domain.search_items("first", LangEnum.ENG, do_use_cache=True)
+        self.cache.clear()
+        assert self.cache.get_stats() == dict(
+            entries=0, max_entries=settings.SEARCH_CACHE_MAX_ENTRIES, hits=0, misses=0
+        )
+
+    def test_counters_batch(self, monkeypatch):
+        monkeypatch.setattr(settings, "SEARCH_CACHE_COUNTERS_BATCH_SIZE", 3)
+        for _ in range(2):
+            self.domain.search_items("first", LangEnum.ENG, do_use_cache=True)
+        # Counted in memory only.
+        assert CounterModel.get_value(SEARCH_CACHE_HITS_COUNTER) == 0
+        assert self.cache.get_stats()["hits"] == self.cache.get_stats()["misses"] == 1
+        self.domain.search_items("first", LangEnum.ENG, do_use_cache=True)
+        assert CounterModel.get_value(SEARCH_CACHE_HITS_COUNTER) == 2
+        assert CounterModel.get_value(SEARCH_CACHE_MISSES_COUNTER) == 1
+        self.domain.search_items("first", LangEnum.ENG, do_use_cache=True)
+        assert self.cache.flush() == 1
+        assert CounterModel.get_value(SEARCH_CACHE_HITS_COUNTER) == 3
+
+    def test_last_used_at(self, monkeypatch):
+        self.domain.search_items("first", LangEnum.ENG, do_use_cache=True)
+        last_used_at = SearchCacheEntryModel.get().last_used_at
+        # Not written on a hit within the resolution.
+        self.domain.search_items("first", LangEnum.ENG, do_use_cache=True)
+        assert SearchCacheEntryModel.get().last_used_at == last_used_at
+        monkeypatch.setattr(settings, "SEARCH_CACHE_LAST_USED_AT_RESOLUTION_S", 0)
+        self.domain.search_items("first", LangEnum.ENG, do_use_cache=True)
+        assert SearchCacheEntryModel.get().last_used_at > last_used_at
@@ -0,0 +1,123 @@
+import sqlite3
+
+import pytest
+
+from fts_exp.conf import settings
+from fts_exp.data_models.db_models import (
+    ITEM_WRITES_COUNTER,
+    CounterModel,
+    ItemModel,
+    LangEnum,
+    ShardModel,
+)
+from fts_exp.domains.item_domain import CreateItemSchema, ItemDomain, SearchModeEnum
+from fts_exp.domains.shard_domain import (
+    InvalidShardsNumber,
+    ShardDomain,
+    _get_connection,
+    get_shard_number,
+)
+
+
+class TestShards:
+    @pytest.fixture(autouse=True)
+    def setup(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(settings, "SHARDS_DIR", str(tmp_path))
+        # The trigram indexes are sharded too.
+        monkeypatch.setattr(settings, "IS_SUBSTRING_MODE_ENABLED", True)
+        self.tmp_path = tmp_path
+        self.domain = ShardDomain()
+        self.item_domain = ItemDomain()
+        for i in range(1, 6):
+            ItemModel.create(title=f"Gatta n. {i}", notes="zampa", lang=LangEnum.ITA)
+
+    def test_reshard(self):
+        assert self.domain.reshard(n_shards=2) == {0: 2, 1: 3}
+        assert ItemModel.select().count() == 0
+        assert [x.number for x in ShardModel.select()] == [0, 1]
+        assert len(list(self.tmp_path.glob("*-shard-*-of-2.sqlite3"))) == 2
+
+    def test_reshard_again(self):
+        self.domain.reshard(n_shards=2)
+        assert self.domain.reshard(n_shards=3) == {0: 1, 1: 2, 2: 2}
+        assert [x.name for x in self.tmp_path.iterdir() if "-of-2" in x.name] == []
+        assert {x.id for x in self.item_domain.read_items()} == {1, 2, 3, 4, 5}
+
+    def test_reshard_same_n(self):
+        self.domain.reshard(n_shards=2)
+        with pytest.raises(InvalidShardsNumber):
+            self.domain.reshard(n_shards=2)
+
+    def test_create_item(self):
+        self.domain.reshard(n_shards=2)
+        item = self.item_domain.create_item(
+            CreateItemSchema(title="Gatta nuova", notes="zampa", lang=LangEnum.ITA)
+        )
+        assert item.id == 6
+        # Written to the owning shard only.
+        assert ItemModel.select().count() == 0
+        assert [x.title for x in self.item_domain.read_items(item_id=6)] == [
+            "Gatta nuova"
+        ]
+
+    def test_create_item_failed(self):
+        self.domain.reshard(n_shards=2)
+        item_writes = CounterModel.get_value(ITEM_WRITES_COUNTER)
+        shard = self.domain.get_shards()[get_shard_number(6, 2)]
+        with _get_connection(shard.path) as connection:
+            connection.execute("DROP TABLE item;")
+        with pytest.raises(sqlite3.OperationalError):
+            self.item_domain.create_item(
+                CreateItemSchema(title="Gatta nuova", notes="zampa", lang=LangEnum.ITA)
+            )
+        # The cached searches are still valid.
+        assert CounterModel.get_value(ITEM_WRITES_COUNTER) == item_writes
+
+    def test_create_items(self):
+        self.domain.reshard(n_shards=2)
+        item_ids = self.item_domain.create_items(
+            [("Gatta bulk", None, LangEnum.ITA)] * 3, chunk_size=2
+        )
+        assert item_ids == range(6, 9)
+        assert ItemModel.select().count() == 0
+        results = self.item_domain.search_items("bulk", LangEnum.ITA)
+        assert sorted(x.rowid for x in results) == [6, 7, 8]
+
+    def test_search(self):
+        self.domain.reshard(n_shards=2)
+        results = self.item_domain.search_items("gatta", LangEnum.ITA)
+        assert {x.rowid for x in results} == {1, 2, 3, 4, 5}
+        scores = [x.score for x in results]
+        assert scores == sorted(scores, reverse=True)
+        assert results[0].title_s.startswith("<<Gatta>>")
+
+    def test_search_substring(self):
+        self.domain.reshard(n_shards=2)
+        results = self.item_domain.search_items(
+            "tta n. 3", LangEnum.ITA, mode=SearchModeEnum.SUBSTRING
+        )
+        assert [x.rowid for x in results] == [3]
+
+    def test_update_in_shard(self):
+        self.domain.reshard(n_shards=2)
+        connection = _get_connection(self.domain.get_shards()[1].path)
+        with connection:  # Transaction.
+            connection.execute("UPDATE item SET title = 'Cane n. 3' WHERE id = 3;")
+        results = self.item_domain.search_items("cane", LangEnum.ITA)
+        assert [x.rowid for x in results] == [3]
+        results = self.item_domain.search_items("gatta", LangEnum.ITA)
+        assert {x.rowid for x in results} == {1, 2, 4, 5}
+        results = self.item_domain.search_items(
+            "ne n. 3", LangEnum.ITA, mode=SearchModeEnum.SUBSTRING
+        )
+        assert [x.rowid for x in results] == [3]
+
+    def test_search_pagination(self, monkeypatch):
+        self.domain.reshard(n_shards=3)
+        monkeypatch.setattr(settings, "SQLITE_SEARCH_PAGE_SIZE", 2)
+        pages = [
+            self.item_domain.search_items("zampa", LangEnum.ITA, page=x)
+            for x in (1, 2, 3)
+        ]
+        assert [len(x) for x in pages] == [2, 2, 1]
+        assert {x.rowid for page in pages for x in page} == {1, 2, 3, 4, 5}
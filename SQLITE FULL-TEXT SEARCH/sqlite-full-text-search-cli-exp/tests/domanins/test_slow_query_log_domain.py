@@ -0,0 +1,111 @@
+import random
+
+import pytest
+
+from fts_exp.conf import settings
+from fts_exp.data_models.db_models import ItemModel, LangEnum, SlowQueryModel
+from fts_exp.domains import slow_query_log_domain
+from fts_exp.domains.item_domain import ItemDomain
+from fts_exp.domains.slow_query_log_domain import DigestOrderEnum, SlowQueryLogDomain
+
+
+def _make_stats(duration_ms: float) -> dict:
+    return dict(
+        duration_ms=duration_ms,
+        n_returned=3,
+        phases=dict(compile=dict(duration_ms=1.0), query=dict(duration_ms=9.0)),
+    )
+
+
+class TestSlowQueryLog:
+    @pytest.fixture(autouse=True)
+    def setup(self, monkeypatch):
+        monkeypatch.setattr(settings, "IS_SLOW_QUERY_LOG_ENABLED", True)
+        monkeypatch.setattr(settings, "SLOW_QUERY_LOG_THRESHOLD_MS", 100)
+        monkeypatch.setattr(settings, "SLOW_QUERY_LOG_SAMPLE_RATE", 0)
+        monkeypatch.setattr(slow_query_log_domain, "_buffer", [])
+        self.domain = SlowQueryLogDomain()
+
+    def test_threshold(self):
+        assert self.domain.log('"gatta"', LangEnum.ITA, "word", _make_stats(150))
+        assert not self.domain.log('"gatta"', LangEnum.ITA, "word", _make_stats(50))
+        assert self.domain.flush() == 1
+        entry = SlowQueryModel.get()
+        assert (entry.query, entry.lang, entry.n_results) == ('"gatta"', "I", 3)
+        assert not entry.is_sampled
+
+    def test_sampling(self, monkeypatch):
+        monkeypatch.setattr(settings, "SLOW_QUERY_LOG_SAMPLE_RATE", 1)
+        assert self.domain.log('"gatta"', LangEnum.ITA, "word", _make_stats(50))
+        self.domain.flush()
+        assert SlowQueryModel.get().is_sampled
+
+    def test_batches(self, monkeypatch):
+        monkeypatch.setattr(settings, "SLOW_QUERY_LOG_BATCH_SIZE", 2)
+        self.domain.log('"gatta"', LangEnum.ITA, "word", _make_stats(150))
+        assert SlowQueryModel.select().count() == 0
+        self.domain.log('"gatta"', LangEnum.ITA, "word", _make_stats(150))
+        assert SlowQueryModel.select().count() == 2
+        assert self.domain.flush() == 0
+
+    def test_digest(self, monkeypatch):
+        monkeypatch.setattr(settings, "SLOW_QUERY_LOG_SAMPLE_RATE", 0.5)
+        monkeypatch.setattr(random, "random", lambda: 0.0)  # Sampled.
+        for duration_ms in range(51, 71):
+            self.domain.log('"gatta"', LangEnum.ITA, "word", _make_stats(duration_ms))
+        for _ in range(30):
+            self.domain.log('"cat"', LangEnum.ENG, "word", _make_stats(10))
+        stats = _make_stats(10)
+        stats["phases"]["suggestions"] = dict(duration_ms=4.0)
+        self.domain.log('"cat"', LangEnum.ENG, "word", stats)
+        monkeypatch.setattr(random, "random", lambda: 1.0)  # Not sampled.
+        self.domain.log('"gatta"', LangEnum.ITA, "word", _make_stats(5000))
+        self.domain.log('"cat"', LangEnum.ENG, "substring", _make_stats(200))
+        self.domain.flush()
+
+        digest = self.domain.get_digest(DigestOrderEnum.TOTAL)
+        assert [(x["query"], x["mode"]) for x in digest] == [
+            ('"gatta"', "word"),
+            ('"cat"', "word"),
+            ('"cat"', "substring"),
+        ]
+        gatta = digest[0]
+        assert (gatta["n_runs"], gatta["n_sampled"], gatta["lang"]) == (40, 20, "ITA")
+        # The slow run is not in the estimates.
+        assert gatta["total_ms"] == sum(range(51, 71)) * 2
+        assert gatta["p95_ms"] == 69
+        assert (gatta["n_slow"], gatta["slow_total_ms"]) == (1, 5000)
+        cat = digest[1]
+        assert (cat["n_runs"], cat["n_slow"]) == (62, 0)
+        # Averaged over the runs that have the phase.
+        assert cat["phases"] == dict(compile=1.0, query=9.0, suggestions=4.0)
+        # No sampled runs: ordered by the slow ones.
+        substring = digest[2]
+        assert (substring["n_runs"], substring["p95_ms"]) == (0, None)
+        assert (substring["n_slow"], substring["slow_max_ms"]) == (1, 200)
+
+        digest = self.domain.get_digest(DigestOrderEnum.P95)
+        assert [x["p95_ms"] for x in digest] == [69, 10, None]
+
+        digest = self.domain.get_digest(DigestOrderEnum.COUNT, limit=1)
+        assert [x["n_runs"] for x in digest] == [62]
+
+        assert self.domain.clear() == 53
+        assert self.domain.get_digest() == []
+
+    def test_sampled_slow_run(self, monkeypatch):
+        monkeypatch.setattr(settings, "SLOW_QUERY_LOG_SAMPLE_RATE", 1)
+        self.domain.log('"gatta"', LangEnum.ITA, "word", _make_stats(150))
+        self.domain.flush()
+        assert SlowQueryModel.get().is_sampled
+        digest = self.domain.get_digest()
+        assert (digest[0]["n_runs"], digest[0]["n_slow"]) == (1, 1)
+
+    def test_search(self, monkeypatch):
+        monkeypatch.setattr(settings, "SLOW_QUERY_LOG_THRESHOLD_MS", 0)
+        ItemModel.create(title="Gatta", notes="zampa", lang=LangEnum.ITA)
+        results = ItemDomain().search_items("La gatta", LangEnum.ITA)
+        assert self.domain.flush() == 1
+        entry = SlowQueryModel.get()
+        assert (entry.query, entry.n_results) == ('"gatta"', 1)
+        assert entry.duration_ms == results.stats["duration_ms"]
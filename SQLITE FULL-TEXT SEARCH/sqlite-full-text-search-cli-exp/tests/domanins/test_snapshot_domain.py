@@ -0,0 +1,89 @@
+import peewee
+import peewee_utils
+import pytest
+
+from fts_exp.conf import settings
+from fts_exp.data_models import sqlite_capi
+from fts_exp.data_models.db_models import (
+    ItemModel,
+    LangEnum,
+    SearchCacheEntryModel,
+    get_db_path,
+)
+from fts_exp.data_models.db_utils import get_db
+from fts_exp.data_models.sqlite_capi import is_known_layout
+from fts_exp.domains.backup_domain import BackupDomain
+from fts_exp.domains.item_domain import ItemDomain
+from fts_exp.domains.snapshot_domain import (
+    PrewarmModeEnum,
+    SnapshotDomain,
+    SnapshotNotReadOnly,
+)
+
+
+class TestSnapshot:
+    @pytest.fixture(autouse=True)
+    def setup(self, monkeypatch, tmp_path):
+        for i in range(50):
+            ItemModel.create(
+                title=f"Gatta n. {i}", notes="zampa " * 50, lang=LangEnum.ITA
+            )
+        self.path = tmp_path / "snapshot.sqlite3"
+        BackupDomain().backup(self.path)
+        monkeypatch.setattr(settings, "DB_PATH", str(self.path))
+        self.domain = SnapshotDomain()
+
+    def test_get_db_path(self, monkeypatch):
+        assert get_db_path() == str(self.path)
+        monkeypatch.setattr(settings, "IS_DB_SNAPSHOT_MODE", True)
+        assert get_db_path() == f"{self.path.as_uri()}?mode=ro&immutable=1"
+
+    def test_snapshot_mode(self, monkeypatch):
+        monkeypatch.setattr(settings, "IS_DB_SNAPSHOT_MODE", True)
+        monkeypatch.setattr(settings, "IS_SEARCH_CACHE_ENABLED", True)
+        with peewee_utils.use_db(do_force_new_db_init=True):
+            self.domain.check()
+            assert len(ItemDomain().search_items("gatta", LangEnum.ITA)) == 20
+            assert SearchCacheEntryModel.select().count() == 0
+            with pytest.raises(peewee.OperationalError):
+                ItemModel.create(title="Gattino", lang=LangEnum.ITA)
+
+    def test_check_not_read_only(self):
+        with peewee_utils.use_db(do_force_new_db_init=True):
+            with pytest.raises(SnapshotNotReadOnly):
+                self.domain.check()
+
+    def test_prewarm_read(self):
+        with peewee_utils.use_db(do_force_new_db_init=True):
+            get_db().execute_sql("PRAGMA cache_size = 10;")
+            stats = self.domain.prewarm(PrewarmModeEnum.READ)
+            assert stats["mode"] == "read"
+            assert stats["n_pages"] == stats["n_cache_misses"] > 0
+            page_count = get_db().execute_sql("PRAGMA page_count;").fetchone()[0]
+            cache_size = get_db().execute_sql("PRAGMA cache_size;").fetchone()[0]
+            assert cache_size == page_count
+            # The pages are now in the page cache.
+            assert self.domain.prewarm(PrewarmModeEnum.READ)["n_cache_misses"] == 0
+
+    def test_prewarm_read_without_capi(self, monkeypatch):
+        with peewee_utils.use_db(do_force_new_db_init=True):
+            n_pages = self.domain.prewarm(PrewarmModeEnum.READ)["n_pages"]
+        is_known_layout.cache_clear()
+        monkeypatch.setattr(sqlite_capi, "CPYTHON_VERSIONS", ())
+        try:
+            with peewee_utils.use_db(do_force_new_db_init=True):
+                stats = self.domain.prewarm(PrewarmModeEnum.READ)
+        finally:
+            is_known_layout.cache_clear()
+        assert stats["n_pages"] == n_pages > 0
+        assert stats["n_cache_hits"] == stats["n_cache_misses"] == 0
+
+    def test_prewarm_mmap(self, monkeypatch):
+        monkeypatch.setattr(settings, "DB_PREWARM", "mmap")
+        with peewee_utils.use_db(do_force_new_db_init=True):
+            stats = self.domain.prewarm()
+            page_count = get_db().execute_sql("PRAGMA page_count;").fetchone()[0]
+            mmap_size = get_db().execute_sql("PRAGMA mmap_size;").fetchone()[0]
+        assert stats["mode"] == "mmap"
+        # mmap is not available when SQLite is compiled without it.
+        assert stats["n_pages"] == (page_count if mmap_size else 0)
@@ -0,0 +1,90 @@
+import pickle
+
+from fts_exp.conf import settings
+from fts_exp.data_models.db_models import ItemModel, LangEnum, get_index_class_for_lang
+from fts_exp.domains.item_domain import ItemDomain
+from fts_exp.domains.spelling_domain import (
+    BKTree,
+    SpellingDomain,
+    _load_sidecar,
+    _Vocabulary,
+    levenshtein,
+)
+
+
+class TestLevenshtein:
+    def test_happy_flow(self):
+        assert levenshtein("zampa", "zampa") == 0
+        assert levenshtein("zampa", "zappa") == 1
+        assert levenshtein("frist", "first") == 2
+        assert levenshtein("", "dente") == 5
+
+
+class TestBKTree:
+    def test_search(self):
+        tree = BKTree()
+        for term in ("first", "fist", "title", "books", "first"):
+            tree.add(term)
+        assert len(tree) == 4
+        assert sorted(tree.search("firt", 1)) == [(1, "first"), (1, "fist")]
+        assert tree.search("zzzzz", 2) == []
+
+
+class TestSuggest:
+    def setup_method(self):
+        SpellingDomain.clear_cache()
+        self.domain = SpellingDomain()
+        ItemModel.create(title="My first title", notes="My note", lang=LangEnum.ENG)
+        ItemModel.create(title="My first books", notes="My notes", lang=LangEnum.ENG)
+
+    def test_misspelled_word(self):
+        assert self.domain.suggest("frist", LangEnum.ENG)[0] == "first"
+
+    def test_known_words(self):
+        assert self.domain.suggest("first books", LangEnum.ENG) == []
+
+    def test_stale_until_refresh(self):
+        assert self.domain.suggest("leadrship", LangEnum.ENG) == []
+        ItemModel.create(title="Leadership", lang=LangEnum.ENG)
+        # Not refreshed on the search path.
+        assert self.domain.suggest("leadrship", LangEnum.ENG) == []
+        assert self.domain.refresh(LangEnum.ENG) > 0
+        assert self.domain.suggest("leadrship", LangEnum.ENG)[0] == "leadership"
+
+    def test_load_over_budget(self, monkeypatch):
+        monkeypatch.setattr(settings, "SQLITE_SEARCH_VM_STEPS_BUDGET", 1)
+        monkeypatch.setattr(settings, "SQLITE_PROGRESS_HANDLER_N_STEPS", 1)
+        assert self.domain.suggest("frist", LangEnum.ENG) == []
+        # The budget used up by the search.
+        assert self.domain.suggest("frist", LangEnum.ENG, time_budget_ms=-1) == []
+        assert self.domain.refresh(LangEnum.ENG) > 0
+        assert self.domain.suggest("frist", LangEnum.ENG)[0] == "first"
+
+    def test_refresh_saves_the_sidecar(self, tmp_path, monkeypatch):
+        sidecar_path = tmp_path / "spelling.pickle"
+        monkeypatch.setattr(settings, "SPELLING_SIDECAR_PATH", str(sidecar_path))
+        self.domain.suggest("frist", LangEnum.ENG)
+        assert not sidecar_path.exists()
+        self.domain.refresh(LangEnum.ENG)
+        assert [x.doc_counts["first"] for x in _load_sidecar().values()] == [2]
+
+    def test_sidecar_is_reloaded(self, tmp_path, monkeypatch):
+        sidecar_path = tmp_path / "spelling.pickle"
+        monkeypatch.setattr(settings, "SPELLING_SIDECAR_PATH", str(sidecar_path))
+        assert self.domain.suggest("leadrship", LangEnum.ENG) == []
+        ItemModel.create(title="Leadership", lang=LangEnum.ENG)
+        # Refreshed by another process.
+        vocabulary = _Vocabulary()
+        self.domain._refresh_vocabulary(vocabulary, LangEnum.ENG)
+        key = (
+            settings.DB_PATH,
+            get_index_class_for_lang(LangEnum.ENG)._meta.table_name,
+        )
+        with open(sidecar_path, "wb") as fout:
+            pickle.dump({key: vocabulary}, fout)
+        assert self.domain.suggest("leadrship", LangEnum.ENG)[0] == "leadership"
+
+    def test_search_items_fallback(self):
+        results = ItemDomain().search_items("frist bokos", LangEnum.ENG)
+        assert len(results) == 0
+        assert results.suggestions[0] == "first book"